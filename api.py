@@ -0,0 +1,57 @@
+import os
+
+from flask import Blueprint, jsonify, request
+
+import scenarios
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ JSON API ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Headless access to the RPS numbers, mounted on the Dash Flask server in dash_phl.py:
+#   GET  /api/v1/defaults   scenario defaults (the UI's initial values)
+#   POST /api/v1/scenarios  one scenario object, or a list of them, see scenarios.normalize()
+# ?sections=ledger,capacity_need,scenario,monthly_recs limits the response to the named sections.
+
+MAX_BATCH = int(os.environ.get('RPS_API_MAX_BATCH', 5000))
+
+blueprint = Blueprint('api', __name__, url_prefix='/api/v1')
+
+def error(message, status=400, **extra):
+    response = jsonify(dict(error=message, **extra))
+    response.status_code = status
+    return response
+
+@blueprint.route('/defaults', methods=['GET'])
+def defaults():
+    return jsonify(scenarios.DEFAULTS)
+
+@blueprint.route('/scenarios', methods=['POST'])
+def evaluate_scenarios():
+    """Ledger, capacity need and scenario outputs for one scenario (object) or a batch (list)."""
+    body = request.get_json(silent=True)
+    if body is None:
+        return error('request body must be JSON')
+
+    sections = request.args.get('sections')
+    sections = scenarios.SECTIONS if sections is None else [s for s in sections.split(',') if s]
+    unknown = set(sections) - set(scenarios.SECTIONS)
+    if unknown:
+        return error('unknown sections: {}'.format(', '.join(sorted(unknown))))
+
+    batch = isinstance(body, list)
+    specs = body if batch else [body]
+    if len(specs) > MAX_BATCH:
+        return error('at most {} scenarios per request'.format(MAX_BATCH), status=413)
+
+    normalized = []
+    for i, spec in enumerate(specs):
+        try:
+            normalized.append(scenarios.normalize(spec))
+        except ValueError as e:
+            return error(str(e), index=i)
+
+    results = scenarios.evaluate(normalized, sections=sections)
+    if batch:
+        return jsonify(results=results)
+    return jsonify(results[0])
@@ -0,0 +1,119 @@
+/*
+Browser versions of the text and cosmetic callbacks in functions.py, registered with
+functions.browser_callback(). Each takes the same arguments as its Python function plus
+templates.TEXT (the text_templates store) last, and must return the same output.
+*/
+
+// --- Python Formatting ---
+function pyRound(x, digits) {
+    // round(x, digits), printed like a Python float (11 -> '11.0', -0.04 -> '-0.0').
+    // Rounds the exact decimal value of x, ties to even, as Python does.
+    var exact = Math.abs(x).toFixed(100).split('.');
+    var kept = exact[0] + exact[1].slice(0, digits);
+    var rest = exact[1].slice(digits);
+    var up = rest[0] > '5' || (rest[0] === '5' && (/[1-9]/.test(rest.slice(1)) || kept[kept.length - 1] % 2 === 1));
+    var value = (Number(kept) + (up ? 1 : 0)) / Math.pow(10, digits);
+    var out = String(value);
+    out = /^\d+$/.test(out) ? out + '.0' : out;
+    return (x < 0 || Object.is(x, -0)) ? '-' + out : out;
+}
+
+function commas(n) {
+    // f'{n:,}' for an int
+    return String(n).replace(/\B(?=(\d{3})+(?!\d))/g, ',');
+}
+
+function render(template, values) {
+    return template.replace(/\{(\w+)\}/g, function (match, name) {
+        return name in values ? String(values[name]) : match;
+    });
+}
+
+function mixValue(mix, key, source) {
+    return mix[key][mix.sources.indexOf(source)];
+}
+
+// --- Callbacks ---
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    rps: {
+        economic_text_maker: function (mix, text) {
+            var coal = mixValue(mix, 'lcoe', 'Coal');
+            return render(text.economic_text, {
+                solar_vs_coal: pyRound(mixValue(mix, 'lcoe', 'Utility-Scale Solar') - coal, 1),
+                biomass_vs_coal: pyRound(mixValue(mix, 'lcoe', 'Biomass') - coal, 1)
+            });
+        },
+
+        savings_text_maker: function (json, text) {
+            var d = JSON.parse(json);
+            var currency_exchange = 50; //pesos in usd
+
+            var start_cost = Math.trunc(d.start_expense);
+            var end_cost = Math.trunc(d.end_expense);
+            var start_cost_kwh = pyRound(start_cost / d.start_demand / 1000, 3);
+            var end_cost_kwh = pyRound(end_cost / d.end_demand / 1000, 3);
+
+            return render(text.savings_text, {
+                start_cost_usd: commas(Math.trunc(start_cost / currency_exchange)),
+                start_cost: commas(start_cost),
+                start_cost_kwh_usd: pyRound(Number(start_cost_kwh) / currency_exchange, 3),
+                start_cost_kwh: start_cost_kwh,
+                end_re_pct: Math.trunc(d.end_re_pct * 100),
+                end_year: d.end_year,
+                end_cost_usd: commas(Math.trunc(end_cost / currency_exchange)),
+                end_cost: commas(end_cost),
+                end_cost_kwh_usd: pyRound(Number(end_cost_kwh) / currency_exchange, 3),
+                end_cost_kwh: end_cost_kwh,
+                start_recs: commas(d.start_recs),
+                end_recs: commas(Math.trunc(d.end_recs))
+            });
+        },
+
+        goal_text_maker: function (json, text) {
+            var d = JSON.parse(json);
+            return render(text.goal_text, {rps_min_increase: pyRound(d.rps_min_increase * 100, 0)});
+        },
+
+        add_row: function (n_clicks, rows, columns, text) {
+            if (n_clicks > 0) {
+                var row = {};
+                columns.forEach(function (c) { row[c.id] = ''; });
+                return rows.concat([row]);
+            }
+            return rows;
+        },
+
+        lcoe_graph: function (mix, base) {
+            // base is functions.lcoe_base_figure(): boxes, lines, markers and spacers per
+            // technology, then the fossil range label. Only the markers, label and shape change.
+            // The technologies are the box names, so they always follow functions.LCOE_TECHS.
+            var techs = base.data.filter(function (t) { return t.type === 'box'; }).map(function (t) { return t.name; });
+            var fossil = ['Coal', 'Natural Gas', 'Oil'].map(function (t) { return mixValue(mix, 'lcoe', t); });
+            var low = Math.min.apply(null, fossil);
+            var high = Math.max.apply(null, fossil);
+
+            var data = base.data.slice();
+            techs.forEach(function (t, i) {
+                data[2 * techs.length + i] = Object.assign({}, data[2 * techs.length + i], {y: [mixValue(mix, 'lcoe', t)]});
+            });
+            data[data.length - 1] = Object.assign({}, data[data.length - 1], {y: [high - 1]});
+
+            var shapes = [{type: 'rect', x0: 0, x1: 1, y0: Math.min(low / 20, 1), y1: Math.min(high / 20, 1),
+                           xref: 'paper', yref: 'paper', fillcolor: 'Brown', opacity: 0.2, layer: 'below'}];
+            return {data: data, layout: Object.assign({}, base.layout, {shapes: shapes})};
+        },
+
+        frontier_graph: function (figure, json) {
+            // figure is functions.frontier_figure(), its last trace is the selected scenario's star.
+            var d = JSON.parse(json);
+            var data = figure.data.slice();
+            data[data.length - 1] = Object.assign({}, data[data.length - 1],
+                                                  {x: [d.end_emissions / 1e6], y: [d.end_expense / d.end_demand / 1000]});
+            return Object.assign({}, figure, {data: data});
+        },
+
+        color_text: function (energy_mix_error_text, text) {
+            return {color: energy_mix_error_text.indexOf('Please') !== -1 ? 'red' : 'black'};
+        }
+    }
+});
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Batch Runner ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Usage:
+#   python batch_runner.py scenarios.csv results.npz --workers 4 --chunk-size 500
+#
+# Input rows are scenarios in the format of scenarios.normalize(). In a CSV, nested fields
+# (future_procurement, energy_mix, capacity_factors) are JSON strings, and capacity factor
+# columns (solar_cf, ...) may also be given directly. JSON input is a list or JSON lines.
+#
+# Completed chunks are written to <output>.parts/ as they finish. Rerunning the same command
+# after an interruption skips those chunks, and the parts are merged into <output> at the end.
+
+CF_COLUMNS = ['solar_cf', 'dpv_cf', 'wind_cf', 'geothermal_cf', 'biomass_cf', 'hydro_cf']
+NESTED_COLUMNS = ['future_procurement', 'energy_mix', 'capacity_factors']
+
+SCENARIO_COLUMNS = ['start_re_pct', 'end_re_pct', 'start_expense', 'end_expense', 'start_cost_kwh', 'end_cost_kwh',
+                    'start_emissions', 'end_emissions', 'end_recs']
+
+# --- Input ---
+def _csv_row(row):
+    """CSV cells to a scenario dict, dropping blanks and decoding nested JSON fields."""
+    spec = dict()
+    for k, v in row.items():
+        if k is None or v is None or v.strip() == '':
+            continue
+        if k in NESTED_COLUMNS:
+            spec[k] = json.loads(v)
+        elif k in CF_COLUMNS:
+            spec.setdefault('capacity_factors', dict())[k] = v
+        else:
+            spec[k] = v
+    return spec
+
+def _json_array(f, block_size=1 << 16):
+    """Yield items of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = f.read(block_size).lstrip()
+    if not buf.startswith('['):
+        raise ValueError('JSON input must be a list of scenarios or JSON lines')
+    buf = buf[1:]
+    while True:
+        buf = buf.lstrip().lstrip(',').lstrip()
+        if buf.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buf)
+        except ValueError:
+            more = f.read(block_size)
+            if not more:
+                raise
+            buf += more
+            continue
+        yield item
+        buf = buf[end:]
+        if len(buf) < block_size:
+            buf += f.read(block_size)
+
+def read_scenarios(path):
+    """Stream scenario dicts from a .csv, .json (list) or .jsonl file."""
+    with open(path, newline='' if path.endswith('.csv') else None, encoding='utf-8-sig') as f:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(f):
+                yield _csv_row(row)
+        elif path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            first = f.read(1)
+            while first.isspace():
+                first = f.read(1)
+            f.seek(0)
+            if first == '[':
+                for item in _json_array(f):
+                    yield item
+            else:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+# --- Worker ---
+def run_chunk(start, specs):
+    """
+    Evaluate one chunk, returns a dict of equal-length columns.
+
+    Scenarios that fail validation get an error message and NaN results instead of stopping the run.
+    """
+    import scenarios
+
+    normalized, errors = [], []
+    for spec in specs:
+        try:
+            normalized.append(scenarios.normalize(spec))
+            errors.append('')
+        except (ValueError, TypeError, AttributeError) as e:
+            normalized.append(None)
+            errors.append(str(e))
+
+    valid = [s for s in normalized if s is not None]
+    results = iter(scenarios.evaluate(valid, sections=['ledger', 'capacity_need', 'scenario']))
+
+    cols = {k: [] for k in ['row', 'utility', 'scenario', 'end_year', 'desired_pct', 'demand', 'total_rec_shortfall',
+                            'first_shortfall_year'] + SCENARIO_COLUMNS +
+            ['{}_need_mw'.format(t) for t, _ in scenarios.NEED_TECHS] + ['error']}
+    for i, (spec, err) in enumerate(zip(normalized, errors)):
+        cols['row'].append(start + i)
+        cols['error'].append(err)
+        if spec is None:
+            raw = specs[i] if isinstance(specs[i], dict) else dict()
+            cols['utility'].append(str(raw.get('utility', '')))
+            cols['scenario'].append(str(raw.get('scenario', '')))
+            for k in cols:
+                if k not in ['row', 'error', 'utility', 'scenario']:
+                    cols[k].append(np.nan)
+            continue
+
+        result = next(results)
+        shortfall = np.asarray(result['ledger']['rec_shortfall'])
+        years = np.asarray(result['ledger']['year'])
+        cols['utility'].append(str(spec['utility']))
+        cols['scenario'].append(spec['scenario'])
+        cols['end_year'].append(spec['end_year'])
+        cols['desired_pct'].append(spec['desired_pct'])
+        cols['demand'].append(spec['demand'])
+        cols['total_rec_shortfall'].append(shortfall.sum())
+        cols['first_shortfall_year'].append(years[shortfall > 0][0] if (shortfall > 0).any() else np.nan)
+        for k in SCENARIO_COLUMNS:
+            cols[k].append(result['scenario'][k])
+        for t, _ in scenarios.NEED_TECHS:
+            cols['{}_need_mw'.format(t)].append(result['capacity_need'][t][-1])
+
+    dtypes = {'row': int, 'utility': str, 'scenario': str, 'error': str}
+    return {k: np.asarray(v, dtype=dtypes.get(k, float)) for k, v in cols.items()}
+
+# --- Checkpoints ---
+def _part_path(parts_dir, n):
+    return os.path.join(parts_dir, 'chunk_{:06d}.npz'.format(n))
+
+def save_part(parts_dir, n, cols):
+    """Write a finished chunk atomically, so a half-written part is never mistaken for a done one."""
+    tmp = os.path.join(parts_dir, '.chunk_{:06d}.tmp.npz'.format(n))
+    np.savez(tmp, **cols)
+    os.replace(tmp, _part_path(parts_dir, n))
+
+def check_manifest(parts_dir, manifest):
+    """Create the checkpoint dir, or make sure an existing one belongs to the same input and chunking."""
+    path = os.path.join(parts_dir, 'manifest.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+        if existing != manifest:
+            raise SystemExit('{} was written for a different input or chunk size, remove it or use --fresh'.format(parts_dir))
+    else:
+        os.makedirs(parts_dir, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(manifest, f)
+
+def merge_parts(parts_dir, n_chunks, output):
+    """Concatenate chunk columns in input order and write the consolidated output."""
+    parts = [np.load(_part_path(parts_dir, n)) for n in range(n_chunks)]
+    if not parts:
+        raise SystemExit('no scenarios in input')
+    cols = {k: np.concatenate([p[k] for p in parts]) for k in parts[0].files}
+
+    if output.endswith('.npz'):
+        np.savez_compressed(output, **cols)
+    else:
+        import pandas as pd
+        df = pd.DataFrame(cols)
+        if output.endswith('.parquet'):
+            df.to_parquet(output, index=False) #needs pyarrow or fastparquet
+        else:
+            df.to_csv(output, index=False)
+    return len(cols['row'])
+
+# --- Main ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Evaluate a file of RPS scenarios in parallel.')
+    parser.add_argument('input', help='.csv, .json or .jsonl file of scenarios')
+    parser.add_argument('output', help='.npz, .csv or .parquet output')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    parser.add_argument('--chunk-size', type=int, default=500, help='scenarios per task and per checkpoint')
+    parser.add_argument('--fresh', action='store_true', help='ignore and replace existing checkpoints')
+    parser.add_argument('--keep-parts', action='store_true', help='keep checkpoint parts after merging')
+    args = parser.parse_args(argv)
+
+    input_path = os.path.abspath(args.input)
+    output = os.path.abspath(args.output)
+    parts_dir = output + '.parts'
+    os.chdir(os.path.dirname(os.path.abspath(__file__))) #resources reads its CSVs relative to the repo
+
+    if args.fresh and os.path.isdir(parts_dir):
+        shutil.rmtree(parts_dir)
+    stat = os.stat(input_path)
+    check_manifest(parts_dir, {'input': input_path, 'size': stat.st_size, 'mtime': stat.st_mtime,
+                               'chunk_size': args.chunk_size})
+
+    start_time = time.time()
+    done_rows, skipped, n_chunks = 0, 0, 0
+    in_flight = dict()
+
+    def collect(futures):
+        rows = 0
+        for fut in futures:
+            n = in_flight.pop(fut)
+            cols = fut.result()
+            save_part(parts_dir, n, cols)
+            rows += len(cols['row'])
+        return rows
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for n, chunk in enumerate(chunked(read_scenarios(input_path), args.chunk_size)):
+            n_chunks = n + 1
+            if os.path.exists(_part_path(parts_dir, n)):
+                skipped += len(chunk)
+                continue
+            in_flight[pool.submit(run_chunk, n * args.chunk_size, chunk)] = n
+
+            # --- Bounded queue, so input is read only as fast as workers finish ---
+            if len(in_flight) >= 2 * args.workers:
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                done_rows += collect(finished)
+                elapsed = time.time() - start_time
+                print('{:,} scenarios done, {:,.0f} / s'.format(done_rows, done_rows / elapsed), file=sys.stderr)
+        done_rows += collect(list(in_flight))
+
+    elapsed = time.time() - start_time
+    total = merge_parts(parts_dir, n_chunks, output)
+    if not args.keep_parts:
+        shutil.rmtree(parts_dir)
+
+    print('{:,} scenarios ({:,} computed, {:,} resumed from checkpoints) in {:.1f}s, {:,.0f} scenarios / s -> {}'.format(
+        total, done_rows, skipped, elapsed, done_rows / max(elapsed, 1e-9), output), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
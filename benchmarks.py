@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Benchmarks ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Usage:
+#   python benchmarks.py                                 run every case and print a table
+#   python benchmarks.py --filter rps_df_maker           only cases whose name contains the text
+#   python benchmarks.py --output bench.json             also save results and environment metadata
+#   python benchmarks.py --save-baseline                 store this run as benchmark_baseline.json
+#   python benchmarks.py --baseline benchmark_baseline.json --threshold 0.25
+#                                                        flag cases whose median is >25% slower, exit 1 if any
+#
+# A case whose callbacks answer with an error fails instead of being timed, and the run exits 1.
+# Every sample calls a case once, after its setup has cleared the result caches, so the numbers
+# are cold compute times. Each case repeats until --min-time seconds or --max-repeat samples.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, 'benchmark_baseline.json')
+
+HORIZONS = [2030, 2035, 2040, 2045, 2050]
+PROCUREMENT_SIZES = [1, 10, 100, 1000] #planned procurement rows
+
+class CaseError(RuntimeError):
+    """A case ran but its output is wrong, so its timing means nothing."""
+
+# --- Helper Functions ---
+def clear_caches():
+    """Empty every per-process result cache, so the next call computes from scratch."""
+    import cache
+    for c in [cache.results, cache.rps_memo, cache.ledger_state]:
+        c.clear()
+
+def layout_defaults():
+    """{(id, property): value} of every component in the layout, i.e. the default MERALCO inputs."""
+    import functions
+    out = dict()
+    for c in functions.serve_layout()._traverse():
+        cid = getattr(c, 'id', None)
+        if cid:
+            for p in c._prop_names:
+                v = getattr(c, p, None)
+                if v is not None:
+                    out[(cid, p)] = v
+    return out
+
+def procurement_rows(n, seed=0):
+    """n planned procurement rows as future_procurement_table data, the same rows for the same n."""
+    import resources
+    rng = np.random.RandomState(seed)
+    return [{'Generation Source': resources.re_tech[rng.randint(len(resources.re_tech))],
+             'Capacity (MW)': float(rng.randint(1, 200)),
+             'Online Year': int(rng.randint(2019, 2030))} for _ in range(n)]
+
+def measure(func, setup=None, min_time=0.5, max_repeat=200, min_repeat=3):
+    """
+    Time func() after setup() until min_time seconds of samples or max_repeat samples.
+
+    Output
+    ------
+        -dict of min_ms, median_ms, mean_ms and repeat
+    """
+    samples = []
+    total = 0.
+    while len(samples) < min_repeat or (total < min_time and len(samples) < max_repeat):
+        if setup is not None:
+            setup()
+        t = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t)
+        total += samples[-1]
+    samples = np.array(samples) * 1000
+    return {'min_ms': float(samples.min()), 'median_ms': float(np.median(samples)),
+            'mean_ms': float(samples.mean()), 'repeat': len(samples)}
+
+# --- Cases ---
+def cases():
+    """
+    Ordered list of (name, func, setup) benchmark cases.
+
+    Tokens a case reads are recomputed in its setup after the caches are cleared, so each sample
+    only times the named step.
+    """
+    import resources
+    import functions
+
+    defaults = layout_defaults()
+    value = lambda cid, prop='value': defaults[(cid, prop)]
+    utility = resources.utility_dict[value('utility_name')]
+    demand, growth = utility['sales'], utility['growth_floor'] * 100
+    cfs = [value(c) for c in resources.cf_sliders]
+    columns = value('future_procurement_table', 'columns')
+    mix, _ = functions.parse_energy_mix(value('energy_mix_table', 'data'), value('energy_mix_table', 'columns'))
+    rps_args = (demand, growth, value('fit_pct'), value('annual_rps_inc_2020'), value('annual_rps_inc_2023'))
+
+    def tokens(rows, end_year):
+        """(future_procurement token, intermediate_df token), with their results cached."""
+        fp = functions.store_result(functions.future_procurement_frame, rows, columns, *cfs)
+        df = functions.store_result(functions.rps_frame, rps_args[0], rps_args[1], fp, *rps_args[2:], end_year)
+        return fp, df
+
+    def primed(*token_sets):
+        """Setup that clears the caches, then recomputes the given tokens' inputs."""
+        def setup():
+            clear_caches()
+            for t in token_sets:
+                functions.load_result(t)
+        return setup
+
+    out = []
+
+    # --- Compute core ---
+    for n in PROCUREMENT_SIZES:
+        fp = functions.future_procurement_frame(procurement_rows(n), columns, *cfs)
+        for end_year in HORIZONS:
+            out.append(('rps_df_maker/rows={}/end={}'.format(n, end_year),
+                        lambda fp=fp, end_year=end_year: functions.rps_df_maker(
+                            demand, growth / 100, fp, rps_args[2], rps_args[3] / 100, rps_args[4] / 100, end_year + 1),
+                        None))
+
+    fp_token, df_token = tokens(value('future_procurement_table', 'data'), value('end_year'))
+    out.append(('df_capacity_updater', lambda: functions.df_capacity_updater(df_token, *cfs), primed(df_token)))
+
+    for tag in resources.scenario_pct_dict:
+        out.append(('scenario_dict_maker/{}'.format(tag),
+                    lambda tag=tag: functions.scenario_dict_maker(df_token, fp_token, mix, value('desired_pct'), tag),
+                    primed(df_token, fp_token)))
+
+    # --- Figures ---
+    capacity_token = functions.store_result(functions.capacity_frame, df_token, *cfs)
+    figures = [
+        ('lcoe_base_figure', lambda: functions.lcoe_base_figure(), lambda: functions._lcoe_base.clear()),
+        ('lcoe_graph', lambda: functions.lcoe_graph(mix), lambda: functions.lcoe_base_figure()),
+        ('html_REC_balance_graph', lambda: functions.html_REC_balance_graph(df_token), primed(df_token)),
+        ('monthly_REC_graph', lambda: functions.monthly_REC_graph(df_token, fp_token), primed(df_token, fp_token)),
+        ('capacity_cum_graph', lambda: functions.capacity_requirement_cumulative_graph(capacity_token), primed(capacity_token)),
+        ('sensitivity_graph', lambda: functions.sensitivity_graph(
+            demand, growth, *rps_args[2:], value('end_year'), fp_token, mix, value('desired_pct'), value('scenario_radio'),
+            value('rec_expiry'), value('rec_shelf_life'), value('sensitivity_step')), primed(fp_token)),
+        ('frontier_figure', lambda: functions.frontier_figure(df_token, fp_token, mix, value('frontier_mixes')), primed(df_token, fp_token)),
+    ]
+    out.extend(figures)
+
+    # --- Full page load ---
+    out.append(('page_load/cold', lambda: page_load(defaults), clear_caches))
+    out.append(('page_load/warm', lambda: page_load(defaults), None))
+    return out
+
+def page_load(defaults):
+    """
+    Fire every server callback once with the layout values, in dependency order, as the browser does on first load.
+
+    Output
+    ------
+        -number of callbacks fired
+
+    Raises CaseError listing every callback that answered other than 200, or 204 (PreventUpdate).
+    """
+    import functions
+    app = functions.app
+    client = app.server.test_client()
+    pending = {k: v for k, v in app.callback_map.items() if 'callback' in v}
+    outputs = {k: [tuple(o.rsplit('.', 1)) for o in k.strip('.').split('...')] for k in pending}
+    produced = {o for v in outputs.values() for o in v}
+    values = dict()
+    lookup = lambda d: values.get((d['id'], d['property']), defaults.get((d['id'], d['property'])))
+
+    fired = 0
+    failed = []
+    while pending:
+        ready = [k for k, v in pending.items()
+                 if not any((d['id'], d['property']) in produced and (d['id'], d['property']) not in values for d in v['inputs'])]
+        if not ready:
+            raise RuntimeError('callbacks waiting on outputs never produced: {}'.format(sorted(pending)))
+        for k in ready:
+            spec = pending.pop(k)
+            body = {'output': k,
+                    'inputs': [dict(d, value=lookup(d)) for d in spec['inputs']],
+                    'state': [dict(d, value=lookup(d)) for d in spec['state']]}
+            r = client.post('/_dash-update-component', json=body)
+            fired += 1
+            if r.status_code not in (200, 204):
+                failed.append('{} ({})'.format(k, r.status_code))
+            response = json.loads(r.data)['response'] if r.status_code == 200 else dict()
+            for cid, prop in outputs[k]:
+                if 'props' in response and len(outputs[k]) == 1:
+                    values[(cid, prop)] = response['props'].get(prop)
+                else:
+                    values[(cid, prop)] = response.get(cid, dict()).get(prop, defaults.get((cid, prop)))
+    if failed:
+        raise CaseError('callbacks failed: {}'.format(', '.join(failed)))
+    return fired
+
+# --- Environment ---
+def environment():
+    """Machine, interpreter, package versions and git commit of this run."""
+    versions = dict()
+    for name in ['numpy', 'pandas', 'dash', 'plotly', 'flask']:
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, universal_newlines=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine(),
+            'processor': platform.processor(), 'cpu_count': os.cpu_count(), 'packages': versions, 'commit': commit,
+            'clientside': os.environ.get('RPS_CLIENTSIDE', '1') != '0'}
+
+# --- Comparison ---
+def compare(results, baseline, threshold):
+    """
+    Median of each case against the baseline run.
+
+    Output
+    ------
+        -list of (name, baseline_ms, median_ms, ratio, status), status one of 'ok', 'regression',
+            'improved' (faster by more than the threshold), 'new' (not in the baseline) or 'failed'
+    """
+    out = []
+    for name, r in results.items():
+        base = baseline['results'].get(name)
+        if base is not None and 'error' in base: #a failed case in an --output file used as the baseline
+            base = None
+        if 'error' in r:
+            out.append((name, None if base is None else base['median_ms'], None, None, 'failed'))
+            continue
+        if base is None:
+            out.append((name, None, r['median_ms'], None, 'new'))
+            continue
+        ratio = r['median_ms'] / base['median_ms'] if base['median_ms'] > 0 else float('inf')
+        status = 'regression' if ratio > 1 + threshold else 'improved' if ratio < 1 / (1 + threshold) else 'ok'
+        out.append((name, base['median_ms'], r['median_ms'], ratio, status))
+    return out
+
+def run(name_filter=None, min_time=0.5, max_repeat=200):
+    """Measure every case whose name contains name_filter, returns {name: measure() dict, or {'error'} if it failed}."""
+    results = dict()
+    for name, func, setup in cases():
+        if name_filter and name_filter not in name:
+            continue
+        try:
+            results[name] = measure(func, setup, min_time=min_time, max_repeat=max_repeat)
+        except CaseError as e:
+            results[name] = {'error': str(e)}
+            print('{:<44}  FAILED: {}'.format(name, e), file=sys.stderr)
+            continue
+        print('{:<44}{:>12.2f}{:>12.2f}{:>8}'.format(name, results[name]['median_ms'], results[name]['min_ms'],
+                                                    results[name]['repeat']), file=sys.stderr)
+    return results
+
+# --- Main ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the RPS compute core, figure builders and a full page load.')
+    parser.add_argument('--filter', default=None, help='only run cases whose name contains this text')
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds of samples to collect per case')
+    parser.add_argument('--max-repeat', type=int, default=200, help='most samples per case')
+    parser.add_argument('--output', default=None, help='save results and environment metadata as JSON')
+    parser.add_argument('--baseline', default=None, help='compare against a saved run, exit 1 on a regression')
+    parser.add_argument('--threshold', type=float, default=0.25, help='slowdown of the median counted as a regression (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='save this run as {}'.format(os.path.basename(BASELINE_PATH)))
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, HERE)
+    print('{:<44}{:>12}{:>12}{:>8}'.format('case', 'median ms', 'min ms', 'n'), file=sys.stderr)
+    run_output = {'environment': environment(), 'results': run(args.filter, args.min_time, args.max_repeat)}
+    failed = [name for name, r in run_output['results'].items() if 'error' in r]
+
+    for path in [args.output, BASELINE_PATH if args.save_baseline and not failed else None]:
+        if path:
+            with open(path, 'w') as f:
+                json.dump(run_output, f, indent=1, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(run_output['results'], baseline, args.threshold)
+        print('\ncompared with {} ({}, commit {})'.format(args.baseline, baseline['environment'].get('timestamp'),
+                                                          baseline['environment'].get('commit')))
+        changed = [k for k in ['python', 'platform', 'cpu_count', 'packages', 'clientside']
+                   if baseline['environment'].get(k) != run_output['environment'][k]]
+        if changed:
+            print('note: the baseline ran with a different {}, timings may not be comparable'.format(', '.join(changed)))
+        print('{:<44}{:>12}{:>12}{:>8}  {}'.format('case', 'base ms', 'now ms', 'ratio', 'status'))
+        for name, base, now, ratio, status in rows:
+            print('{:<44}{:>12}{:>12}{:>8}  {}'.format(name, '-' if base is None else '{:.2f}'.format(base),
+                                                       '-' if now is None else '{:.2f}'.format(now),
+                                                       '-' if ratio is None else '{:.2f}'.format(ratio), status))
+    if failed:
+        print('\n{} case(s) failed: {}{}'.format(len(failed), ', '.join(failed),
+                                                '; baseline not saved' if args.save_baseline else ''), file=sys.stderr)
+    if failed or (args.baseline and any(r[-1] == 'regression' for r in rows)):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
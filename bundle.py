@@ -0,0 +1,242 @@
+import os
+import json
+import struct
+import warnings
+
+import numpy as np
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Reference Data Bundle ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# The reference CSVs compiled into one file that loads with a single memory map:
+#
+#   magic (8 bytes) | format version (uint32) | reserved (uint32) | header length (uint64) | JSON header | columns
+#
+# The header lists each table's columns (dtype, byte offset, length, and for string columns
+# with missing values the offset of a uint8 null mask), the prebuilt
+# lookup dicts and the size and mtime of every source CSV. Column data is 64-byte
+# aligned, so arrays are zero-copy views into pages shared by every worker.
+#
+# Build it with `python bundle.py`, or let resources rebuild it when a CSV changes.
+
+MAGIC = b'RPSBNDL\x00'
+FORMAT_VERSION = 2
+ALIGN = 64
+PREAMBLE = struct.Struct('<8sIIQ')
+
+# --- Helper Functions ---
+def _pad(n):
+    return (-n) % ALIGN
+
+def _plain(value):
+    """numpy scalars to Python, for the JSON header."""
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def source_stats(paths):
+    """{path: {'size', 'mtime'}} of each source CSV, the bundle is stale when these change."""
+    out = dict()
+    for p in paths:
+        st = os.stat(p)
+        out[p] = {'size': st.st_size, 'mtime': st.st_mtime}
+    return out
+
+# --- Bundle ---
+class Bundle(object):
+    """
+    Read access to compiled reference tables.
+
+    Input
+    -----
+        -header (dict): tables, lookups and sources, as written by write()
+        -buffer (array): uint8 memmap of the file, or None for tables held in memory
+        -frames (dict): DataFrames by name, used instead of buffer for the CSV fallback
+    """
+
+    def __init__(self, header, buffer=None, frames=None):
+        self.header = header
+        self.buffer = buffer
+        self.frames = frames or dict()
+
+    @property
+    def tables(self):
+        return list(self.header['tables'])
+
+    def array(self, table, column):
+        """Zero-copy column view (strings as fixed-width unicode, missing ones as '')."""
+        if self.buffer is None:
+            return self.frames[table][column].values
+        col = self._column(table, column)
+        dtype = np.dtype(col['dtype'])
+        start = col['offset']
+        return self.buffer[start:start + dtype.itemsize * col['length']].view(dtype)
+
+    def nulls(self, table, column):
+        """Boolean mask of the missing values of a string column, None when it has none."""
+        if self.buffer is None:
+            mask = self.frames[table][column].isnull().values
+            return mask if mask.any() else None
+        col = self._column(table, column)
+        if col.get('nulls') is None:
+            return None
+        return self.buffer[col['nulls']:col['nulls'] + col['length']].view(np.bool_)
+
+    def _column(self, table, column):
+        for col in self.header['tables'][table]['columns']:
+            if col['name'] == column:
+                return col
+        raise KeyError(column)
+
+    def frame(self, table):
+        """DataFrame identical to reading the source CSV."""
+        if self.buffer is None:
+            return self.frames[table].copy()
+        import pandas as pd
+        spec = self.header['tables'][table]
+        data = dict()
+        for col in spec['columns']:
+            values = self.array(table, col['name'])
+            if values.dtype.kind == 'U':
+                values = values.astype(object)
+                nulls = self.nulls(table, col['name'])
+                if nulls is not None:
+                    values[nulls] = np.nan #as read_csv leaves a blank cell
+            data[col['name']] = values if values.dtype == object else values.copy()
+        df = pd.DataFrame(data, columns=[c['name'] for c in spec['columns']])
+        if spec['index'] is not None:
+            df = df.set_index(spec['index'])
+        return df
+
+    def lookup(self, name):
+        return self.header['lookups'][name]
+
+    @classmethod
+    def in_memory(cls, frames, lookups, sources):
+        """Bundle over already parsed frames, the fallback when the file can't be used."""
+        header = {'format': FORMAT_VERSION, 'sources': sources, 'lookups': _plain(lookups),
+                  'tables': {k: {'index': v.index.name, 'columns': []} for k, v in frames.items()}}
+        return cls(header, frames=frames)
+
+# --- Reading and Writing ---
+def write(path, frames, lookups, sources):
+    """
+    Compile DataFrames and lookup dicts into a bundle file, replacing any existing one atomically.
+
+    Input
+    -----
+        -frames (dict): name: DataFrame, a named index is stored as the first column
+        -lookups (dict): name: JSON-able dict (numpy scalars are converted)
+        -sources (dict): from source_stats()
+    """
+    tables = dict()
+    blocks = []
+    offset = 0
+    for name, df in frames.items():
+        index = df.index.name
+        df = df.reset_index() if index is not None else df
+        columns = []
+        for c in df.columns:
+            values = df[c].values
+            column = {'name': c, 'nulls': None}
+            if values.dtype == object:
+                nulls = df[c].isnull().values
+                values = np.where(nulls, '', values).astype(str)
+                if nulls.any():
+                    column['nulls'] = offset
+                    data = nulls.astype(np.uint8).tobytes()
+                    blocks.append(data + b'\x00' * _pad(len(data)))
+                    offset += len(data) + _pad(len(data))
+            values = np.ascontiguousarray(values)
+            column.update({'dtype': values.dtype.str, 'offset': offset, 'length': len(values)})
+            columns.append(column)
+            data = values.tobytes()
+            blocks.append(data + b'\x00' * _pad(len(data)))
+            offset += len(data) + _pad(len(data))
+        tables[name] = {'index': index, 'columns': columns}
+
+    # --- Offsets are absolute, so grow the data start until the header fits in front of it ---
+    header = {'format': FORMAT_VERSION, 'sources': sources, 'lookups': _plain(lookups), 'tables': tables}
+    relative = [(c, c['offset'], c['nulls']) for t in tables.values() for c in t['columns']]
+    start = 0
+    while True:
+        for c, rel, nulls in relative:
+            c['offset'] = start + rel
+            if nulls is not None:
+                c['nulls'] = start + nulls
+        raw = json.dumps(header).encode('utf-8')
+        end = PREAMBLE.size + len(raw)
+        if end <= start:
+            break
+        start = end + _pad(end)
+    raw += b' ' * (start - end)
+
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(raw)))
+        f.write(raw)
+        for b in blocks:
+            f.write(b)
+    os.replace(tmp, path)
+
+def read(path):
+    """Memory-map a bundle file, raises ValueError if it isn't one this version can read."""
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    if len(buffer) < PREAMBLE.size:
+        raise ValueError('{} is truncated'.format(path))
+    magic, version, _, header_len = PREAMBLE.unpack(buffer[:PREAMBLE.size].tobytes())
+    if magic != MAGIC:
+        raise ValueError('{} is not a reference bundle'.format(path))
+    if version != FORMAT_VERSION:
+        raise ValueError('{} is format {}, expected {}'.format(path, version, FORMAT_VERSION))
+    header = json.loads(buffer[PREAMBLE.size:PREAMBLE.size + header_len].tobytes().decode('utf-8'))
+    return Bundle(header, buffer=buffer)
+
+def is_stale(bundle, sources):
+    """True when a source CSV was added, removed, resized or modified since the bundle was built."""
+    built = bundle.header['sources']
+    if set(built) != set(sources):
+        return True
+    return any(sources[p]['size'] != built[p]['size'] or sources[p]['mtime'] > built[p]['mtime'] for p in sources)
+
+def load(path, source_paths, build):
+    """
+    Open the bundle, rebuilding it first if it is missing, unreadable or older than a source CSV.
+
+    Input
+    -----
+        -path (str): bundle file
+        -source_paths (list): CSVs the bundle is compiled from
+        -build (function): returns (frames, lookups) parsed from the CSVs
+
+    If the bundle can't be written (i.e. a read-only deploy), the freshly parsed CSVs are used directly.
+    """
+    sources = source_stats(source_paths)
+    if os.path.exists(path):
+        try:
+            bundle = read(path)
+            if not is_stale(bundle, sources):
+                return bundle
+        except (ValueError, OSError) as e:
+            warnings.warn('rebuilding reference bundle: {}'.format(e))
+
+    frames, lookups = build()
+    try:
+        write(path, frames, lookups, sources)
+        return read(path)
+    except OSError as e:
+        warnings.warn('using CSVs directly, could not write {}: {}'.format(path, e))
+        return Bundle.in_memory(frames, lookups, sources)
+
+if __name__ == '__main__':
+    import time
+    import resources
+    t = time.time()
+    bundle = resources.reference(rebuild=True)
+    print('built {} ({:,} bytes, {} tables) in {:.0f} ms'.format(
+        resources.BUNDLE_PATH, os.path.getsize(resources.BUNDLE_PATH), len(bundle.tables), (time.time() - t) * 1000))
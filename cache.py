@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import hashlib
+import numbers
+import threading
+from collections import OrderedDict
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Server-side Caching ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# --- Helper Functions ---
+def canonical(value):
+    """
+    value with lists for tuples and floats for every number, the form that survives a round trip
+    through the browser's JSON (which sends 5.0 back as 5).
+    """
+    if isinstance(value, dict):
+        return {k: canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    if isinstance(value, numbers.Number) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+def content_key(*parts):
+    """Stable hash of JSON-like inputs (dict key order, list/tuple and int/float don't matter)."""
+    blob = json.dumps(canonical(parts), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(blob.encode('utf-8')).hexdigest()
+
+# --- Cache ---
+class ResultCache(object):
+    """
+    Bounded, thread-safe LRU cache with a time-to-live on every entry.
+
+    Input
+    -----
+        -maxsize (int): entries kept before the least recently used is evicted
+        -ttl (float): seconds an entry stays valid, None to never expire
+    """
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict() #key: (expires, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return a live entry and mark it recently used."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.time()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None: #expired
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting the oldest entries past maxsize."""
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[0] is None or entry[0] > time.time())
+
+    def __len__(self):
+        return len(self._data)
+
+# --- Shared store for intermediate callback results ---
+results = ResultCache(maxsize=int(os.environ.get('RPS_CACHE_SIZE', 256)),
+                      ttl=float(os.environ.get('RPS_CACHE_TTL', 3600)))
+
+# --- Memoized RPS ledgers, keyed on normalized inputs (see functions.rps_frame) ---
+rps_memo = ResultCache(maxsize=int(os.environ.get('RPS_MEMO_SIZE', 512)), ttl=None)
+
+# --- Longest RPS ledger computed per input set, ignoring end_year (see functions.rps_frame) ---
+ledger_state = ResultCache(maxsize=int(os.environ.get('RPS_LEDGER_STATE_SIZE', 256)), ttl=None)
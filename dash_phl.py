@@ -6,12 +6,14 @@ import pandas as pd
 # --- Module Imports ---
 import resources
 import functions
+import api
 
 # --- Hide SettingWithCopy Warnings --- 
 pd.set_option('chained_assignment',None)
 
 # --- Server ---
 server = functions.app.server
+server.register_blueprint(api.blueprint) #JSON API under /api/v1
 # --- Run on Import ---
 if __name__ == "__main__":
     functions.app.run_server(debug=False)
@@ -0,0 +1,445 @@
+import numpy as np
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Vectorized RPS Engine ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Arrays in this module are laid out as (batch, year): one row per utility
+# (or draw, or scenario) and one column per year starting in START_YEAR.
+
+# --- RPS Calendar ---
+START_YEAR = 2018 #'year 0' of the RPS
+RPS_START_YEAR = 2020 #no requirement till 2020
+RPS_STEP_YEAR = 2023 #presidential elections in 2022
+EXPIRY_START_YEAR = 2023 #assuming that RECs from transition period will be spent
+REC_SHELF_LIFE = 3 #years a surplus REC is bankable
+EXPIRY_METHODS = ['approximate', 'fifo'] #see rps_ledger()
+
+CARRIED_COLUMNS = ['demand_growth', 'rps_req', 'future_procurement', 'rec_cum_production', 'rec_cum_withdraws',
+                   'rec_cum_expired'] #running totals rps_ledger() continues from when extending a horizon
+
+LEDGER_COLUMNS = ['demand_growth', 'demand', 'rps_marginal_req', 'rps_req', 'fit_MWh', 'future_procurement',
+                  'demand_for_calc', 'rec_req', 'rec_created', 'rec_change', 'rec_cum_production',
+                  'rec_cum_withdraws', 'rec_expired', 'rec_cum_expired', 'end_rec_balance',
+                  'begin_rec_balance', 'rec_shortfall']
+
+# --- Result Objects ---
+class RPSLedger(object):
+    """Single-utility RPS ledger, one 1-D year array per rps_df_maker column."""
+    __slots__ = ('year',) + tuple(LEDGER_COLUMNS)
+
+    def __init__(self, **arrays):
+        for k in self.__slots__:
+            setattr(self, k, arrays[k])
+
+    def to_frame(self):
+        """DataFrame adapter, identical in layout to rps_df_maker output."""
+        import pandas as pd
+        index = pd.Index(self.year, name='year')
+        return pd.DataFrame({c: getattr(self, c) for c in LEDGER_COLUMNS}, index=index, columns=LEDGER_COLUMNS)
+
+class ScenarioOutcome(object):
+    """Start and end year generation mix, cost and emissions for one renewable scenario."""
+    __slots__ = ('current_mwh', 'future_generation', 'start_re', 'start_re_pct', 'start_expense', 'start_emissions',
+                 'end_re', 'end_re_pct', 'end_recs', 'end_expense', 'end_emissions')
+
+    def __init__(self, **values):
+        for k in self.__slots__:
+            setattr(self, k, values[k])
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+# --- Helper Functions ---
+def rps_years(end_year):
+    """Years covered by the RPS ledger, end_year is exclusive (same as rps_df_maker)."""
+    return np.arange(START_YEAR, int(end_year))
+
+def _column(x):
+    """Cast a scalar or 1-D input to a float (batch, 1) column for broadcasting."""
+    return np.atleast_1d(np.asarray(x, dtype=float)).reshape(-1, 1)
+
+def _shift(a, periods):
+    """Shift along the year axis, filling vacated years with 0."""
+    out = np.zeros_like(a)
+    if periods < a.shape[1]:
+        out[:, periods:] = a[:, :a.shape[1] - periods]
+    return out
+
+def procurement_matrix(batch_index, online_year, generation, years, n_batch):
+    """
+    Scatter planned procurement rows into a (batch, year) matrix of new annual generation.
+
+    Input
+    -----
+        -batch_index (array): row of the batch (i.e. utility) each procurement entry belongs to
+        -online_year (array): year each entry begins creating RECs, entries before the first year count from the first year
+        -generation (array): annual MWh of each entry, or (entry, ...) i.e. MWh by month
+        -years (array): ledger years, from rps_years()
+        -n_batch (int): number of rows in the output
+
+    Trailing axes of generation are kept, so (entry, 12) gives a (batch, year, 12) matrix.
+    """
+    batch_index = np.asarray(batch_index, dtype=int)
+    online_year = np.asarray(online_year, dtype=float)
+    generation = np.nan_to_num(np.asarray(generation, dtype=float))
+
+    out = np.zeros((n_batch, len(years)) + generation.shape[1:])
+    valid = ~np.isnan(online_year)
+    col = np.ceil(online_year[valid]).astype(int) - int(years[0])
+    col = np.clip(col, 0, None)
+    in_range = col < len(years)
+    np.add.at(out, (batch_index[valid][in_range], col[in_range]), generation[valid][in_range])
+    return out
+
+# --- General Functions ---
+def rps_ledger(demand, demand_growth, fit_pct, procurement, annual_rps_inc_2020, annual_rps_inc_2023, end_year,
+               previous=None, expiry='approximate', shelf_life=REC_SHELF_LIFE):
+    """
+    Vectorized equivalent of functions.rps_df_maker for a batch of utilities.
+
+    Input
+    -----
+        -demand (float or array): 2018 Demand in MWh, one per batch row
+        -demand_growth (float or array): fractional annual demand growth (i.e. 0.063)
+        -fit_pct (float or array): pct of FiT allocation
+        -procurement (array or None): (batch, year) new annual RE generation by online year, see procurement_matrix()
+        -annual_rps_inc_2020 (float or array): fractional RPS increment for 2020-2022
+        -annual_rps_inc_2023 (float or array): fractional RPS increment from 2023 on
+        -end_year (int): exclusive last year of RPS
+        -previous (dict or None): an earlier output for the same inputs and a different end_year
+        -expiry (str): 'approximate' expires the surplus of the year shelf_life years back, as
+            rps_df_maker always has. 'fifo' tracks every vintage and spends the oldest first, see vintage_fifo()
+        -shelf_life (int): years a REC can be used, including the year it is created
+
+    Output
+    ------
+        -dict of (batch, year) arrays keyed by the rps_df_maker column names, plus 'year'.
+
+    Every year only depends on the years before it, so a shorter horizon is a prefix of a longer
+    one. Given previous, only the years after it are computed, continuing its cumulative
+    production, withdrawals, expirations and balance, or previous is truncated. The result is
+    identical to computing the whole horizon.
+    """
+    if expiry not in EXPIRY_METHODS:
+        raise ValueError('expiry must be one of {}, got {!r}'.format(EXPIRY_METHODS, expiry))
+    shelf_life = int(shelf_life)
+    if shelf_life < 1:
+        raise ValueError('shelf_life must be at least 1 year, got {}'.format(shelf_life))
+
+    years = rps_years(end_year)
+    if previous is not None and len(previous['year']) >= len(years):
+        return truncate_ledger(previous, end_year)
+    if expiry == 'fifo':
+        previous = None #the vintages aren't kept in the ledger, so a longer horizon starts over
+    n_prev = 0 if previous is None else len(previous['year'])
+    new = years[n_prev:]
+
+    demand = _column(demand)
+    demand_growth = _column(demand_growth)
+    fit_pct = _column(fit_pct)
+    inc_2020 = _column(annual_rps_inc_2020)
+    inc_2023 = _column(annual_rps_inc_2023)
+    n_batch = max(len(demand), len(demand_growth), len(fit_pct), len(inc_2020), len(inc_2023),
+                  0 if procurement is None else len(procurement))
+    shape = (n_batch, len(new))
+
+    # --- Running totals at the end of previous, the state the new years continue from ---
+    start = {k: np.full((n_batch, 1), 1. if k == 'demand_growth' else 0.) for k in CARRIED_COLUMNS}
+    if previous is not None:
+        start = {k: np.broadcast_to(previous[k][:, -1:], (n_batch, 1)) for k in CARRIED_COLUMNS}
+        start['rps_req'] = np.cumsum(previous['rps_marginal_req'], axis=1)[:, -1:] #before clipping to 100%
+
+    def accumulate(func, start, values):
+        """cumsum / cumprod of the new years continuing from start."""
+        return func(np.concatenate([start, values], axis=1), axis=1)[:, 1:]
+
+    def whole(name, values):
+        """Previous years followed by the new ones."""
+        if previous is None:
+            return values
+        return np.concatenate([np.broadcast_to(previous[name], (n_batch, n_prev)), values], axis=1)
+
+    out = dict()
+
+    # --- Demand ---
+    growth = np.broadcast_to(demand_growth + 1, shape).copy()
+    growth[:, new == START_YEAR] = 1
+    out['demand_growth'] = accumulate(np.cumprod, start['demand_growth'], growth)
+    out['demand'] = demand * out['demand_growth']
+
+    # --- RPS percentage requirement ---
+    marginal = np.where(new >= RPS_STEP_YEAR, inc_2023, np.where(new >= RPS_START_YEAR, inc_2020, 0.))
+    out['rps_marginal_req'] = np.broadcast_to(marginal, shape).copy()
+    out['rps_req'] = accumulate(np.cumsum, start['rps_req'], out['rps_marginal_req'])
+
+    # --- Calculate FIT MWs (static, only based on first year) ---
+    out['fit_MWh'] = np.broadcast_to(fit_pct * demand / 100, shape).copy()
+
+    if procurement is None:
+        procurement = np.zeros((n_batch, len(years)))
+    procurement = np.broadcast_to(procurement, (n_batch, len(years)))[:, n_prev:]
+    out['future_procurement'] = accumulate(np.cumsum, start['future_procurement'], procurement)
+
+    # --- Requirement is based on previous year's sales, 2020 uses 2018 ---
+    all_demand = whole('demand', out['demand'])
+    offset = RPS_START_YEAR - START_YEAR
+    index = np.arange(n_prev, len(years))
+    source = np.where(index == offset, 0, index - 1)
+    out['demand_for_calc'] = np.where(index >= offset, all_demand[:, np.clip(source, 0, None)], 0.)
+
+    # --- clip RPS requirement to 100% ---
+    out['rps_req'] = out['rps_req'].clip(max=1)
+
+    fit_requirement = np.where(new >= RPS_START_YEAR, out['fit_MWh'], 0.)
+    out['rec_req'] = out['rps_req'] * out['demand_for_calc'] + fit_requirement
+    out['rec_created'] = out['fit_MWh'] + out['future_procurement']
+    out['rec_change'] = out['rec_created'] - out['rec_req']
+
+    # --- Calculate cumulative production and sales ---
+    out['rec_cum_production'] = accumulate(np.cumsum, start['rec_cum_production'], out['rec_created'])
+    out['rec_cum_withdraws'] = accumulate(np.cumsum, start['rec_cum_withdraws'], out['rec_req'])
+
+    created = whole('rec_created', out['rec_created'])
+    required = whole('rec_req', out['rec_req'])
+    if expiry == 'fifo':
+        # --- Vintage accounting, previous is always None here ---
+        expired, balance, shortfall = vintage_fifo(created, required, years, shelf_life)
+        out['rec_expired'] = expired
+        out['rec_cum_expired'] = accumulate(np.cumsum, start['rec_cum_expired'], expired)
+        out['end_rec_balance'] = balance
+        out['begin_rec_balance'] = _shift(balance, 1)
+        out['rec_shortfall'] = shortfall
+    else:
+        # --- Annual expirations based on shelf_life year old surplus ---
+        aged = index >= shelf_life
+        source = np.clip(index - shelf_life, 0, None)
+        expired = np.where(aged, created[:, source], 0.) - np.where(aged, required[:, source], 0.)
+        expired = expired.clip(min=0) #no negative surpluses
+        expired[:, new < EXPIRY_START_YEAR] = 0
+        out['rec_expired'] = expired
+        out['rec_cum_expired'] = accumulate(np.cumsum, start['rec_cum_expired'], expired)
+
+        # --- Total inventory is difference of cumulatives ---
+        balance = out['rec_cum_production'] - out['rec_cum_withdraws'] - out['rec_cum_expired']
+        out['end_rec_balance'] = balance.clip(min=0)
+        all_balance = whole('end_rec_balance', out['end_rec_balance'])
+        out['begin_rec_balance'] = np.where(index >= 1, all_balance[:, np.clip(index - 1, 0, None)], 0.)
+
+        # --- Calculate Annual REC Need (purchase requirements)---
+        shortfall = (out['begin_rec_balance'] + out['rec_created'] - out['rec_req'] - out['rec_expired']) * -1
+        out['rec_shortfall'] = shortfall.clip(min=0)
+
+    out = {k: whole(k, v) for k, v in out.items()}
+    out['year'] = years
+    return out
+
+def vintage_fifo(created, required, years, shelf_life=REC_SHELF_LIFE):
+    """
+    REC bank that tracks each vintage, spends the oldest first and retires what is unused after shelf_life years.
+
+    Input
+    -----
+        -created (array): (batch, year) RECs created
+        -required (array): (batch, year) RECs to surrender
+        -years (array): ledger years, from rps_years()
+        -shelf_life (int): years a REC can be used, including the year it is created
+
+    Output
+    ------
+        -(expired, end balance, shortfall) as (batch, year) arrays
+
+    The bank is a ring of shelf_life slots per utility, so each year touches a fixed number of
+    slots for every utility at once. A vintage expires in the year shelf_life after it was
+    created, the same year as under the approximate method. Before EXPIRY_START_YEAR nothing
+    expires, and vintages reaching their limit roll into the next oldest one.
+    """
+    created = np.asarray(created, dtype=float)
+    required = np.asarray(required, dtype=float)
+    n_batch = created.shape[0]
+
+    ring = np.zeros((n_batch, shelf_life)) #slot i % shelf_life holds the vintage of year i
+    expired = np.zeros(created.shape)
+    balance = np.zeros(created.shape)
+    shortfall = np.zeros(created.shape)
+    for i, year in enumerate(years):
+        slot = i % shelf_life
+        aged = ring[:, slot].copy() #vintage of year i - shelf_life
+        ring[:, slot] = created[:, i]
+        if year >= EXPIRY_START_YEAR:
+            expired[:, i] = aged
+        else:
+            ring[:, (i + 1) % shelf_life] += aged
+
+        # --- Surrender oldest vintages first ---
+        need = required[:, i].copy()
+        for k in range(1, shelf_life + 1):
+            s = (i + k) % shelf_life
+            spent = np.minimum(ring[:, s], need)
+            ring[:, s] -= spent
+            need -= spent
+        shortfall[:, i] = need
+        balance[:, i] = ring.sum(axis=1)
+    return expired, balance, shortfall
+
+def truncate_ledger(ledger, end_year):
+    """The first years of a rps_ledger() output, up to the exclusive end_year."""
+    n = len(rps_years(end_year))
+    return {k: (rps_years(end_year) if k == 'year' else v[:, :n]) for k, v in ledger.items()}
+
+def rps_single(demand, demand_growth, fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year,
+               online_year=(), generation=(), previous=None, expiry='approximate', shelf_life=REC_SHELF_LIFE):
+    """
+    Pandas-free fast path for one utility, returns an RPSLedger.
+
+    Input
+    -----
+        -online_year, generation (arrays): planned procurement rows (year online, annual MWh)
+        -previous (RPSLedger or None): earlier result for the same inputs, extended or truncated to end_year
+        -see rps_ledger() for the rest
+    """
+    years = rps_years(end_year)
+    procurement = procurement_matrix(np.zeros(len(online_year), dtype=int), online_year, generation, years, 1)
+    if previous is not None:
+        previous = {k: (getattr(previous, k) if k == 'year' else getattr(previous, k)[None, :]) for k in RPSLedger.__slots__}
+    out = rps_ledger(demand=demand, demand_growth=demand_growth, fit_pct=fit_pct, procurement=procurement,
+                     annual_rps_inc_2020=annual_rps_inc_2020, annual_rps_inc_2023=annual_rps_inc_2023,
+                     end_year=end_year, previous=previous, expiry=expiry, shelf_life=shelf_life)
+    return RPSLedger(**{k: (v if k == 'year' else v[0]) for k, v in out.items()})
+
+def capacity_need(rec_incremental_req, capacity_factors):
+    """
+    MW of new capacity needed to create an incremental REC requirement.
+
+    Input
+    -----
+        -rec_incremental_req (array): incremental RECs (MWh), any shape
+        -capacity_factors (array): capacity factor (%) of each technology
+
+    Output
+    ------
+        -array with a trailing technology axis, i.e. (year, technology)
+    """
+    mwh_need = np.abs(np.asarray(rec_incremental_req, dtype=float))
+    capacity_factors = np.asarray(capacity_factors, dtype=float)
+    return (mwh_need[..., None] / 8760) / (capacity_factors / 100)
+
+def scenario_grid(lcoe, current_mwh, planned, re_mask, fossil_mask, weights, desired_pct,
+                  end_demand, start_recs, emission_factors=None):
+    """
+    Vectorized equivalent of the end-year math in functions.scenario_dict_maker.
+
+    Every renewable mix (row of weights) is evaluated at every desired RE share in one pass.
+    lcoe, planned, end_demand and start_recs may carry extra leading batch axes (i.e. Monte Carlo
+    draws), which are kept in front of the (scenario, pct) axes of every output.
+
+    Input
+    -----
+        -lcoe (array): (source,) LCOE in ₱ / kWh
+        -current_mwh (array): (source,) current annual generation
+        -planned (array): (source,) planned RE generation from future procurement
+        -re_mask (bool array): (source,) True for sources in resources.re_tech
+        -fossil_mask (bool array): (source,) True for sources in resources.fossil_tech
+        -weights (array): (scenario, source) share of new RE going to each source
+        -desired_pct (array): (pct,) fractional desired RE share of end year demand
+        -end_demand (float): end year demand in MWh
+        -start_recs (float): RECs currently being created
+        -emission_factors (array): (source,) tCO2 per MWh, NaN or 0 for renewables
+
+    Output
+    ------
+        -dict of (scenario, pct) arrays: 'end_expense', 'end_re', 'end_re_pct', 'end_recs', 'end_emissions'
+         plus 'future_generation' as (scenario, pct, source)
+    """
+    lcoe = np.asarray(lcoe, dtype=float)
+    current_mwh = np.asarray(current_mwh, dtype=float)
+    planned = np.asarray(planned, dtype=float)
+    end_demand = np.asarray(end_demand, dtype=float)
+    start_recs = np.asarray(start_recs, dtype=float)
+    re_mask = np.asarray(re_mask, dtype=bool)
+    fossil_mask = np.asarray(fossil_mask, dtype=bool)
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    desired_pct = np.atleast_1d(np.asarray(desired_pct, dtype=float))
+
+    start_re = current_mwh[re_mask].sum()
+    start_fossil = current_mwh[fossil_mask].sum()
+    planned_re = planned.sum(axis=-1)[..., None]
+
+    new_re_need = np.maximum(end_demand[..., None] * desired_pct - start_re - planned_re, 0) #(..., pct)
+    fossil_need = end_demand[..., None] - new_re_need - start_re - planned_re
+
+    # --- (..., scenario, pct, source) future generation ---
+    re_future = np.where(re_mask, weights[:, None, :] * new_re_need[..., None, :, None] + current_mwh, 0.)
+    fossil_future = np.where(fossil_mask, fossil_need[..., None, :, None] * (current_mwh / start_fossil), 0.)
+    future = re_future + fossil_future + planned[..., None, None, :]
+
+    out = {'future_generation': future}
+    out['end_expense'] = (lcoe[..., None, None, :] * future * 1000).sum(axis=-1)
+    out['end_re'] = future[..., re_mask].sum(axis=-1)
+    out['end_recs'] = out['end_re'] - (start_re - start_recs[..., None, None])
+    out['end_re_pct'] = out['end_re'] / future.sum(axis=-1)
+    if emission_factors is None:
+        emission_factors = np.zeros(current_mwh.shape)
+    out['end_emissions'] = (np.nan_to_num(np.asarray(emission_factors, dtype=float)) * future).sum(axis=-1)
+    return out
+
+def scenario_outcome(lcoe, current_mwh, planned, re_mask, fossil_mask, weights, desired_pct,
+                     start_demand, end_demand, start_recs, emission_factors=None):
+    """
+    Pandas-free fast path for one scenario mix at one desired RE share, returns a ScenarioOutcome.
+
+    Input
+    -----
+        -weights (array): (source,) share of new RE going to each source
+        -desired_pct (float): fractional desired RE share
+        -start_demand (float): first year demand in MWh
+        -see scenario_grid() for the rest
+    """
+    lcoe = np.asarray(lcoe, dtype=float)
+    current_mwh = np.asarray(current_mwh, dtype=float)
+    if emission_factors is None:
+        emission_factors = np.zeros_like(lcoe)
+    emission_factors = np.nan_to_num(np.asarray(emission_factors, dtype=float))
+
+    grid = scenario_grid(lcoe=lcoe, current_mwh=current_mwh, planned=planned, re_mask=re_mask,
+                         fossil_mask=fossil_mask, weights=[weights], desired_pct=[desired_pct],
+                         end_demand=end_demand, start_recs=start_recs, emission_factors=emission_factors)
+
+    start_re = current_mwh[np.asarray(re_mask, dtype=bool)].sum()
+    return ScenarioOutcome(
+        current_mwh=current_mwh,
+        future_generation=grid['future_generation'][0, 0],
+        start_re=start_re,
+        start_re_pct=start_re / start_demand,
+        start_expense=(lcoe * current_mwh * 1000).sum(),
+        start_emissions=(emission_factors * current_mwh).sum(),
+        end_re=grid['end_re'][0, 0],
+        end_re_pct=grid['end_re_pct'][0, 0],
+        end_recs=grid['end_recs'][0, 0],
+        end_expense=grid['end_expense'][0, 0],
+        end_emissions=grid['end_emissions'][0, 0],
+    )
+
+def fleet_rps(end_year, fit_pct=3.34, annual_rps_inc_2020=0.01, annual_rps_inc_2023=0.01, procurement=None, utilities=None):
+    """
+    Run rps_ledger for every utility in resources.utility_dict (or a subset).
+
+    Demand and growth come from the DOE utility data, the same values the
+    'Automatic Utility Data Lookup' tab loads. Policy inputs are fractions and
+    broadcast across the fleet unless given per utility.
+
+    Output
+    ------
+        -(list of utility names, ledger dict of (utility, year) arrays)
+    """
+    import resources
+
+    if utilities is None:
+        utilities = list(resources.utility_dict.keys())
+    demand = [resources.utility_dict[u]['sales'] for u in utilities]
+    growth = [resources.utility_dict[u]['growth_floor'] for u in utilities]
+
+    ledger = rps_ledger(demand=demand, demand_growth=growth, fit_pct=fit_pct, procurement=procurement,
+                        annual_rps_inc_2020=annual_rps_inc_2020, annual_rps_inc_2023=annual_rps_inc_2023,
+                        end_year=end_year)
+    return utilities, ledger
@@ -0,0 +1,85 @@
+import numpy as np
+
+import engine
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Cost vs. Emissions Frontier ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Candidate portfolios are a renewable mix (weights over the renewable sources of the energy mix,
+# summing to 1) at a desired RE share. Every mix is evaluated at every share with
+# engine.scenario_grid, a chunk of mixes at a time, and the portfolios no other one beats on both
+# end year cost and emissions form the frontier.
+#
+# Renewables emit nothing in this model and fossil generation shrinks in proportion, so emissions
+# only depend on the RE share. The cheapest mix at each share is then the lowest cost curve, and the
+# frontier is the part of it where cutting emissions costs more. When renewables are cheaper than
+# the fossil mix, that is a single point at the highest share.
+
+DESIRED_PCTS = np.arange(10, 100.5, 2.5)
+N_MIXES = 1000
+
+# --- Candidates ---
+def candidate_weights(n_sources, n_mixes=N_MIXES, seed=0, presets=()):
+    """
+    (mix, source) renewable weights: each source alone, the presets, then n_mixes uniform draws
+    over the simplex (Dirichlet with all ones), reproducible for a seed.
+    """
+    rng = np.random.RandomState(int(seed))
+    rows = [np.eye(n_sources)]
+    if len(presets):
+        presets = np.asarray(presets, dtype=float)
+        rows.append(presets / presets.sum(axis=1, keepdims=True))
+    if n_mixes > 0:
+        rows.append(rng.dirichlet(np.ones(n_sources), int(n_mixes)))
+    return np.concatenate(rows)
+
+def non_dominated(cost, emissions):
+    """
+    Indices of the points no other point beats on both cost and emissions (lower is better),
+    by increasing cost. Ties keep the first point. O(n log n): sort by cost, keep running emission minima.
+    """
+    cost = np.asarray(cost, dtype=float)
+    emissions = np.asarray(emissions, dtype=float)
+    order = np.lexsort((emissions, cost))
+    best = np.minimum.accumulate(emissions[order])
+    keep = np.concatenate([[True], best[1:] < best[:-1]]) if len(order) else np.zeros(0, dtype=bool)
+    return order[keep]
+
+# --- Sweep ---
+def sweep(inputs, weights, desired_pcts=DESIRED_PCTS, chunk_size=500):
+    """
+    End year cost and emissions of every (mix, desired pct) portfolio.
+
+    Input
+    -----
+        -inputs (dict): scenario_grid() arguments other than weights and desired_pct, with
+            source-aligned lcoe, current_mwh, planned, re_mask, fossil_mask and emission_factors
+        -weights (array): (mix, re source) weights over the sources where re_mask is True
+        -desired_pcts (array): desired RE shares in %
+        -chunk_size (int): mixes evaluated per vectorized pass
+
+    Output
+    ------
+        -dict of (mix, pct) arrays 'cost_kwh' (₱ / kWh), 'end_expense' (₱), 'end_emissions' (tCO2) and
+         'end_re_pct', plus 'weights', 'desired_pct', 'cheapest' (pct,) the lowest cost mix at each
+         pct and 'frontier', the non_dominated() flat indices
+    """
+    re_mask = np.asarray(inputs['re_mask'], dtype=bool)
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    desired_pcts = np.asarray(desired_pcts, dtype=float)
+    full = np.zeros((len(weights), len(re_mask)))
+    full[:, re_mask] = weights
+
+    out = {k: np.empty((len(weights), len(desired_pcts))) for k in ['end_expense', 'end_emissions', 'end_re_pct']}
+    for start in range(0, len(weights), chunk_size):
+        grid = engine.scenario_grid(weights=full[start:start + chunk_size], desired_pct=desired_pcts / 100, **inputs)
+        for k in out:
+            out[k][start:start + chunk_size] = grid[k]
+
+    out['cost_kwh'] = out['end_expense'] / float(inputs['end_demand']) / 1000
+    out['weights'] = weights
+    out['desired_pct'] = desired_pcts
+    out['cheapest'] = out['cost_kwh'].argmin(axis=0)
+    out['frontier'] = non_dominated(out['cost_kwh'].ravel(), out['end_emissions'].ravel())
+    return out
@@ -1,32 +1,105 @@
 import dash
-import dash_table
-import dash_daq as daq
-import dash_core_components as dcc
-import dash_html_components as html
-from dash.dependencies import Output, Input, State
+from dash.dependencies import Output, Input, State, ClientsideFunction
+from dash.exceptions import NonExistentIdException
 import plotly.graph_objs as go
 import pandas as pd
+import numpy as np
 import plotly.tools as tls
 import plotly.io as pio
+import plotly
 import json as json_func
+import os
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~ Set up server ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-# --- Theming ---
-pio.templates.default = 'seaborn'
-
 # --- Module Imports ---
 import resources
-import layout
+import cache
+import engine
+import montecarlo
+import sensitivity
+import frontier
+import templates
+import profiles
+import metrics
+import wire
+import static
 
 # --- Initialize App ---
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, assets_folder=static.folder()) #assets/ minified and fingerprinted, see static.py
+static.serve(app)
+metrics.instrument(app) #per-callback timings on /metrics when RPS_METRICS=1, before any callback is registered
 
-# --- Set Name and Layout ---
+# --- Set Name ---
 app.title = 'CEIA RPS Calculator'
-app.layout = layout.html_obj
+
+# --- Deferred Startup ---
+# The layout tree (and the component libraries it imports) and the plotly theme are built on
+# the first request rather than at import, which keeps gunicorn worker boot short.
+# Dash can only check callback ids against a layout that already exists, so that check is
+# suppressed at registration and done once in serve_layout() instead.
+app.config.suppress_callback_exceptions = True
+
+def callback_ids():
+    """Component ids referenced by every registered callback."""
+    ids = set()
+    for output, spec in app.callback_map.items():
+        ids.update(o.rsplit('.', 1)[0] for o in output.strip('.').split('...'))
+        ids.update(d['id'] for d in spec['inputs'] + spec['state'])
+    return ids
+
+_layout = []
+
+def serve_layout():
+    """Build the layout on first use, then serve the same tree."""
+    if not _layout:
+        load_theme() #figures built into the layout use the theme
+        import layout
+        layout_ids = {c.id for c in layout.html_obj._traverse() if getattr(c, 'id', None)}
+        missing = callback_ids() - layout_ids
+        if missing:
+            raise NonExistentIdException('Callbacks reference ids missing from the layout: {}'.format(sorted(missing)))
+        _layout.append(layout.html_obj)
+    return _layout[0]
+
+@app.server.before_first_request
+def load_theme():
+    pio.templates.default = 'seaborn'
+
+_theme = []
+
+def theme_template():
+    """The plotly theme as a plain dict, for figures returned as dicts rather than go.Figure."""
+    if not _theme:
+        load_theme()
+        _theme.append(pio.templates[pio.templates.default].to_plotly_json())
+    return _theme[0]
+
+# --- Clientside Callbacks ---
+# Outputs that only format data already in the browser run as JavaScript (rps.* in
+# assets/clientside.js) instead of a request to the server. The Python functions stay the
+# reference implementation, and RPS_CLIENTSIDE=0 registers them as ordinary callbacks.
+CLIENTSIDE = os.environ.get('RPS_CLIENTSIDE', '1') != '0'
+
+def browser_callback(func, output, inputs, state=(), client_state=(State('text_templates', 'data'),)):
+    """
+    Register func in the browser, or on the server when CLIENTSIDE is off.
+
+    Input
+    -----
+        -func (function): Python implementation, its name is the rps.<name> JavaScript function
+        -output (Output), inputs (list of Input), state (list of State): as for app.callback
+        -client_state (list of State): extra arguments for the JavaScript version only,
+            by default templates.TEXT from the text_templates store
+    """
+    if CLIENTSIDE:
+        app.clientside_callback(ClientsideFunction('rps', func.__name__), output, list(inputs),
+                                list(state) + list(client_state))
+    else:
+        app.callback(output, list(inputs), list(state))(func)
+    return func
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~ Non-Callbacks ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -55,82 +128,66 @@ def rps_df_maker(demand, demand_growth, future_procurement, fit_pct,
         -annual_rps_inc_2020 (float): pct RPS requirement in 2020 (set at 1%)
         -annual_rps_inc_2023 (float): pct RPS requirement between 2023 and 2030
         -end_year (int): last year of RPS.  
-    """
-    daterange = pd.date_range(start = '2018', end = str(end_year), freq = 'Y')
-
-    df = pd.DataFrame(index = daterange)
-
-    df['year'] = df.index.year
-    df = df.set_index('year')
-
-    df['demand_growth'] = demand_growth + 1
-    df.loc[2018, 'demand_growth'] = 1
-    df['demand_growth'] = df['demand_growth'].cumprod()
-    df['demand'] = demand * df['demand_growth']
-
-    df.loc[2020:2022,'rps_marginal_req'] = annual_rps_inc_2020 #no requirement till 2020
-    df.loc[2023:, 'rps_marginal_req'] = annual_rps_inc_2023 #presidential elections in 2022
-    df['rps_req'] = df['rps_marginal_req'].cumsum()
-
-    df = df.fillna(0)
-
-    # --- Calculate FIT MWs (static, only based on first year) --- 
-    df['fit_MWh'] = fit_pct * demand / 100
-
-    future_procurement = future_procurement.groupby(['Online Year'], as_index=False)['generation'].sum()
-    future_procurement = future_procurement.rename({'Online Year':'year'}, axis='columns')
-    future_procurement = future_procurement.set_index('year')
-    dummy_years = df.copy() #for forward fill join
-    dummy_years = dummy_years.drop(dummy_years.columns, axis='columns')
-    future_procurement = dummy_years.merge(future_procurement, left_index=True, right_index=True, how='outer').sort_index()
-    future_procurement = future_procurement.fillna(0)
-    future_procurement['generation'] = future_procurement['generation'].cumsum()
 
-    df['future_procurement'] = future_procurement['generation']
-
-    demand_for_calc = df['demand'].copy()
-    demand_for_calc.index = [i + 1 for i in demand_for_calc.index]
-    demand_for_calc.loc[2018] = 0
-    demand_for_calc.loc[2019] = 0
-    demand_for_calc.loc[2020] = df['demand'][2018]
-    demand_for_calc = demand_for_calc.sort_index()
-    df['demand_for_calc'] = demand_for_calc
-
-    # --- clip RPS requirement to 100% ---
-    df['rps_req'] = df['rps_req'].clip(upper=1)
-
-    df['rec_req'] = df['rps_req'] * df['demand_for_calc']
-    fit_requirement_MW = df['fit_MWh'].copy()
-    fit_requirement_MW[2018] = 0
-    fit_requirement_MW[2019] = 0
-    df['rec_req'] = df['rec_req'] + fit_requirement_MW
-
-    df['rec_created'] = df['fit_MWh'] + df['future_procurement']
+    The math lives in engine.rps_single, this is the DataFrame adapter used by the callbacks.
+    """
+    ledger = engine.rps_single(demand=demand, demand_growth=demand_growth, fit_pct=fit_pct,
+                               annual_rps_inc_2020=annual_rps_inc_2020, annual_rps_inc_2023=annual_rps_inc_2023,
+                               end_year=end_year, online_year=future_procurement['Online Year'].values,
+                               generation=future_procurement['generation'].values)
+    df = ledger.to_frame()
 
-    df['rec_change'] = df['rec_created'] - df['rec_req']
+    return df
 
-    # --- Calculate cumulative production and sales --- 
-    df['rec_cum_production'] = df['rec_created'].cumsum()
-    df['rec_cum_withdraws'] = df['rec_req'].cumsum()
+def procurement_digest(future_procurement):
+    """Canonical hash of planned procurement: total generation by online year, ignoring row order, blank rows and unused CFs."""
+    years = future_procurement['Online Year'].values.astype(float)
+    generation = np.nan_to_num(future_procurement['generation'].values.astype(float))
+    valid = ~np.isnan(years)
+    unique_years, idx = np.unique(years[valid], return_inverse=True)
+    totals = np.bincount(idx, weights=generation[valid], minlength=len(unique_years))
+    return cache.content_key([(float(y), round(float(t), 6)) for y, t in zip(unique_years, totals) if t != 0])
 
-    # --- Annual expirations based on three-year old surplus --- 
-    df['rec_expired'] = df['rec_created'].shift(3, fill_value=0) - df['rec_req'].shift(3, fill_value=0)
-    df['rec_expired'] = df['rec_expired'].clip(0) #no negative surpluses
-    df.loc[df.index < 2023, 'rec_expired'] = 0 #Assuming that RECs from transition period will be spent
-    df['rec_cum_expired'] = df['rec_expired'].cumsum() #cumulative expirations
+# --- Server-side Store ---
+_producers = dict()
 
-    # --- Total inventory is difference of cumulatives ---
-    df['end_rec_balance'] = df['rec_cum_production'] - df['rec_cum_withdraws'] - df['rec_cum_expired']
+def producer(func):
+    """Register a function whose results can be kept server-side with store_result()."""
+    _producers[func.__name__] = func
+    return func
 
-    # --- clip rec_balance --- 
-    df['end_rec_balance'] = df['end_rec_balance'].clip(0)
-    df['begin_rec_balance'] = df['end_rec_balance'].shift(1).fillna(0)
+def store_result(func, *args):
+    """
+    Compute func(*args) into cache.results and return the token kept in the dcc.Store.
 
-    # --- Calculate Annual REC Need (purchase requirements)---
-    df['rec_shortfall'] = (df['begin_rec_balance'] + df['rec_created'] - df['rec_req'] - df['rec_expired']) * -1
-    df['rec_shortfall'] = df['rec_shortfall'].clip(0)
+    The browser only holds the content key and what a gunicorn worker that never saw the result,
+    or already evicted it, needs to get it back: the result in a compact columnar encoding,
+    projected to STORE_COLUMNS, or the callback inputs to rebuild it from (see wire.py).
+    """
+    key = cache.content_key(func.__name__, args)
+    value = cache.results.get(key)
+    if value is None:
+        value = func(*args)
+        cache.results.set(key, value)
+    return wire.token(key, func.__name__, args, value, columns=STORE_COLUMNS.get(func.__name__), measure=metrics.ENABLED)
+
+def load_result(token):
+    """
+    Return the object behind a store token. Results are shared, copy before mutating.
 
-    return df
+    Tokens come back from the browser, so a miss only rebuilds a result for a registered producer
+    and a key the server derives itself, otherwise one session could fill the shared cache for all.
+    Raises ValueError for a token that fails these checks.
+    """
+    value = cache.results.get(token['key'])
+    if value is None:
+        if token.get('producer') not in _producers:
+            raise ValueError('store token names an unknown producer {!r}'.format(token.get('producer')))
+        if 'args' in token and token['key'] != cache.content_key(token['producer'], token['args']):
+            raise ValueError('store token key does not match its arguments')
+        value = wire.restore(token, _producers)
+        cache.results.set(token['key'], value)
+    return value
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~ Data Input ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -154,21 +211,12 @@ def growth_mw_updater(utility):
     output = resources.utility_dict[utility]['growth_floor'] * 100 #scaled to 100
     return output
 
-@app.callback(
-    Output("future_procurement_df", "data"),
-    [   
-        Input("future_procurement_table","data"),
-        Input("future_procurement_table","columns"),
-        Input("solar_cf", "value"),
-        Input("dpv_cf", "value"),
-        Input("wind_cf", "value"),
-        Input("geothermal_cf", "value"),
-        Input("biomass_cf", "value"),
-        Input("hydro_cf", "value"),
-    ])
-def future_procurement_generation(future_procurement_rows, future_procurement_columns,
-                                    solar_cf, dpv_cf, wind_cf, geothermal_cf, biomass_cf, hydro_cf):
-    """Update df of future RE procurement."""
+MONTH_COLUMNS = ['generation_{}'.format(m) for m in profiles.MONTHS]
+
+@producer
+def future_procurement_frame(future_procurement_rows, future_procurement_columns,
+                                solar_cf, dpv_cf, wind_cf, geothermal_cf, biomass_cf, hydro_cf, generation_profile=profiles.FLAT):
+    """Df of future RE procurement with annual generation, and its monthly split from the generation profile."""
     future_procurement = pd.DataFrame(future_procurement_rows, columns=[c['name'] for c in future_procurement_columns])
     future_procurement = future_procurement.loc[future_procurement['Generation Source'].isin(resources.re_tech)]
     future_procurement = future_procurement.groupby(['Generation Source', 'Online Year'], as_index=False)['Capacity (MW)'].sum()
@@ -187,32 +235,125 @@ def future_procurement_generation(future_procurement_rows, future_procurement_co
                
     future_procurement['cf'] = future_procurement['Generation Source'].map(cf_dict)
     future_procurement['cf'] = future_procurement['cf'] / 100
-    future_procurement['generation'] = future_procurement['Capacity (MW)'] * future_procurement['cf'] * 8760
-    return future_procurement.to_json()
+    tech = future_procurement['Generation Source'].map(resources.cf_slider_dict).map(profiles.TECHS.index)
+    annual, monthly = profiles.generation(future_procurement['Capacity (MW)'].values, future_procurement['cf'].values,
+                                          tech.values, generation_profile or profiles.FLAT)
+    future_procurement['generation'] = annual
+    for i, c in enumerate(MONTH_COLUMNS):
+        future_procurement[c] = monthly[:, i]
+    return future_procurement
 
+@app.callback(
+    Output("future_procurement_df", "data"),
+    [   
+        Input("future_procurement_table","data"),
+        Input("future_procurement_table","columns"),
+        Input("solar_cf", "value"),
+        Input("dpv_cf", "value"),
+        Input("wind_cf", "value"),
+        Input("geothermal_cf", "value"),
+        Input("biomass_cf", "value"),
+        Input("hydro_cf", "value"),
+        Input("generation_profile", "value"),
+    ])
+def future_procurement_generation(future_procurement_rows, future_procurement_columns,
+                                    solar_cf, dpv_cf, wind_cf, geothermal_cf, biomass_cf, hydro_cf, generation_profile):
+    """Update df of future RE procurement."""
+    return store_result(future_procurement_frame, future_procurement_rows, future_procurement_columns,
+                        solar_cf, dpv_cf, wind_cf, geothermal_cf, biomass_cf, hydro_cf, generation_profile)
 
 @app.callback(
-    Output("desired_pct","value"),
     [
-        Input('intermediate_df','data'),
-        Input('energy_mix_table','data'),
-        Input('energy_mix_table', 'columns')
+        Output('generation_profile', 'options'),
+        Output('generation_profile', 'value'),
+        Output('profile_upload_text', 'children')
+    ],
+    [Input('profile_upload', 'contents')],
+    [
+        State('profile_upload', 'filename'),
+        State('generation_profile', 'options')
     ]
 )
-def desired_pct_updater(json, rows, columns):
-    df = pd.read_json(json)
+def profile_uploader(contents, filename, options):
+    """Store an uploaded 8760-hour profile and select it, or explain why it was rejected."""
+    if contents is None:
+        return dash.no_update, dash.no_update, ''
+    try:
+        profile = profiles.from_upload(contents)
+    except ValueError as e:
+        return dash.no_update, dash.no_update, 'Could not use **{}**: {}.'.format(filename, e)
+    if profile not in [o['value'] for o in options]:
+        options = options + [{'label': 'Uploaded: {}'.format(filename), 'value': profile}]
+    return options, profile, 'Using **{}**.'.format(filename)
+
+
+def parse_energy_mix(rows, columns):
+    """
+    Validate energy_mix_table once, returns (mix, error).
+
+    mix has the technologies in table order and their cost and mix arrays, error is None or a
+    message for the user. A mix of all zeros is an error, any other sum stays a warning.
+    """
+    names = [c['name'] for c in columns]
+    sources = [str(r.get('Generation Source', '')).strip() for r in rows]
+    values = dict()
+    for key, col in [('lcoe', 'Levelized Cost of Energy (₱ / kWh)'), ('mix_pct', 'Percent of Utility Energy Mix')]:
+        if col not in names:
+            return None, 'Please restore the {} column.'.format(col)
+        values[key] = pd.to_numeric(pd.Series([r.get(col) for r in rows], dtype=object), errors='coerce').values.astype(float)
+
+    bad = [s for s, l, m in zip(sources, values['lcoe'], values['mix_pct']) if not (l >= 0 and m >= 0)]
+    if bad:
+        return None, 'Please enter a non-negative number for both the cost and the percent of **{}**.'.format(', '.join(bad))
+    missing = [s for s in resources.required_mix_sources if s not in sources]
+    if missing:
+        return None, 'Please keep a row for **{}** in the energy mix table.'.format(', '.join(missing))
+    if len(set(sources)) != len(sources):
+        return None, 'Please list each Generation Source only once in the energy mix table.'
+    if not values['mix_pct'].sum() > 0:
+        return None, 'Please enter the percent of your utility energy mix for at least one Generation Source.'
+
+    return {'sources': sources, 'lcoe': values['lcoe'].tolist(), 'mix_pct': values['mix_pct'].tolist()}, None
+
+def mix_value(mix, key, source):
+    """Cost ('lcoe') or share ('mix_pct') of one technology from the energy_mix store."""
+    return mix[key][mix['sources'].index(source)]
 
-    lcoe_df = pd.DataFrame(rows, columns=[c['name'] for c in columns])
+@app.callback(
+    [
+        Output('energy_mix', 'data'),
+        Output('energy_mix_error_text', 'children')
+    ],
+    [
+        Input('energy_mix_table', 'data'),
+        Input('energy_mix_table', 'columns')
+    ]
+)
+def energy_mix_normalizer(rows, columns):
+    """
+    Parse energy_mix_table into the energy_mix store every other callback reads.
 
-    cols = lcoe_df.columns.drop('Generation Source')
-    lcoe_df[cols] = lcoe_df[cols].apply(pd.to_numeric, errors='coerce') #convert all columns to numeric
+    An invalid edit leaves the store untouched, so nothing downstream recomputes, and explains why.
+    """
+    mix, error = parse_energy_mix(rows, columns)
+    if error is not None:
+        return dash.no_update, error
+    return mix, energy_mix_text(mix)
 
-    starting_demand = list(df['demand'])[0]
-    lcoe_df['current_MWh'] = lcoe_df['Percent of Utility Energy Mix'] * starting_demand
+@app.callback(
+    Output("desired_pct","value"),
+    [
+        Input('intermediate_df','data'),
+        Input('energy_mix','data')
+    ]
+)
+def desired_pct_updater(token, mix):
+    df = load_result(token)
 
     re_tech = ['Utility-Scale Solar','Net-Metering','GEOP','Feed-in-Tariff','Wind','Geothermal','Biomass','Hydro']
-    start_re = lcoe_df.loc[lcoe_df['Generation Source'].isin(re_tech)]['current_MWh'].sum()
-    start_re_pct = start_re / lcoe_df['current_MWh'].sum()
+    mix_pct = np.array(mix['mix_pct'])
+    start_re = mix_pct[[s in re_tech for s in mix['sources']]].sum()
+    start_re_pct = start_re / mix_pct.sum()
 
     # rps_min_increase = df['rec_req'].sum() / df['demand'].sum()
     rps_min_increase = df['rps_marginal_req'].sum()
@@ -224,6 +365,47 @@ def desired_pct_updater(json, rows, columns):
 #~~~~~~~~~~~~~~~~~~~~~~ Data Processing ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
+def shelf_life_value(rec_shelf_life):
+    """REC shelf life from the UI input, the default while the box is empty."""
+    return max(int(rec_shelf_life or engine.REC_SHELF_LIFE), 1)
+
+def rps_inputs_key(demand, demand_growth, future_procurement, fit_pct, annual_rps_inc_2020, annual_rps_inc_2023,
+                   rec_expiry, rec_shelf_life):
+    """Content key of everything the RPS ledger depends on except end_year, from raw UI inputs."""
+    return cache.content_key(float(demand), float(demand_growth) / 100, procurement_digest(future_procurement), float(fit_pct),
+                             float(annual_rps_inc_2020) / 100, float(annual_rps_inc_2023) / 100,
+                             rec_expiry, shelf_life_value(rec_shelf_life))
+
+@producer
+def rps_frame(demand, demand_growth, future_procurement_token,
+                fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year, rec_expiry='approximate', rec_shelf_life=None):
+    """Df with RPS req info, from raw UI inputs."""
+    future_procurement = load_result(future_procurement_token)
+    inputs_key = rps_inputs_key(demand, demand_growth, future_procurement, fit_pct, annual_rps_inc_2020, annual_rps_inc_2023,
+                                rec_expiry, rec_shelf_life)
+
+    demand_growth = float(demand_growth) / 100
+    annual_rps_inc_2020 = float(annual_rps_inc_2020) / 100
+    annual_rps_inc_2023 = float(annual_rps_inc_2023) / 100
+    end_year = int(end_year) + 1
+
+    # --- Repeat scenarios come straight from the memo ---
+    key = cache.content_key(inputs_key, end_year)
+    df = cache.rps_memo.get(key)
+    if df is None:
+        # --- A new horizon extends or truncates the longest ledger already computed for these inputs ---
+        previous = cache.ledger_state.get(inputs_key)
+        ledger = engine.rps_single(demand=demand, demand_growth=demand_growth, fit_pct=fit_pct,
+                                   annual_rps_inc_2020=annual_rps_inc_2020, annual_rps_inc_2023=annual_rps_inc_2023,
+                                   end_year=end_year, online_year=future_procurement['Online Year'].values,
+                                   generation=future_procurement['generation'].values, previous=previous,
+                                   expiry=rec_expiry, shelf_life=shelf_life_value(rec_shelf_life))
+        if previous is None or len(ledger.year) > len(previous.year):
+            cache.ledger_state.set(inputs_key, ledger)
+        df = round(ledger.to_frame(), 3)
+        cache.rps_memo.set(key, df)
+    return df
+
 @app.callback(
     Output("intermediate_df", "data"),
     [
@@ -234,22 +416,47 @@ def desired_pct_updater(json, rows, columns):
         Input("annual_rps_inc_2020", "value"),
         Input("annual_rps_inc_2023", "value"),
         Input("end_year", "value"),
-    ])
-def df_initializer(demand, demand_growth, json,
-                    fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year):
-    """Initialize df with RPS req info."""
-    future_procurement = pd.read_json(json)
-
-    demand_growth = float(demand_growth) / 100
-    annual_rps_inc_2020 = float(annual_rps_inc_2020) / 100
-    annual_rps_inc_2023 = float(annual_rps_inc_2023) / 100
-    end_year = int(end_year) + 1
+        Input("rec_expiry", "value"),
+        Input("rec_shelf_life", "value"),
+    ],
+    [State("intermediate_df", "data")])
+def df_initializer(demand, demand_growth, token,
+                    fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year, rec_expiry, rec_shelf_life, current):
+    """
+    Initialize df with RPS req info.
 
-    df = rps_df_maker(demand=demand, demand_growth=demand_growth, future_procurement=future_procurement, fit_pct=fit_pct,
-                    annual_rps_inc_2020=annual_rps_inc_2020, annual_rps_inc_2023=annual_rps_inc_2023,
-                    end_year=end_year)
-    df = round(df, 3)
-    return df.to_json()
+    When an edit leaves the ledger's inputs unchanged (i.e. a blank procurement row, or a CF slider
+    no planned plant uses), the store is left alone so nothing downstream recomputes.
+    """
+    inputs_key = rps_inputs_key(demand, demand_growth, load_result(token), fit_pct, annual_rps_inc_2020, annual_rps_inc_2023,
+                                rec_expiry, rec_shelf_life)
+    ledger_key = cache.content_key(inputs_key, int(end_year))
+    if current is not None and current.get('ledger_key') == ledger_key:
+        return dash.no_update
+    return dict(store_result(rps_frame, demand, demand_growth, token,
+                             fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year, rec_expiry, rec_shelf_life),
+                ledger_key=ledger_key)
+
+@producer
+def capacity_frame(token, solar_cf, dpv_cf, wind_cf, geothermal_cf, biomass_cf, hydro_cf):
+    """Df of capacity needs, by multiplying against a capacity factor."""
+    df = load_result(token)
+
+    rec_incremental_req = df['rec_shortfall'].diff(1).cumsum()
+
+    # --- One (year x technology) matrix instead of a row-wise apply per technology ---
+    need_cols = ['Utility-Scale Solar_Need','Distributed PV_Need', 'Geothermal_Need','Wind_Need','Biomass_Need','Hydro_Need']
+    capacity_factors = [solar_cf, dpv_cf, geothermal_cf, wind_cf, biomass_cf, hydro_cf]
+    need = engine.capacity_need(rec_incremental_req.values, capacity_factors)
+
+    dfout = pd.DataFrame(need, index=df.index, columns=need_cols)
+    dfout['end_rec_balance'] = df['end_rec_balance']
+    dfout['rec_incremental_req'] = rec_incremental_req
+    for c in ['rec_shortfall', 'rec_req', 'rec_change']:
+        dfout[c] = df[c]
+    dfout = round(dfout, 2)
+
+    return dfout
 
 @app.callback(
     Output('intermediate_df_capacity', 'data'),
@@ -264,129 +471,205 @@ def df_initializer(demand, demand_growth, json,
 
     ]
 )
-def df_capacity_updater(json, solar_cf, dpv_cf, wind_cf, geothermal_cf, biomass_cf, hydro_cf):
+def df_capacity_updater(token, solar_cf, dpv_cf, wind_cf, geothermal_cf, biomass_cf, hydro_cf):
     """Update capacity needs by multiplying against a capacity factor."""
-    df = pd.read_json(json)
-    def new_capacity_calc(row, capacity_factor):
-        mwh_Need = abs(row['rec_incremental_req'])
-        mw_Need = (abs(mwh_Need) / 8760) / (capacity_factor/100)
-        return mw_Need
+    return store_result(capacity_frame, token, solar_cf, dpv_cf, wind_cf, geothermal_cf, biomass_cf, hydro_cf)
+
+
+# --- Columns each store's consumers read, the rest is left out of columnar tokens (None keeps all) ---
+STORE_COLUMNS = {
+    'future_procurement_frame': ['Generation Source', 'Online Year', 'Capacity (MW)', 'cf', 'generation'] + MONTH_COLUMNS,
+    'rps_frame': ['demand', 'rps_marginal_req', 'rps_req', 'fit_MWh', 'future_procurement', 'rec_req', 'rec_created',
+                  'rec_change', 'rec_expired', 'end_rec_balance', 'begin_rec_balance', 'rec_shortfall'],
+    'capacity_frame': ['Utility-Scale Solar_Need', 'Distributed PV_Need', 'Geothermal_Need', 'Wind_Need', 'Biomass_Need',
+                       'Hydro_Need', 'rec_shortfall'],
+}
+
+def scenario_inputs(df, future_procurement, mix):
+    """Source-aligned arrays for engine.scenario_grid from the RPS df, procurement df and energy_mix store."""
+    sources = list(mix['sources'])
+    starting_demand = int(list(df['demand'])[0])
+    planned = future_procurement.groupby('Generation Source')['generation'].sum()
+
+    return dict(
+        sources=sources,
+        lcoe=np.array(mix['lcoe'], dtype=float),
+        current_mwh=(np.array(mix['mix_pct'], dtype=float) / 100) * starting_demand,
+        planned=planned.reindex(sources).fillna(0).values.astype(float),
+        re_mask=np.array([s in resources.re_tech for s in sources]),
+        fossil_mask=np.array([s in resources.fossil_tech for s in sources]),
+        emission_factors=np.array([resources.emissions_dict.get(s, 0) for s in sources], dtype=float),
+        end_demand=list(df.demand)[-1],
+        start_recs=list(df.rec_change)[0],
+    )
+
+@producer
+def scenario_results(token1, token2, mix, desired_pct, scenario_tag):
+    """Calc final year RE pct, costs, etc., returns the summary dict and the scenario lcoe_df."""
+    df = load_result(token1)
+    future_procurement = load_result(token2)
+
+    inputs = scenario_inputs(df, future_procurement, mix)
+    sources = inputs.pop('sources')
+    scenario = resources.scenario_pct_dict[scenario_tag]
 
-    df['rec_incremental_req'] = df['rec_shortfall'].diff(1)
-    df['rec_incremental_req'] = df['rec_incremental_req'].cumsum()
+    outcome = engine.scenario_outcome(weights=[scenario.get(s, 0) for s in sources], desired_pct=desired_pct/100,
+                                      start_demand=list(df.demand)[0], **inputs)
+
+    # --- Per-source detail, kept server-side ---
+    lcoe_df = pd.DataFrame({'Generation Source': sources,
+                            'Levelized Cost of Energy (₱ / kWh)': inputs['lcoe'],
+                            'current_MWh': outcome.current_mwh,
+                            'fuel_emissions': inputs['emission_factors'],
+                            'planned_generation': inputs['planned'],
+                            'future_generation': outcome.future_generation})
+    lcoe_df['start_price'] = lcoe_df['Levelized Cost of Energy (₱ / kWh)'] * lcoe_df['current_MWh'] * 1000
+    lcoe_df['emissions'] = lcoe_df['fuel_emissions'] * lcoe_df['current_MWh']
+    lcoe_df['future_price'] = lcoe_df['Levelized Cost of Energy (₱ / kWh)'] * lcoe_df['future_generation'] * 1000
+    lcoe_df['future_emissions'] = lcoe_df['fuel_emissions'] * lcoe_df['future_generation']
 
-    df['Utility-Scale Solar_Need'] = df.apply(new_capacity_calc, args=([solar_cf]), axis = 1)
-    df['Distributed PV_Need'] = df.apply(new_capacity_calc, args=([dpv_cf]), axis = 1)
-    df['Geothermal_Need'] = df.apply(new_capacity_calc, args=([geothermal_cf]), axis = 1)
-    df['Hydro_Need'] = df.apply(new_capacity_calc, args=([hydro_cf]), axis = 1)
-    df['Wind_Need'] = df.apply(new_capacity_calc, args=([wind_cf]), axis = 1)
-    df['Biomass_Need'] = df.apply(new_capacity_calc, args=([biomass_cf]), axis = 1)
+    output_dict = dict()
+    output_dict['start_year'] = int(list(df.index)[0])
+    output_dict['start_demand'] = int(list(df.demand)[0])
+    output_dict['start_re'] = int(outcome.start_re)
+    output_dict['start_recs'] = int(list(df.rec_change)[0]) #RECs currently being created
+    output_dict['start_re_pct'] = float(round(outcome.start_re_pct, 2))
+    output_dict['start_expense'] = int(round(outcome.start_expense, 0))
+    output_dict['start_emissions'] = int(round(outcome.start_emissions, 0)) #tCO2
+    output_dict['start_generation_list'] = [int(i) for i in outcome.current_mwh]
+    output_dict['end_year'] = int(list(df.index)[-1])
+    output_dict['end_demand'] = int(list(df.demand)[-1])
+    output_dict['end_re'] = int(outcome.end_re)
+    output_dict['end_recs'] = float(outcome.end_recs)
+    output_dict['end_re_pct'] = float(outcome.end_re_pct)
+    output_dict['end_expense'] = int(outcome.end_expense)
+    output_dict['end_emissions'] = int(round(outcome.end_emissions, 0))
+    output_dict['end_generation_list'] = [int(i) for i in outcome.future_generation]
+    output_dict['techs'] = sources
+    output_dict['rps_min_increase'] = df['rps_marginal_req'].sum()
 
-    df = df[['Utility-Scale Solar_Need','Distributed PV_Need', 'Geothermal_Need','Wind_Need','Biomass_Need','Hydro_Need','end_rec_balance','rec_incremental_req', 'rec_shortfall', 'rec_req', 'rec_change']]
-    df = round(df, 2)
+    return output_dict, lcoe_df
 
-    return df.to_json()
+def scenario_batch(token1, token2, mix, desired_pcts=None, scenario_tags=None):
+    """
+    Evaluate scenario mixes across desired renewable percentages in one vectorized call.
 
+    Input
+    -----
+        -token1, token2: intermediate_df and future_procurement_df store tokens
+        -mix (dict): energy_mix store
+        -desired_pcts (list): desired RE pct values (defaults to the desired_pct slider, 10-100 by 0.5)
+        -scenario_tags (list): keys of resources.scenario_pct_dict (defaults to all of them)
+
+    Output
+    ------
+        -dict with 'scenario_tags', 'desired_pct' and (scenario, desired_pct) arrays of
+         'end_expense', 'end_re_pct', 'end_recs' and 'end_emissions'
+    """
+    if desired_pcts is None:
+        desired_pcts = np.arange(10, 100.5, 0.5)
+    if scenario_tags is None:
+        scenario_tags = list(resources.scenario_pct_dict.keys())
+
+    inputs = scenario_inputs(load_result(token1), load_result(token2), mix)
+    sources = inputs.pop('sources')
+    weights = [[resources.scenario_pct_dict[t].get(s, 0) for s in sources] for t in scenario_tags]
+
+    grid = engine.scenario_grid(weights=weights, desired_pct=np.asarray(desired_pcts, dtype=float) / 100, **inputs)
+
+    output_dict = {k: grid[k] for k in ['end_expense', 'end_re_pct', 'end_recs', 'end_emissions']}
+    output_dict['scenario_tags'] = list(scenario_tags)
+    output_dict['desired_pct'] = np.asarray(desired_pcts, dtype=float)
+    return output_dict
 
 @app.callback(
     Output('intermediate_dict_scenario','data'),
     [
     Input('intermediate_df','data'),
     Input('future_procurement_df','data'),
-    Input('energy_mix_table','data'),
-    Input('energy_mix_table', 'columns'),
+    Input('energy_mix','data'),
     Input('desired_pct','value'),
     Input('scenario_radio','value'),
     ]
 )
-def scenario_dict_maker(json1, json2, rows, columns, desired_pct, scenario_tag): #remember to define optimization 
-    """Calc final year RE pct, costs, etc., package as a json."""
-    df = pd.read_json(json1)
-    future_procurement = pd.read_json(json2)
-
-    starting_demand = int(list(df['demand'])[0])
-
-    lcoe_df = pd.DataFrame(rows, columns=[c['name'] for c in columns])
-    cols = lcoe_df.columns.drop(['Generation Source'])
-    lcoe_df[cols] = lcoe_df[cols].apply(pd.to_numeric, errors='coerce') #convert all columns to numeric
-
-    desired_pct = desired_pct/100
-
-    start_year = list(df.index)[0]
-    end_year = list(df.index)[-1]
-    start_demand = list(df.demand)[0]
-    end_demand = list(df.demand)[-1]
-    start_recs = list(df.rec_change)[0] #RECs currently being created
+def scenario_dict_maker(token1, token2, mix, desired_pct, scenario_tag): #remember to define optimization 
+    """Calc final year RE pct, costs, etc., package as a json. The scenario lcoe_df stays server-side."""
+    token = store_result(scenario_results, token1, token2, mix, desired_pct, scenario_tag)
+    output_dict = dict(load_result(token)[0])
+    output_dict['scenario_lcoe_df'] = token
 
-    lcoe_df['current_MWh'] = (lcoe_df['Percent of Utility Energy Mix'] / 100) * starting_demand
+    return json_func.dumps(output_dict)
 
-    lcoe_df['start_price'] = lcoe_df['Levelized Cost of Energy (₱ / kWh)'] * lcoe_df['current_MWh'] * 1000
-    
-    lcoe_df['fuel_emissions'] = lcoe_df['Generation Source'].map(resources.emissions_dict)
-    lcoe_df['emissions'] = lcoe_df['fuel_emissions'] * lcoe_df['current_MWh']
 
-    # --- Merge on planned procurement ---
-    future_procurement = future_procurement.groupby('Generation Source', as_index=False)['generation'].sum()
-    lcoe_df = lcoe_df.merge(future_procurement, on=['Generation Source'], how = 'left')
-    lcoe_df['generation'] = lcoe_df['generation'].fillna(0)
-    lcoe_df = lcoe_df.rename({'generation':'planned_generation'}, axis='columns')
-
-    start_re = lcoe_df.loc[lcoe_df['Generation Source'].isin(resources.re_tech)]['current_MWh'].sum()
-    start_re_pct = round(start_re / start_demand,2)
-    start_expense = round(lcoe_df['start_price'].sum(),0)
-    start_fossil = lcoe_df.loc[lcoe_df['Generation Source'].isin(resources.fossil_tech)]['current_MWh'].sum()
-
-    planned_re = lcoe_df['planned_generation'].sum()
-    new_re_Need = (end_demand  * desired_pct) - start_re - planned_re #include losses, because this is interms of generation pct, not RECS
-    new_re_Need = max(new_re_Need, 0)
-    fossil_Need = end_demand - new_re_Need - start_re - planned_re
+def uncertainty_base(demand, demand_growth, fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year,
+                     future_procurement, mix, desired_pct, scenario_tag, rec_expiry='approximate', rec_shelf_life=None):
+    """Deterministic case for montecarlo.run, from the same UI values as rps_frame and scenario_results."""
+    sources = list(mix['sources'])
     scenario = resources.scenario_pct_dict[scenario_tag]
 
-    curr_total_fossil_gen = lcoe_df.loc[lcoe_df['Generation Source'].isin(resources.fossil_tech), 'current_MWh'].sum() #df of fossil fuels
-    fossil_discrepancy = fossil_Need - curr_total_fossil_gen #if negative, indicates the amount that can be retired, if positive, the amount of new fossil gen needed
-
-    lcoe_df['future_generation'] = 0
-    for f in resources.re_tech:
-        current_gen_f = lcoe_df.loc[lcoe_df['Generation Source'] == f, 'current_MWh'][0:1].item()
-        if f in scenario.keys():
-            lcoe_df.loc[lcoe_df['Generation Source'] == f, 'future_generation'] = (scenario[f] * new_re_Need) + current_gen_f
-        else:
-            lcoe_df.loc[lcoe_df['Generation Source'] == f, 'future_generation'] = current_gen_f
-
-
-    for f in resources.fossil_tech:
-        current_pct_f = lcoe_df.loc[lcoe_df['Generation Source'] == f, 'current_MWh'][0:1].item() / start_fossil
-        lcoe_df.loc[lcoe_df['Generation Source'] == f, 'future_generation'] = fossil_Need * current_pct_f
-
-    # --- Add Planned RE Generation from input ---
-    lcoe_df['future_generation'] += lcoe_df['planned_generation']
-
-    lcoe_df['future_price'] = lcoe_df['Levelized Cost of Energy (₱ / kWh)'] * lcoe_df['future_generation'] * 1000
-    end_re = lcoe_df.loc[lcoe_df['Generation Source'].isin(resources.re_tech)]['future_generation'].sum()
-    end_recs = end_re - (start_re - start_recs)
-    end_re_pct = end_re / lcoe_df['future_generation'].sum()
+    return dict(
+        demand=float(demand),
+        demand_growth=float(demand_growth) / 100,
+        fit_pct=float(fit_pct),
+        annual_rps_inc_2020=float(annual_rps_inc_2020) / 100,
+        annual_rps_inc_2023=float(annual_rps_inc_2023) / 100,
+        end_year=int(end_year) + 1,
+        rec_expiry=rec_expiry,
+        rec_shelf_life=shelf_life_value(rec_shelf_life),
+        online_year=future_procurement['Online Year'].values.astype(float),
+        capacity=future_procurement['Capacity (MW)'].values.astype(float),
+        cf=future_procurement['cf'].values.astype(float),
+        cf_group=[resources.cf_sliders.index(resources.cf_slider_dict[s]) for s in future_procurement['Generation Source']],
+        n_cf_groups=len(resources.cf_sliders),
+        row_source=[sources.index(s) if s in sources else -1 for s in future_procurement['Generation Source']],
+        lcoe=np.array(mix['lcoe'], dtype=float),
+        mix_pct=np.array(mix['mix_pct'], dtype=float),
+        re_mask=np.array([s in resources.re_tech for s in sources]),
+        fossil_mask=np.array([s in resources.fossil_tech for s in sources]),
+        emission_factors=np.array([resources.emissions_dict.get(s, 0) for s in sources], dtype=float),
+        weights=[scenario.get(s, 0) for s in sources],
+        desired_pct=float(desired_pct) / 100,
+    )
 
+@app.callback(
+    Output('uncertainty_bands','data'),
+    [
+    Input('mc_toggle','value'),
+    Input('demand','value'),
+    Input('demand_growth','value'),
+    Input('fit_pct','value'),
+    Input('annual_rps_inc_2020','value'),
+    Input('annual_rps_inc_2023','value'),
+    Input('end_year','value'),
+    Input('future_procurement_df','data'),
+    Input('energy_mix','data'),
+    Input('desired_pct','value'),
+    Input('scenario_radio','value'),
+    Input('mc_dist','value'),
+    Input('mc_growth_spread','value'),
+    Input('mc_cf_spread','value'),
+    Input('mc_lcoe_spread','value'),
+    Input('mc_draws','value'),
+    Input('mc_seed','value'),
+    Input('rec_expiry','value'),
+    Input('rec_shelf_life','value'),
+    ]
+)
+def uncertainty_bands(mc_toggle, demand, demand_growth, fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year,
+                      token, mix, desired_pct, scenario_tag,
+                      dist, growth_spread, cf_spread, lcoe_spread, n_draws, seed, rec_expiry, rec_shelf_life):
+    """P10/P50/P90 REC shortfall by year and end year cost, None while the uncertainty toggle is off."""
+    if 'on' not in (mc_toggle or []):
+        return None
 
-    output_dict = dict()
-    output_dict['start_year'] = int(start_year)
-    output_dict['start_demand'] = int(start_demand)
-    output_dict['start_re'] = int(start_re)
-    output_dict['start_recs'] = int(start_recs)
-    output_dict['start_re_pct'] = float(start_re_pct)
-    output_dict['start_expense'] = int(start_expense)
-    output_dict['start_generation_list'] = [int(i) for i in list(lcoe_df['current_MWh'])]
-    output_dict['end_year'] = int(end_year)
-    output_dict['end_demand'] = int(end_demand)
-    output_dict['end_re'] = int(end_re)
-    output_dict['end_recs'] = float(end_recs)
-    output_dict['end_re_pct'] = float(end_re_pct)
-    output_dict['end_expense'] = int(lcoe_df['future_price'].sum())
-    output_dict['end_generation_list'] = [int(i) for i in list(lcoe_df['future_generation'])]
-    output_dict['techs'] = list(lcoe_df['Generation Source'])
-    output_dict['rps_min_increase'] = df['rps_marginal_req'].sum()
-    output_dict['scenario_lcoe_df'] = lcoe_df.to_json()
+    base = uncertainty_base(demand, demand_growth, fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year,
+                            load_result(token), mix, desired_pct, scenario_tag, rec_expiry, rec_shelf_life)
+    uncertainty = {'demand_growth': {'dist': dist, 'spread': (growth_spread or 0) / 100},
+                   'capacity_factor': {'dist': dist, 'spread': (cf_spread or 0) / 100},
+                   'lcoe': {'dist': dist, 'spread': (lcoe_spread or 0) / 100}}
+    bands = montecarlo.run(base, uncertainty, n_draws=int(min(max(n_draws or 100, 100), 100000)), seed=int(seed or 0))
 
-    return json_func.dumps(output_dict)
+    return {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in bands.items()}
 
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -396,11 +679,14 @@ def scenario_dict_maker(json1, json2, rows, columns, desired_pct, scenario_tag):
 # ------ SECTION 1 ------
 @app.callback(
     Output('demand_and_REC_graph', 'figure'),
-    [Input('intermediate_df', 'data')]
+    [
+        Input('intermediate_df', 'data'),
+        Input('uncertainty_bands', 'data')
+    ]
 )
-def html_REC_balance_graph(json):
-    """Plot REC requirements and REC balance (section 1)"""
-    df = pd.read_json(json)
+def html_REC_balance_graph(token, bands=None):
+    """Plot REC requirements and REC balance (section 1), with a P10-P90 shortfall fan when bands are on"""
+    df = load_result(token)
 
     df_bar = df[['fit_MWh','future_procurement', 'begin_rec_balance', 'rec_shortfall']]
     df_bar.columns = ['RECs from FiT','RECs from Planned Procurement','Beginning REC Balance', 'Annual REC Shortfall']
@@ -427,10 +713,27 @@ def html_REC_balance_graph(json):
                     marker = dict(color=color_))
 
     traces.append(line_trace)
-    
+
+    # --- Monte Carlo fan (P10-P90 shaded, P50 dashed) ---
+    annotations = []
+    if bands:
+        p10, p50, p90 = bands['rec_shortfall']
+        fan_color = resources.color_dict['Coal']
+        traces.append(go.Scatter(x=bands['year'], y=p90, mode='lines', line=dict(width=0, color=fan_color),
+                                 showlegend=False, hoverinfo='skip'))
+        traces.append(go.Scatter(x=bands['year'], y=p10, mode='lines', line=dict(width=0, color=fan_color),
+                                 fill='tonexty', fillcolor='rgba(17,17,17,0.2)', name='REC Shortfall P10-P90'))
+        traces.append(go.Scatter(x=bands['year'], y=p50, mode='lines', line=dict(color=fan_color, dash='dash', width=2),
+                                 name='REC Shortfall P50'))
+        cost = bands['end_cost_kwh']
+        annotations.append(dict(xref='paper', yref='paper', x=0, y=1, showarrow=False, xanchor='left',
+                                text='End year cost ₱/kWh P10 {:.2f} · P50 {:.2f} · P90 {:.2f} ({:,} draws)'.format(
+                                    cost[0], cost[1], cost[2], bands['n_draws'])))
+
     layout = dict(
         height=450,
-        title='RPS Requirements'
+        title='RPS Requirements',
+        annotations=annotations
         )
 
     fig = go.Figure(data=traces, layout=layout)
@@ -445,14 +748,48 @@ def html_REC_balance_graph(json):
     return fig
 
 
+@app.callback(
+    Output('monthly_REC_graph', 'figure'),
+    [
+        Input('intermediate_df', 'data'),
+        Input('future_procurement_df', 'data')
+    ]
+)
+def monthly_REC_graph(token, future_procurement_token):
+    """Plot RECs created each month (section 1), planned procurement split by the generation profile"""
+    df = load_result(token)
+    future_procurement = load_result(future_procurement_token)
+
+    source = future_procurement['Generation Source'].map(resources.re_tech.index).values
+    fit, planned = profiles.monthly_recs(df['fit_MWh'].values, df.index.values, source,
+                                         future_procurement['Online Year'].values,
+                                         future_procurement[MONTH_COLUMNS].values, len(resources.re_tech))
+    months = ['{}-{:02d}'.format(y, m + 1) for y in df.index for m in range(12)]
+
+    traces = [go.Bar(x=months, y=list(fit.ravel()), name='RECs from FiT', marker=dict(color='#77b0b1'))]
+    for i, tech in enumerate(resources.re_tech):
+        if planned[i].any():
+            traces.append(go.Bar(x=months, y=list(planned[i].ravel()), name=tech,
+                                 marker=dict(color=resources.color_dict[tech])))
+
+    fig = go.Figure(data=traces)
+    fig['layout'].update(barmode='stack', bargap=0)
+    fig['layout'].update(height=400, legend=dict(orientation="h"))
+    fig['layout']['margin'].update(l=20,r=20,b=20,t=40,pad=0)
+    fig['layout']['yaxis'].update(title='RECs')
+    fig['layout']['title'].update(text='RECs Created by Month', x=0.5)
+
+    return fig
+
+
     # ----- SECTION 2 ------
 @app.callback(
     Output('capacity_incremental_graph', 'figure'),
     [Input('intermediate_df_capacity', 'data')]
 )
-def capacity_requirement_simple_graph(json):
+def capacity_requirement_simple_graph(token):
     """Incremental capacity requirement."""
-    df = pd.read_json(json)
+    df = load_result(token)
     
     traces = []
     for c in df.columns:
@@ -486,9 +823,9 @@ def capacity_requirement_simple_graph(json):
 Output('capacity_cum_graph', 'figure'),
 [Input('intermediate_df_capacity', 'data')]
 )
-def capacity_requirement_cumulative_graph(json):
+def capacity_requirement_cumulative_graph(token):
     """Cumulative capacity requirement."""
-    df = pd.read_json(json)
+    df = load_result(token)
 
     traces = []
     for c in df.columns:
@@ -520,47 +857,40 @@ def capacity_requirement_cumulative_graph(json):
 
 
 # ------ SECTION 3 ------
-@app.callback(
-    Output('lcoe_graph', 'figure'),
-    [
-        Input('energy_mix_table','data'),
-        Input('energy_mix_table', 'columns')  
-    ]
-)
-def lcoe_graph(rows, columns):
-    """IRENA LCOE comparison plots."""
-    input_cost_df = pd.DataFrame(rows, columns=[c['name'] for c in columns])
+LCOE_TECHS = ['Utility-Scale Solar','Wind','Geothermal','Biomass','Hydro']
+
+_lcoe_base = []
+
+def lcoe_base_figure():
+    """
+    The IRENA part of lcoe_graph, built once per process as a plain figure dict.
+
+    The IRENA boxes compare the first and latest vintage in resources.irena_lcoe_index.
+    data holds the IRENA boxes, dashed lines, "Your Actual LCOE" markers and spacers (one per
+    LCOE_TECHS entry, in that order) and the fossil range label last. The markers, the label
+    and the fossil range shape are placeholders that lcoe_graph() fills in from the energy mix.
+    The browser version reads the technologies from the box names, so LCOE_TECHS is the only list.
+    """
+    if _lcoe_base:
+        return _lcoe_base[0]
+
+    irena_index = resources.irena_lcoe_index #the earliest and latest IRENA vintages are compared
 
     input_traces = []
     traces = []
     line_traces = []
     spacer_traces = []
-
-    # --- Calc min and max fossil cost ---
-    coal_input_cost = float(input_cost_df.loc[input_cost_df['Generation Source'] == 'Coal', 'Levelized Cost of Energy (₱ / kWh)'][0:1].item())
-    gas_input_cost = float(input_cost_df.loc[input_cost_df['Generation Source'] == 'Natural Gas', 'Levelized Cost of Energy (₱ / kWh)'][0:1].item())
-    oil_input_cost = float(input_cost_df.loc[input_cost_df['Generation Source'] == 'Oil', 'Levelized Cost of Energy (₱ / kWh)'][0:1].item())
-    fossil_costs = [coal_input_cost, gas_input_cost, oil_input_cost]
-    fossil_range_low = min(fossil_costs)
-    fossil_range_high = max(fossil_costs)
     
-    for t in ['Utility-Scale Solar','Wind','Geothermal','Biomass','Hydro']:
+    for t in LCOE_TECHS:
 
         color = resources.color_dict[t]
-        dfloc = resources.irena_lcoe_df.loc[resources.irena_lcoe_df['Technology'] == t]
-
-        min_2010 = round(dfloc.loc[(dfloc['Year'] == 2010) & (dfloc['Item'] == 'MIN')]['pesos'][0:1].item(),2)
-        max_2010 = round(dfloc.loc[(dfloc['Year'] == 2010) & (dfloc['Item'] == 'MAX')]['pesos'][0:1].item(),2)
-        avg_2010 = round(dfloc.loc[(dfloc['Year'] == 2010) & (dfloc['Item'] == 'AVG')]['pesos'][0:1].item(),2)
-        min_2017 = round(dfloc.loc[(dfloc['Year'] == 2018) & (dfloc['Item'] == 'MIN')]['pesos'][0:1].item(),2)
-        max_2017 = round(dfloc.loc[(dfloc['Year'] == 2018) & (dfloc['Item'] == 'MAX')]['pesos'][0:1].item(),2)
-        avg_2017 = round(dfloc.loc[(dfloc['Year'] == 2018) & (dfloc['Item'] == 'AVG')]['pesos'][0:1].item(),2)
-
-        input_cost = input_cost_df.loc[input_cost_df['Generation Source'] == t, 'Levelized Cost of Energy (₱ / kWh)'][0:1].item()
+        first = {k: round(v, 2) for k, v in irena_index.stats(t, irena_index.first_year).items()}
+        latest = {k: round(v, 2) for k, v in irena_index.stats(t, irena_index.latest_year).items()}
 
         #.2 serves as an offset from the y axis
         x = [1.2,1.2,1.2,1.2,1.2,1.2,2.2,2.2,2.2,2.2,2.2,2.2]
-        y = [min_2010,min_2010,avg_2010,avg_2010,max_2010,max_2010,min_2017,min_2017,avg_2017,avg_2017,max_2017,max_2017]
+        y = [first['MIN'],first['MIN'],first['AVG'],first['AVG'],first['MAX'],first['MAX'],
+             latest['MIN'],latest['MIN'],latest['AVG'],latest['AVG'],latest['MAX'],latest['MAX']]
 
         trace = go.Box(
                 x=x,
@@ -574,14 +904,14 @@ def lcoe_graph(rows, columns):
         
         input_trace = go.Scatter(
                 x=[3.2],
-                y=[input_cost],
+                y=[0],
                 name=t,
                 marker=dict(size=12, color=color))
         input_traces.append(input_trace)
         
         line_trace = go.Scatter(
                 x=[1.2,2.2],
-                y=[avg_2010,avg_2017],
+                y=[first['AVG'],latest['AVG']],
                 line = dict(
                     color = color,
                     width = 3,
@@ -597,7 +927,7 @@ def lcoe_graph(rows, columns):
         spacer_traces.append(spacer_trace)
     
     fig = tls.make_subplots(rows=1, cols=len(traces), shared_yaxes=True, horizontal_spacing=0.03,
-                            subplot_titles=['Utility-Scale Solar','Wind','Geothermal','Biomass','Hydro'])
+                            subplot_titles=LCOE_TECHS, print_grid=False)
     
     fig['layout'].update(title='Global Average LCOE of Renewables')
 
@@ -615,18 +945,9 @@ def lcoe_graph(rows, columns):
 
     fig['layout'].update(boxmode='group', showlegend=False, margin=dict(l=60,r=20,b=50,t=70,pad=0))
 
-    # --- Define rectangle fossil shape ---
-    y_bottom_percent = min(fossil_range_low / 20, 1)
-    y_top_percent = min(fossil_range_high / 20, 1)
-
-    shapes = [
-        {'type': 'rect', 'x0':0, 'x1':1, 'y0':y_bottom_percent, 'y1':y_top_percent, 'xref': 'paper', 'yref': 'paper', 'fillcolor':'Brown', 'opacity':0.2, 'layer':'below'}
-    ]
-    fig['layout'].update(shapes=shapes)
-
     fig.add_trace(go.Scatter(
         x=[3],
-        y=[fossil_range_high - 1],
+        y=[0],
         text=["Fossil Fuel<br>LCOE Range"],
         mode="text",
         textfont={'size':10}
@@ -634,13 +955,46 @@ def lcoe_graph(rows, columns):
 
     for i in range(1,len(traces) + 1):
         fig['layout'][f'xaxis{i}'].update(tickvals=[1,1.2,2.2,3.2],
-        ticktext=[' ','Global<br>2010 LCOE','Global<br>2018 LCOE','Your Actual<br>2019 LCOE'],
+        ticktext=[' ',f'Global<br>{irena_index.first_year} LCOE',f'Global<br>{irena_index.latest_year} LCOE','Your Actual<br>2019 LCOE'],
         tickangle=0, tickfont=dict(size=10))
         
     fig['layout']['yaxis'].update(title='₱ / kWh LCOE', range=[0,20])
     fig['layout']['title'].update(x=0.5)
+
+    _lcoe_base.append(json_func.loads(json_func.dumps(fig.to_dict(), cls=plotly.utils.PlotlyJSONEncoder)))
+    return _lcoe_base[0]
+
+def lcoe_graph(mix):
+    """IRENA LCOE comparison plots, the cached base figure with this energy mix's markers and fossil range."""
+    base = lcoe_base_figure()
+    n = len(LCOE_TECHS)
+
+    # --- Calc min and max fossil cost ---
+    coal_input_cost = mix_value(mix, 'lcoe', 'Coal')
+    gas_input_cost = mix_value(mix, 'lcoe', 'Natural Gas')
+    oil_input_cost = mix_value(mix, 'lcoe', 'Oil')
+    fossil_costs = [coal_input_cost, gas_input_cost, oil_input_cost]
+    fossil_range_low = min(fossil_costs)
+    fossil_range_high = max(fossil_costs)
+
+    # --- Copy only what changes, the rest is shared with the base ---
+    data = list(base['data'])
+    for i, t in enumerate(LCOE_TECHS):
+        data[2 * n + i] = dict(data[2 * n + i], y=[mix_value(mix, 'lcoe', t)])
+    data[-1] = dict(data[-1], y=[fossil_range_high - 1])
+
+    # --- Define rectangle fossil shape ---
+    y_bottom_percent = min(fossil_range_low / 20, 1)
+    y_top_percent = min(fossil_range_high / 20, 1)
+
+    shapes = [
+        {'type': 'rect', 'x0':0, 'x1':1, 'y0':y_bottom_percent, 'y1':y_top_percent, 'xref': 'paper', 'yref': 'paper', 'fillcolor':'Brown', 'opacity':0.2, 'layer':'below'}
+    ]
     
-    return fig
+    return {'data': data, 'layout': dict(base['layout'], shapes=shapes)}
+
+browser_callback(lcoe_graph, Output('lcoe_graph', 'figure'), [Input('energy_mix','data')],
+                 client_state=[State('lcoe_base','data')])
 
 # ------ SECTION 4 ------
 @app.callback(Output('doughnut_graph', 'figure'),
@@ -688,6 +1042,141 @@ def doughnut_graph(json):
     
     return fig
 
+@producer
+def frontier_results(token1, token2, mix, n_mixes):
+    """frontier.sweep() of the presets and n_mixes random renewable mixes, for the current RPS and procurement."""
+    inputs = scenario_inputs(load_result(token1), load_result(token2), mix)
+    sources = inputs.pop('sources')
+    re_sources = [s for s in sources if s in resources.re_tech]
+    presets = [[resources.scenario_pct_dict[t].get(s, 0) for s in re_sources] for t in resources.scenario_pct_dict]
+    presets = [p for p in presets if sum(p) > 0] #a preset whose sources aren't in the mix has nothing to add
+    weights = frontier.candidate_weights(len(re_sources), n_mixes, seed=0, presets=presets)
+    result = frontier.sweep(inputs, weights)
+    result['re_sources'] = re_sources
+    return result
+
+def mix_label(re_sources, weights, desired_pct):
+    """Hover text of a portfolio, i.e. 'RE 45% · Wind 62%, Hydro 38%'."""
+    shares = sorted([(w, s) for s, w in zip(re_sources, weights) if w >= 0.005], reverse=True)
+    return 'RE {:g}% · '.format(desired_pct) + ', '.join('{} {:.0%}'.format(s, w) for w, s in shares)
+
+@app.callback(Output('frontier_base', 'data'),
+[
+    Input('intermediate_df','data'),
+    Input('future_procurement_df','data'),
+    Input('energy_mix','data'),
+    Input('frontier_mixes','value'),
+])
+def frontier_figure(token1, token2, mix, n_mixes):
+    """
+    End year cost against emissions of many renewable mixes and RE shares, the non-dominated ones marked.
+
+    The selected scenario doesn't change these, so moving the slider or the scenario radio only
+    places the last trace, the star, in frontier_graph() without sending the cloud again.
+    """
+    n_mixes = int(min(max(n_mixes or 0, 0), 20000))
+    result = load_result(store_result(frontier_results, token1, token2, mix, n_mixes))
+    re_sources, weights, pcts = result['re_sources'], result['weights'], result['desired_pct']
+    cost, emissions = result['cost_kwh'].ravel(), result['end_emissions'].ravel()
+
+    # --- A sample of the cloud keeps the figure small, the cheapest mixes are sent whole ---
+    shown = np.random.RandomState(0).permutation(len(cost))[:3000]
+    cheapest = result['cheapest'] * len(pcts) + np.arange(len(pcts)) #flat index of the cheapest mix at each pct
+    mix_index, pct_index = np.divmod(result['frontier'], len(pcts))
+    traces = [
+        dict(type='scattergl', mode='markers', x=(emissions[shown] / 1e6).tolist(), y=cost[shown].tolist(),
+             name='Candidate Portfolios', hoverinfo='skip',
+             marker=dict(size=4, color=resources.color_dict['Natural Gas'], opacity=0.25)),
+        dict(type='scatter', mode='lines', x=(emissions[cheapest] / 1e6).tolist(), y=cost[cheapest].tolist(),
+             name='Cheapest Mix at Each RE %',
+             text=[mix_label(re_sources, weights[m], p) for m, p in zip(result['cheapest'], pcts)],
+             hovertemplate='%{text}<br>%{y:.2f} ₱/kWh · %{x:.3f} MtCO2<extra></extra>',
+             line=dict(color=resources.color_dict['Biomass'], width=3)),
+        dict(type='scatter', mode='markers', x=(emissions[result['frontier']] / 1e6).tolist(),
+             y=cost[result['frontier']].tolist(), name='Non-Dominated',
+             text=[mix_label(re_sources, weights[m], pcts[p]) for m, p in zip(mix_index, pct_index)],
+             hovertemplate='%{text}<br>%{y:.2f} ₱/kWh · %{x:.3f} MtCO2<extra></extra>',
+             marker=dict(size=9, color=resources.color_dict['Biomass'], line=dict(width=1, color='white'))),
+        dict(type='scatter', mode='markers', x=[], y=[], name='Selected Scenario', #placed by frontier_graph()
+             hovertemplate='Selected: %{y:.2f} ₱/kWh · %{x:.3f} MtCO2<extra></extra>',
+             marker=dict(size=14, symbol='star', color=resources.color_dict['Geothermal'])),
+    ]
+
+    layout = dict(height=450, legend=dict(orientation='h'), hovermode='closest', template=theme_template(),
+                  title=dict(text='End Year Cost vs. Emissions of {:,} Portfolios'.format(len(cost)), x=0.5),
+                  xaxis=dict(title=dict(text='End Year Emissions (MtCO2)')), yaxis=dict(title=dict(text='End Year Cost (₱ / kWh)')),
+                  margin=dict(l=20,r=20,b=20,t=40,pad=0))
+
+    return {'data': traces, 'layout': layout}
+
+def frontier_graph(figure, json):
+    """frontier_figure() with the selected scenario and desired percent as a star, from the scenario output."""
+    scenario = json_func.loads(json)
+    data = list(figure['data'])
+    data[-1] = dict(data[-1], x=[scenario['end_emissions'] / 1e6], y=[scenario['end_expense'] / scenario['end_demand'] / 1000])
+    return dict(figure, data=data)
+
+browser_callback(frontier_graph, Output('frontier_graph', 'figure'),
+                 [Input('frontier_base','data'), Input('intermediate_dict_scenario','data')], client_state=[])
+
+@app.callback(Output('sensitivity_graph', 'figure'),
+[
+    Input('demand','value'),
+    Input('demand_growth','value'),
+    Input('fit_pct','value'),
+    Input('annual_rps_inc_2020','value'),
+    Input('annual_rps_inc_2023','value'),
+    Input('end_year','value'),
+    Input('future_procurement_df','data'),
+    Input('energy_mix','data'),
+    Input('desired_pct','value'),
+    Input('scenario_radio','value'),
+    Input('rec_expiry','value'),
+    Input('rec_shelf_life','value'),
+    Input('sensitivity_step','value'),
+])
+def sensitivity_graph(demand, demand_growth, fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year,
+                      token, mix, desired_pct, scenario_tag, rec_expiry, rec_shelf_life, step):
+    """Tornado of total REC shortfall and end year cost, each input moved ±step% with the others held."""
+    step = min(max(float(step or 10), 1), 100)
+    base = uncertainty_base(demand, demand_growth, fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year,
+                            load_result(token), mix, desired_pct, scenario_tag, rec_expiry, rec_shelf_life)
+    cf_labels = ['/'.join(t for t, slider in resources.cf_slider_dict.items() if slider == s) for s in resources.cf_sliders]
+    result = sensitivity.run(base, step / 100, cf_labels=cf_labels, lcoe_labels=list(mix['sources']))
+
+    traces = []
+    axes = dict()
+    for i, metric in enumerate(sensitivity.METRICS):
+        rows = sensitivity.ranked(result, metric, top=10)
+        middle = result['base'][metric]
+        number = ',.0f' if metric == 'rec_shortfall' else ',.2f'
+        suffix = '' if i == 0 else str(i + 1)
+        for case, column, color in [('-{:g}%'.format(step), 1, resources.color_dict['Hydro']),
+                                    ('+{:g}%'.format(step), 2, resources.color_dict['Utility-Scale Solar'])]:
+            traces.append(dict(
+                type='bar',
+                y=[r[0] for r in rows],
+                x=[r[column] - middle for r in rows],
+                base=middle,
+                orientation='h',
+                name='Input {}'.format(case),
+                legendgroup=case,
+                showlegend=i == 0,
+                marker=dict(color=color),
+                xaxis='x' + suffix,
+                yaxis='y' + suffix,
+                customdata=[r[column] for r in rows],
+                hovertemplate='%{y} ' + case + ': %{customdata:' + number + '}<extra></extra>'))
+        axes['xaxis' + suffix] = dict(domain=[0, 0.42] if i == 0 else [0.58, 1], anchor='y' + suffix,
+                                      title=dict(text=sensitivity.METRIC_LABELS[metric]))
+        axes['yaxis' + suffix] = dict(anchor='x' + suffix, autorange='reversed', automargin=True)
+
+    layout = dict(height=450, barmode='overlay', legend=dict(orientation='h'), template=theme_template(),
+                  title=dict(text='What Moves REC Shortfall and End Year Cost Most', x=0.5),
+                  margin=dict(l=20,r=20,b=20,t=40,pad=0), **axes)
+
+    return {'data': traces, 'layout': layout} #plain dicts, go.Figure validation would take longer than the math
+
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~ Table Outputs ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -697,9 +1186,9 @@ def doughnut_graph(json):
     Output('demand_and_REC_table', 'data'),
     [Input('intermediate_df', 'data')]
 )
-def html_REC_balance_table(json):
+def html_REC_balance_table(token):
     """Table with Year, Energy Sales, RPS Requirements (%/RECs), RECs Created, RECs Expired, Year End REC Balance, and REC Purchase Requirement columns."""
-    df = pd.read_json(json)
+    df = load_result(token).copy()
     df['Year'] = df.index
     dfout = df[['Year','demand','rps_req','rec_req','rec_created','rec_expired','end_rec_balance','rec_shortfall']]
     dfout.columns = ['Year','Energy Sales (MWh)','RPS Requirement (%)','RPS Requirement (RECs)', 'RECs Created', 'RECs Expired','Year End REC Balance','REC Purchase Requirement']
@@ -715,9 +1204,9 @@ def html_REC_balance_table(json):
 Output('capacity_cum_table', 'data'),
 [Input('intermediate_df_capacity', 'data')]
 )
-def cumulative_table(json):
+def cumulative_table(token):
     """Cumulative capacity requirement by technology type and year."""
-    df = pd.read_json(json)
+    df = load_result(token)
     
     # --- Grab the columns we need ---
     keep_cols = [c for c in list(df.columns) if 'Need' in c]
@@ -748,21 +1237,11 @@ def cumulative_table(json):
 
 # ----- SECTION 1 ------
 
-@app.callback(
-    Output('energy_mix_error_text', 'children'),
-    [
-        Input('energy_mix_table', 'data'),
-        Input('energy_mix_table', 'columns')
-    ]
-)
-def energy_mix_text(rows, columns):
-    """Create text for existing energy mix, warn if sums are over 100%"""
-    energy_mix = pd.DataFrame(rows, columns=[c['name'] for c in columns])
-    cols = ['Percent of Utility Energy Mix']
-    energy_mix[cols] = energy_mix[cols].apply(pd.to_numeric, errors='coerce')
-
-    energy_sum = energy_mix['Percent of Utility Energy Mix'].sum().round(1)
-    renewable_sum = energy_mix.loc[energy_mix['Generation Source'].isin(resources.re_tech), 'Percent of Utility Energy Mix'].sum().round(1)
+def energy_mix_text(mix):
+    """Create text for existing energy mix, warn if sums are over 100% (see energy_mix_normalizer)"""
+    mix_pct = np.array(mix['mix_pct'])
+    energy_sum = mix_pct.sum().round(1)
+    renewable_sum = mix_pct[[s in resources.re_tech for s in mix['sources']]].sum().round(1)
 
     if energy_sum != 100:
         output = f"""
@@ -784,9 +1263,9 @@ def energy_mix_text(rows, columns):
         Input('geothermal_cf', 'value')
     ]
 )                     
-def capacity_text_maker(json, solar_cf, geothermal_cf):
+def capacity_text_maker(token, solar_cf, geothermal_cf):
     """Text for capacity need."""
-    df = pd.read_json(json)
+    df = load_result(token)
     first_year_of_Need = df.loc[df['rec_shortfall'] > 0].index.min()
     last_year = max(df.index)
     total_recs = df['rec_shortfall'].sum()
@@ -832,35 +1311,19 @@ def capacity_text_maker(json, solar_cf, geothermal_cf):
 
 # ----- SECTION 4 -----
 
-@app.callback(
-    Output("economic_text","children"),
-    [
-        Input('energy_mix_table','data'),
-        Input('energy_mix_table','columns')
-    ]
-)
-def economic_text_maker(rows, columns):
-    lcoe_df = pd.DataFrame(rows, columns=[c['name'] for c in columns])
-    cols = lcoe_df.columns.drop('Generation Source')
-    lcoe_df[cols] = lcoe_df[cols].apply(pd.to_numeric, errors='coerce') #convert all columns to numeric
-
-    solar_cost = lcoe_df.loc[lcoe_df['Generation Source'] == 'Utility-Scale Solar']['Levelized Cost of Energy (₱ / kWh)'][0:1].item()
-    biomass_cost = lcoe_df.loc[lcoe_df['Generation Source'] == 'Biomass']['Levelized Cost of Energy (₱ / kWh)'][0:1].item()
-    coal_cost = lcoe_df.loc[lcoe_df['Generation Source'] == 'Coal']['Levelized Cost of Energy (₱ / kWh)'][0:1].item()
+def economic_text_maker(mix):
+    solar_cost = mix_value(mix, 'lcoe', 'Utility-Scale Solar')
+    biomass_cost = mix_value(mix, 'lcoe', 'Biomass')
+    coal_cost = mix_value(mix, 'lcoe', 'Coal')
 
-
-    out = f"""
-    The Levelized Cost of Energy (PhP / kWh) data used in this calculator can be changed in the 'Energy Mix and Cost Input' tab of User Inputs. You can edit this to reflect prices that are specific to your utility. 
-    Based on the current entries, the cost of utility-scale solar for your utility is **Php {round(solar_cost - coal_cost, 1)} / kWh** compared with the cost of coal generation,
-    and the cost of biomass has a difference of **Php {round(biomass_cost - coal_cost, 1)} / kWh**.
-   """.replace('  ', '')
+    out = templates.render('economic_text', {
+        'solar_vs_coal': round(solar_cost - coal_cost, 1),
+        'biomass_vs_coal': round(biomass_cost - coal_cost, 1)})
 
     return out
 
-@app.callback(
-    Output("savings_text","children"),
-    [Input('intermediate_dict_scenario','data')]
-)
+browser_callback(economic_text_maker, Output("economic_text","children"), [Input('energy_mix','data')])
+
 def savings_text_maker(json):
     input_dict = json_func.loads(json)
 
@@ -880,58 +1343,45 @@ def savings_text_maker(json):
     end_cost_kwh = round(end_cost / end_demand / 1000,3)
     end_cost_kwh_usd = round(end_cost_kwh / currency_exchange,3)
 
-    out = f"""
-    ###### Your current generation costs are ${start_cost_usd:,} (Php {start_cost:,}), or **${start_cost_kwh_usd} (Php {start_cost_kwh} / kWh)**. By switching to **{int(end_re_pct * 100)}% renewables** by {input_dict['end_year']}, your estimated generation costs would be ${end_cost_usd:,} (Php {end_cost:,}), or **${end_cost_kwh_usd} (Php {end_cost_kwh} / kWh)**. Currently you are creating {input_dict['start_recs']:,} RECs, and in 2030 you would be creating {int(input_dict['end_recs']):,} RECs per year. Future generation costs are estimates that may change as market conditions evolve.
-        """.replace('  ', '')
+    out = templates.render('savings_text', {
+        'start_cost_usd': f"{start_cost_usd:,}", 'start_cost': f"{start_cost:,}",
+        'start_cost_kwh_usd': start_cost_kwh_usd, 'start_cost_kwh': start_cost_kwh,
+        'end_re_pct': int(end_re_pct * 100), 'end_year': input_dict['end_year'],
+        'end_cost_usd': f"{end_cost_usd:,}", 'end_cost': f"{end_cost:,}",
+        'end_cost_kwh_usd': end_cost_kwh_usd, 'end_cost_kwh': end_cost_kwh,
+        'start_recs': f"{input_dict['start_recs']:,}", 'end_recs': f"{int(input_dict['end_recs']):,}"})
 
     return out
 
-@app.callback(
-    Output("goal_text","children"),
-    [Input('intermediate_dict_scenario','data')]
-)
+browser_callback(savings_text_maker, Output("savings_text","children"), [Input('intermediate_dict_scenario','data')])
+
 def goal_text_maker(json):
     
     input_dict = json_func.loads(json)
 
     rps_min_increase = input_dict['rps_min_increase'] * 100
 
-
-    out = f"""
-    While the RPS will require your utility to increase your renewable energy supply by **{round(rps_min_increase,0)}%**,
-    it may be cost-effective to go beyond this amount. Additional renewable procurement can provide price stability and may increase customer satisfaction with your utility. 
-    Additional renewables also allow you to bank RECs, which can be sold through the WESM as a secondary revenue stream, or held for future compliance years.
-
-    First, you should ensure that the LCOE and Energy Mix data in the 'Energy Mix and Cost Input' tab available at the top of the tool is correct. 
-    Once this data has been input, this section will allow you to visualize and compare generation costs between various renewable growth scenarios.
-
-    Using the slider below, you can change the desired percentage of renewables for your utility. This has been preset at the minimum RPS requirement. 
-    Below the slider, you can also select the mix of renewables that will be installed. As you change the desired renewable percentage and the mix of new renewables, the price per kWh will be updated.
-    These prices are derived from the LCOE values specified in the 'Energy Mix and Cost Input.' Next, you can select an optimization factor, cost or emissions, that will determine the type of fossil
-    fuels added to your growing overall capacity. Emissions calculations are based on 2017 EIA and US EPA data on heat content and heat rates for thermal fuels. 
-   """.replace('  ', '')
+    out = templates.render('goal_text', {'rps_min_increase': round(rps_min_increase,0)})
 
     return out
 
+browser_callback(goal_text_maker, Output("goal_text","children"), [Input('intermediate_dict_scenario','data')])
+
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~~ Cosmetics ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-@app.callback(
-    Output('future_procurement_table', 'data'),
-    [Input('editing-rows-button', 'n_clicks')],
-    [State('future_procurement_table', 'data'),
-     State('future_procurement_table', 'columns')])
 def add_row(n_clicks, rows, columns):
     """Add row to future procurement."""
     if n_clicks > 0:
         rows.append({c['id']: '' for c in columns})
     return rows
 
+browser_callback(add_row, Output('future_procurement_table', 'data'),
+                 [Input('editing-rows-button', 'n_clicks')],
+                 [State('future_procurement_table', 'data'),
+                  State('future_procurement_table', 'columns')])
+
 
-@app.callback(
-    Output('energy_mix_error_text','style'),
-    [Input('energy_mix_error_text','children')]
-)
 def color_text(energy_mix_error_text):
     """Color energy_mix_text() red."""
     output = energy_mix_error_text
@@ -941,3 +1391,7 @@ def color_text(energy_mix_error_text):
         color = {'color':'black'} 
     return color
 
+browser_callback(color_text, Output('energy_mix_error_text','style'), [Input('energy_mix_error_text','children')])
+
+# --- Set Layout, after the callbacks so registering them doesn't build it ---
+app.layout = serve_layout
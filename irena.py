@@ -0,0 +1,87 @@
+import numpy as np
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ IRENA LCOE Index ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# irena_lcoe.csv as a dense (technology, year, statistic) array per currency, built once when
+# resources.irena_lcoe_index is first used. Every year in the CSV is indexed, so a new IRENA
+# vintage only needs its rows added to the CSV.
+
+STATS = ['MIN', 'AVG', 'MAX']
+CURRENCIES = ['pesos', 'usd']
+
+class LCOEIndex(object):
+    """
+    Constant-time lookups into the IRENA LCOE ranges.
+
+    Input
+    -----
+        -techs (list): technology names, in the order of the first array axis
+        -years (list): vintages, ascending
+        -values (dict): currency: float array of shape (techs, years, STATS), NaN where missing
+    """
+
+    def __init__(self, techs, years, values):
+        self.techs = list(techs)
+        self.years = [int(y) for y in years]
+        self.values = values
+        self._tech_pos = {t: i for i, t in enumerate(self.techs)}
+        self._year_pos = {y: i for i, y in enumerate(self.years)}
+        self._stat_pos = {s: i for i, s in enumerate(STATS)}
+
+    @classmethod
+    def from_frame(cls, df):
+        """Index a frame with Year, Item, Technology and one column per currency, raises ValueError on duplicate rows."""
+        df = df.dropna(subset=['Technology'])
+        keys = df[['Technology', 'Year', 'Item']]
+        if keys.duplicated().any():
+            raise ValueError('irena_lcoe has duplicate rows for {}'.format(
+                keys[keys.duplicated()].drop_duplicates().values.tolist()))
+        unknown = set(df['Item']) - set(STATS)
+        if unknown:
+            raise ValueError('irena_lcoe has unknown Item values {}, expected {}'.format(sorted(unknown), STATS))
+
+        techs = list(dict.fromkeys(df['Technology']))
+        years = sorted(set(int(y) for y in df['Year']))
+        t = df['Technology'].map({k: i for i, k in enumerate(techs)}).values
+        y = df['Year'].map({k: i for i, k in enumerate(years)}).values
+        s = df['Item'].map({k: i for i, k in enumerate(STATS)}).values
+
+        values = dict()
+        for c in CURRENCIES:
+            arr = np.full((len(techs), len(years), len(STATS)), np.nan)
+            arr[t, y, s] = df[c].values
+            values[c] = arr
+        return cls(techs, years, values)
+
+    @property
+    def first_year(self):
+        return self.years[0]
+
+    @property
+    def latest_year(self):
+        return self.years[-1]
+
+    def _position(self, tech, year):
+        try:
+            return self._tech_pos[tech], self._year_pos[int(year)]
+        except KeyError:
+            raise KeyError('no IRENA LCOE for {} in {}'.format(tech, year))
+
+    def get(self, tech, year, stat, currency='pesos'):
+        """One statistic (MIN, AVG or MAX) for a technology and vintage, raises KeyError if it isn't in the data."""
+        i, j = self._position(tech, year)
+        value = self.values[currency][i, j, self._stat_pos[stat]]
+        if np.isnan(value):
+            raise KeyError('no IRENA LCOE {} for {} in {}'.format(stat, tech, year))
+        return float(value)
+
+    def stats(self, tech, year, currency='pesos'):
+        """{'MIN', 'AVG', 'MAX'} for a technology and vintage."""
+        return {s: self.get(tech, year, s, currency) for s in STATS}
+
+    def series(self, tech, stat, currency='pesos'):
+        """(years, values) of one statistic over every vintage, NaN where a year is missing."""
+        i = self._tech_pos[tech]
+        return list(self.years), self.values[currency][i, :, self._stat_pos[stat]].copy()
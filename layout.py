@@ -6,6 +6,10 @@ import dash_html_components as html
 
 # --- Module Imports ---
 import resources
+import templates
+import functions
+import profiles
+import static
 import layout
 
 # --- Layout ---
@@ -22,7 +26,7 @@ html_obj = html.Div([
         ),
         html.A([
             html.Img(
-                src="assets/CEIA_Header_Logo.png",
+                src=static.url('CEIA_Header_Logo.png'),
                 className='two columns',
                 style={
                     'height': '20%',
@@ -50,7 +54,7 @@ html_obj = html.Div([
 
             html.Div([
                 html.Img(
-                    src='assets/Tricolor_Spacer_Wide.png',
+                    src=static.url('Tricolor_Spacer_Wide.png'),
                     className='twelve columns')
             ],
             className = 'twelve columns',
@@ -156,7 +160,38 @@ html_obj = html.Div([
                                     className='four columns',
                                 ),
 
-                            ], style={'margin-top':30, 'margin-bottom':126}) #not entirely sure why this is precisely 126, but it is so that tab lengths are even
+                            ], className='row', style={'margin-top':30}),
+
+                            html.Div([
+                                html.Div([
+                                    html.P("REC Expiry Accounting:", style={'display':'inline-block'}),
+
+                                    html.Div([
+                                        '\u003f\u20dd',
+                                        html.Span('Approximate expires the surplus created a shelf life ago. Vintage (FIFO) tracks the RECs of each year, surrenders the oldest first and retires any left unused after the shelf life.'
+                                        , className="tooltiptext")], className="tooltip", style={'padding-left':5}),
+                                    dcc.Dropdown(
+                                        id='rec_expiry',
+                                        options=[{'label':'Approximate (surplus)', 'value':'approximate'}, {'label':'Vintage (FIFO)', 'value':'fifo'}],
+                                        clearable=False,
+                                        value='approximate')
+                                        ],
+                                    className='four columns',
+                                ),
+
+                                html.Div([
+                                    html.P("REC Shelf Life (years):", style={'display':'inline-block'}),
+
+                                    html.Div([
+                                        '\u003f\u20dd',
+                                        html.Span('Years a REC can be used to meet the RPS, including the year it is created. Expiry starts in 2023.'
+                                        , className="tooltiptext")], className="tooltip", style={'padding-left':5}),
+                                    dcc.Input(id='rec_shelf_life',value=3,type='number',step=1,style={'width':'100%'}, min=1)
+                                        ],
+                                    className='four columns',
+                                ),
+
+                            ], className='row', style={'margin-top':20, 'margin-bottom':46}) #keeps tab lengths even with the row above
                         ]),
                                 
                 dcc.Tab(label='Energy Mix and Cost Input', className='custom-tab', selected_className='custom-tab--selected', value='energy-mix',
@@ -272,6 +307,38 @@ html_obj = html.Div([
                                 className='twelve columns',
                                 style={'margin-top':30,'verticalAlign':'top'}),
 
+                                html.Div([
+                                    html.Div([
+                                        html.P("Hourly Generation Profile:",
+                                        style={'display':'inline-block'}),
+
+                                        html.Div([
+                                            '\u003f\u20dd',
+                                            html.Span('The hourly profile splits planned procurement generation into months for the RECs Created by Month figure, the capacity factors above still set annual generation. Flat spreads generation evenly, the Luzon, Visayas and Mindanao profiles are illustrative typical shapes. Upload a CSV with 8760 hourly rows and a column per Generation Source to use measured profiles.'
+                                            , className="tooltiptext")], className="tooltip", style={'padding-left':5}),
+
+                                        dcc.Dropdown(
+                                            id='generation_profile',
+                                            options=[{'label':'Flat (capacity factor x 8760)', 'value':profiles.FLAT}] + [{'label':'Typical {}'.format(r), 'value':r} for r in profiles.REGIONS],
+                                            value=profiles.FLAT,
+                                            clearable=False,
+                                        ),
+                                    ],
+                                    className='six columns'),
+
+                                    html.Div([
+                                        dcc.Upload(
+                                            id='profile_upload',
+                                            max_size=profiles.MAX_UPLOAD_BYTES,
+                                            children=html.Div(['Drag and Drop or ', html.A('Select a Profile CSV')]),
+                                            style={'borderWidth':1, 'borderStyle':'dashed', 'borderRadius':5, 'textAlign':'center', 'padding':5, 'margin-top':38},
+                                        ),
+                                        dcc.Markdown(id='profile_upload_text', children=['']),
+                                    ],
+                                    className='six columns'),
+                                ],
+                                className='row'),
+
                                 html.Div([
                                     html.Div([
                                         html.P("Utility-Scale Solar Capacity Factor:",
@@ -469,6 +536,54 @@ html_obj = html.Div([
                                 ),
                             ], style={'margin-top':30, 'margin-bottom':126}) #not entirely sure why this is precisely 126, but it is so that tab lengths are even
                 ]),
+                dcc.Tab(label='Uncertainty (Advanced)', className='custom-tab', selected_className='custom-tab--selected', value='uncertainty',
+                        children=[
+                            html.Div([
+                                html.Div([
+                                    dcc.Checklist(id='mc_toggle', options=[{'label':' Show P10-P90 uncertainty bands', 'value':'on'}], value=[]),
+                                    html.P("Distribution:",style={'display':'inline-block'}),
+
+                                    html.Div([
+                                        '\u003f\u20dd',
+                                        html.Span('Shape used to sample each uncertain input around its value in the other tabs. Spreads are a standard deviation for normal, and a half-width for uniform and triangular.'
+                                        , className="tooltiptext")], className="tooltip", style={'padding-left':5}),
+                                    dcc.Dropdown(id='mc_dist', options=[{'label':i.capitalize(), 'value':i} for i in ['normal','uniform','triangular']], value='normal', clearable=False),
+                                        ],
+                                    className = 'four columns',
+                                ),
+
+                                html.Div([
+                                    html.P("Demand Growth Spread (%):",style={'display':'inline-block'}),
+
+                                    html.Div([
+                                        '\u003f\u20dd',
+                                        html.Span('Relative uncertainty in annual demand growth, i.e. 25% of a 6% growth rate.'
+                                        , className="tooltiptext")], className="tooltip", style={'padding-left':5}),
+                                    dcc.Input(id='mc_growth_spread', value=25, type='number', min=0, style={'width':'100%'}),
+                                    html.P("Capacity Factor Spread (%):",style={'display':'inline-block'}),
+                                    dcc.Input(id='mc_cf_spread', value=10, type='number', min=0, style={'width':'100%'}),
+                                        ],
+                                    className = 'four columns',
+                                ),
+
+                                html.Div([
+                                    html.P("LCOE Spread (%):",style={'display':'inline-block'}),
+                                    dcc.Input(id='mc_lcoe_spread', value=15, type='number', min=0, style={'width':'100%'}),
+                                    html.P("Draws / Seed:",style={'display':'inline-block'}),
+
+                                    html.Div([
+                                        '\u003f\u20dd',
+                                        html.Span('Number of Monte Carlo draws, and the random seed. The same seed always gives the same bands.'
+                                        , className="tooltiptext")], className="tooltip", style={'padding-left':5}),
+                                    html.Div([
+                                        dcc.Input(id='mc_draws', value=10000, type='number', min=100, max=100000, step=100, style={'width':'50%'}),
+                                        dcc.Input(id='mc_seed', value=42, type='number', min=0, step=1, style={'width':'50%'}),
+                                    ]),
+                                        ],
+                                    className='four columns',
+                                ),
+                            ], style={'margin-top':30, 'margin-bottom':126})
+                ]),
             ]),
         ]),
     ]),
@@ -477,7 +592,7 @@ html_obj = html.Div([
     html.Div([
         html.Div([
             html.Img(
-                src='assets/Tricolor_Spacer_Wide.png',
+                src=static.url('Tricolor_Spacer_Wide.png'),
                 className='twelve columns')],
         className = 'twelve columns',
         style={'margin-left':'auto','margin-right':'auto'}),
@@ -548,6 +663,11 @@ html.Div([
                 }),
         ],
     className='twelve columns'),
+
+    html.Div([
+        dcc.Graph(id="monthly_REC_graph")
+    ],
+    className = 'twelve columns'),
     ],
 className = 'row',
 ),
@@ -556,7 +676,7 @@ html.Div([
 
     html.Div([
         html.Img(
-            src='assets/Tricolor_Spacer_Wide.png',
+            src=static.url('Tricolor_Spacer_Wide.png'),
             className='twelve columns')
     ],
     className = 'twelve columns',
@@ -638,7 +758,7 @@ html.Div([
 
     html.Div([
         html.Img(
-            src='assets/Tricolor_Spacer_Wide.png',
+            src=static.url('Tricolor_Spacer_Wide.png'),
             className='twelve columns')
     ],
     className = 'twelve columns',
@@ -698,7 +818,7 @@ html.Div([
 html.Div([
     html.Div([
         html.Img(
-            src='assets/Tricolor_Spacer_Wide.png',
+            src=static.url('Tricolor_Spacer_Wide.png'),
             className='twelve columns')
     ],
     className = 'twelve columns',
@@ -784,6 +904,57 @@ html.Div([
             className = 'reference_box'),
         ],
         className='twelve columns'),
+
+        html.Div([
+            html.Div([
+                dcc.Markdown("""
+                Which of your inputs matter most? Each bar moves one input down or up by the percentage below, with everything else held at your values,
+                and shows the total REC shortfall through the end year and the end year generation cost that result. The longest bars are the inputs worth checking first.
+                """.replace('  ', ''))
+            ],
+            className='eight columns'),
+
+            html.Div([
+                html.P("Change Each Input By (%):",style={'display':'inline-block'}),
+                dcc.Input(id='sensitivity_step', value=10, type='number', min=1, max=100, step=1, style={'width':'100%'}),
+            ],
+            className='four columns'),
+
+            html.Div([
+                dcc.Graph(id='sensitivity_graph')
+            ],
+            className='twelve columns'),
+        ],
+        className='twelve columns',
+        style={'margin-top':20}),
+
+        html.Div([
+            html.Div([
+                dcc.Markdown("""
+                Renewable mixes do not have to follow the scenarios above. The chart below compares end year cost and emissions for many mixes of the renewables in your energy mix
+                at desired renewable percentages from 10% to 100%. The line joins the cheapest mix at each percentage, the larger markers are the portfolios no other one beats on both cost and emissions, and the star marks your selected scenario.
+                """.replace('  ', ''))
+            ],
+            className='eight columns'),
+
+            html.Div([
+                html.P("Random Renewable Mixes:",style={'display':'inline-block'}),
+
+                html.Div([
+                    '\u003f\u20dd',
+                    html.Span('Mixes drawn evenly over all combinations of renewable sources, in addition to each source alone and the scenarios above. Each is evaluated at every desired percentage.'
+                    , className="tooltiptext")], className="tooltip", style={'padding-left':5}),
+                dcc.Input(id='frontier_mixes', value=1000, type='number', min=0, max=20000, step=100, style={'width':'100%'}),
+            ],
+            className='four columns'),
+
+            html.Div([
+                dcc.Graph(id='frontier_graph')
+            ],
+            className='twelve columns'),
+        ],
+        className='twelve columns',
+        style={'margin-top':20}),
     ],
     className='row',
     ),
@@ -796,7 +967,7 @@ className='row',
 html.Div([
     html.Div([
             html.Img(
-                src='assets/Tricolor_Spacer_Wide.png',
+                src=static.url('Tricolor_Spacer_Wide.png'),
                 className='twelve columns')
         ],
         className = 'twelve columns',
@@ -840,7 +1011,7 @@ html.Div([
 
         html.A([
             html.Img(
-                src='assets/rede_xsmall.png',
+                src=static.url('rede_xsmall.png'),
                 className = 'four columns',
                 style={
                     'width':'20%',
@@ -873,7 +1044,7 @@ html.Div([
 
         html.A([
             html.Img(
-                src='assets/SAM_xsmall.png',
+                src=static.url('SAM_xsmall.png'),
                 className = 'four columns',
                 style={
                     'width':'20%',
@@ -967,7 +1138,7 @@ html.Div([
         html.Div([
             
             html.Img(
-                src='assets/WRI_logo_4c.png',
+                src=static.url('WRI_logo_4c.png'),
                 className='two columns',
                 style={
                     'width':'30%',
@@ -978,7 +1149,7 @@ html.Div([
             ),
 
             html.Img(
-                src='assets/Allotrope_Logo_hi-res.png',
+                src=static.url('Allotrope_Logo_hi-res.png'),
                 className='two columns',
                 style={
                     'width': '30%',
@@ -989,7 +1160,7 @@ html.Div([
             ),
 
             html.Img(
-                src='assets/NREL logo w tagline.png',
+                src=static.url('NREL logo w tagline.png'),
                 className='two columns',
                 style={
                     'width':'30%',
@@ -1018,7 +1189,7 @@ html.Div([
         html.Div([
 
             html.Img(
-                src='assets/United States govt logo.png',
+                src=static.url('United States govt logo.png'),
                 className='two columns',
                 style={
                     'width': '20%',
@@ -1029,7 +1200,7 @@ html.Div([
             ),
 
             html.Img(
-                src='assets/BMUB logo.png',
+                src=static.url('BMUB logo.png'),
                 className='two columns',
                 style={
                     'width': '40%',
@@ -1040,7 +1211,7 @@ html.Div([
             ),
 
             html.Img(
-                src='assets/P4G large_logo.png',
+                src=static.url('P4G large_logo.png'),
                 className='two columns',
                 style={
                     'width': '30%',
@@ -1059,7 +1230,7 @@ html.Div([
 
     html.Div([
         html.Img(
-            src='assets/Tricolor_Spacer_Wide.png',
+            src=static.url('Tricolor_Spacer_Wide.png'),
             className='twelve columns')
     ],
     className = 'twelve columns',
@@ -1073,7 +1244,12 @@ dcc.Store(id='intermediate_df'), #rps policy scenario, requirements, demand, rec
 dcc.Store(id='intermediate_df_capacity'),
 dcc.Store(id='intermediate_dict_scenario'),
 dcc.Store(id='intermediate_lcoe_df'),
-dcc.Store(id='future_procurement_df')
+dcc.Store(id='energy_mix'), #validated energy_mix_table, see functions.energy_mix_normalizer
+dcc.Store(id='future_procurement_df'),
+dcc.Store(id='uncertainty_bands'),
+dcc.Store(id='text_templates', data=templates.TEXT), #markdown for the clientside text outputs
+dcc.Store(id='lcoe_base', data=functions.lcoe_base_figure() if functions.CLIENTSIDE else None), #static part of lcoe_graph
+dcc.Store(id='frontier_base'), #frontier_graph without the selected scenario, see functions.frontier_figure
 
 ], 
 className='ten columns offset-by-one'
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlparse
+
+import numpy as np
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Load Test ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Usage:
+#   python loadtest.py --sessions 40 --concurrency 8                      starts gunicorn dash_phl:server on a free port
+#   python loadtest.py --workers 4 --worker-class gthread --threads 4     compare gunicorn settings
+#   python loadtest.py --url http://127.0.0.1:8050 --concurrency 4        an already running server
+#   python loadtest.py --output run.json                                  save the report
+#
+# Each simulated analyst loads the page, then makes --actions edits (utility change, capacity
+# factor slider drag, planned procurement table edit, end year change). Like dash-renderer, each
+# edit fires every server callback downstream of it, in dependency order, and only the ones whose
+# inputs actually changed. Clientside callbacks run in the browser and are skipped.
+# The same --seed gives the same sessions and requests, so runs differ only in the server setup.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+ACTIONS = ['utility', 'slider', 'table', 'end_year'] #what an analyst edits after the page load
+ACTION_WEIGHTS = [0.2, 0.4, 0.3, 0.1]
+DRAG_STEPS = 5 #slider values sent during one drag
+
+# --- HTTP ---
+class Client(object):
+    """One keep-alive connection per simulated browser, reopened when the server closes it."""
+
+    def __init__(self, url, timeout=60):
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        """Returns (status, parsed JSON or None)."""
+        data = None if body is None else json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=data, headers=headers)
+                resp = self.conn.getresponse()
+                raw = resp.read()
+                if resp.will_close:
+                    self.close()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+        is_json = raw[:1] in (b'{', b'[') and resp.status == 200
+        return resp.status, (json.loads(raw.decode('utf-8')) if is_json else None)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+# --- Dash Renderer ---
+def layout_props(node, out=None):
+    """{(id, property): value} of every component in a _dash-layout tree."""
+    out = dict() if out is None else out
+    if isinstance(node, list):
+        for n in node:
+            layout_props(n, out)
+    elif isinstance(node, dict) and 'props' in node:
+        props = node['props']
+        if 'id' in props:
+            for k, v in props.items():
+                if k != 'children' or not isinstance(v, (dict, list)):
+                    out[(props['id'], k)] = v
+        layout_props(props.get('children'), out)
+    return out
+
+class Graph(object):
+    """Server callbacks from _dash-dependencies, in an order where producers come before consumers."""
+
+    def __init__(self, dependencies):
+        self.callbacks = []
+        for d in dependencies:
+            if d.get('clientside_function'):
+                continue
+            outputs = [tuple(o.rsplit('.', 1)) for o in d['output'].strip('.').split('...')]
+            self.callbacks.append({'output': d['output'], 'outputs': outputs,
+                                   'inputs': [(i['id'], i['property']) for i in d['inputs']],
+                                   'state': [(s['id'], s['property']) for s in d['state']]})
+        produced = {o: c['output'] for c in self.callbacks for o in c['outputs']}
+        ordered, done = [], set()
+        pending = list(self.callbacks)
+        while pending:
+            ready = [c for c in pending if all(produced.get(i) in done or i not in produced for i in c['inputs'])]
+            if not ready:
+                raise ValueError('callback graph has a cycle: {}'.format([c['output'] for c in pending]))
+            for c in ready:
+                ordered.append(c)
+                done.add(c['output'])
+                pending.remove(c)
+        self.callbacks = ordered
+
+    def fire(self, client, props, changed, record):
+        """
+        Fire every callback whose inputs changed, feeding outputs downstream. props is updated in place.
+
+        Input
+        -----
+            -changed (set): (id, property) pairs edited by the user, None for the initial page load
+            -record (function): called with (callback output, seconds, status) per request
+        """
+        changed = None if changed is None else set(changed)
+        for c in self.callbacks:
+            if changed is not None and not changed.intersection(c['inputs']):
+                continue
+            body = {'output': c['output'],
+                    'inputs': [{'id': i, 'property': p, 'value': props.get((i, p))} for i, p in c['inputs']],
+                    'state': [{'id': i, 'property': p, 'value': props.get((i, p))} for i, p in c['state']]}
+            t = time.perf_counter()
+            status, response = client.request('POST', '/_dash-update-component', body)
+            record(c['output'], time.perf_counter() - t, status)
+            if status != 200 or response is None:
+                continue #204 is PreventUpdate, nothing downstream fires
+            response = response['response']
+            for i, p in c['outputs']:
+                if 'props' in response and len(c['outputs']) == 1:
+                    value, present = response['props'].get(p), p in response['props']
+                else:
+                    value, present = response.get(i, dict()).get(p), p in response.get(i, dict())
+                if present:
+                    props[(i, p)] = value
+                    if changed is not None:
+                        changed.add((i, p))
+
+# --- Sessions ---
+TABLE = ('future_procurement_table', 'data')
+
+def session_actions(rng, props, n_actions):
+    """
+    Seeded list of edits, each a list of {(id, property): value} steps fired one after another.
+
+    A TABLE step holds the row to append to the session's planned procurement table.
+    """
+    utilities = [o['value'] for o in props.get(('utility_name', 'options'), [])]
+    sliders = [k[0] for k in props if k[1] == 'value' and k[0].endswith('_cf')]
+    sources = [o['value'] for o in props[('future_procurement_table', 'dropdown')]['Generation Source']['options']]
+    end_years = [o['value'] for o in props.get(('end_year', 'options'), [])] or list(range(2030, 2041))
+
+    out = []
+    for kind in rng.choice(ACTIONS, size=n_actions, p=ACTION_WEIGHTS):
+        if kind == 'utility' and utilities:
+            out.append([{('utility_name', 'value'): utilities[rng.randint(len(utilities))]}])
+        elif kind == 'slider' and sliders:
+            slider = sorted(sliders)[rng.randint(len(sliders))]
+            start = float(props[(slider, 'value')])
+            stop = float(rng.randint(10, 90))
+            out.append([{(slider, 'value'): round(float(v) * 2) / 2} for v in np.linspace(start, stop, DRAG_STEPS + 1)[1:]])
+        elif kind == 'table':
+            row = {'Generation Source': sources[rng.randint(len(sources))],
+                   'Capacity (MW)': int(rng.randint(5, 300)), 'Online Year': int(rng.randint(2020, 2030))}
+            out.append([{TABLE: row}])
+        else:
+            out.append([{('end_year', 'value'): end_years[rng.randint(len(end_years))]}])
+    return out
+
+def run_session(url, graph, initial, seed, n_actions, think, record):
+    """One analyst: page load, then each seeded edit with think seconds between requests."""
+    client = Client(url)
+    try:
+        for path in ['/', '/_dash-layout', '/_dash-dependencies']:
+            t = time.perf_counter()
+            status, _ = client.request('GET', path)
+            record('GET ' + path, time.perf_counter() - t, status)
+        props = dict(initial)
+        graph.fire(client, props, None, record)
+        # --- Edits are drawn from the initial layout, so they don't depend on server responses ---
+        for action in session_actions(np.random.RandomState(seed), initial, n_actions):
+            for step in action:
+                if think:
+                    time.sleep(think)
+                if TABLE in step:
+                    step = {TABLE: props[TABLE] + [step[TABLE]]}
+                props.update(step)
+                graph.fire(client, props, set(step), record)
+    finally:
+        client.close()
+
+# --- Server ---
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(workers, worker_class, threads, port, timeout=120):
+    """Start gunicorn dash_phl:server and wait until it answers, returns the process."""
+    cmd = [sys.executable, '-m', 'gunicorn', 'dash_phl:server', '--bind', '127.0.0.1:{}'.format(port),
+           '--workers', str(workers), '--worker-class', worker_class, '--threads', str(threads), '--log-level', 'warning']
+    proc = subprocess.Popen(cmd, cwd=HERE)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit('gunicorn exited with status {}, is it installed (pip install gunicorn)?'.format(proc.returncode))
+        try:
+            Client('http://127.0.0.1:{}'.format(port), timeout=5).request('GET', '/_dash-layout')
+            return proc
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.25)
+    proc.terminate()
+    raise SystemExit('gunicorn did not answer within {} s'.format(timeout))
+
+# --- Report ---
+def summarize(samples, elapsed):
+    """Per-callback count, errors and p50/p95/p99 latency, and overall throughput."""
+    by_callback = dict()
+    for name, seconds, status in samples:
+        by_callback.setdefault(name, []).append((seconds, status))
+    callbacks = dict()
+    for name, rows in by_callback.items():
+        ms = np.array([r[0] for r in rows]) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        callbacks[name] = {'requests': len(rows), 'errors': sum(1 for r in rows if r[1] >= 400),
+                           'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'total_s': float(ms.sum() / 1000)}
+    ms = np.array([s[1] for s in samples]) * 1000
+    return {'requests': len(samples), 'errors': sum(1 for s in samples if s[2] >= 400), 'elapsed_s': elapsed,
+            'throughput_rps': len(samples) / elapsed if elapsed else 0.,
+            'p50_ms': float(np.percentile(ms, 50)), 'p95_ms': float(np.percentile(ms, 95)), 'p99_ms': float(np.percentile(ms, 99)),
+            'callbacks': callbacks}
+
+def run(url, sessions, concurrency, n_actions, seed, think=0.):
+    """Replay sessions over concurrency threads, returns summarize() of every request."""
+    setup = Client(url)
+    _, layout = setup.request('GET', '/_dash-layout')
+    _, dependencies = setup.request('GET', '/_dash-dependencies')
+    setup.close()
+    graph = Graph(dependencies)
+    initial = layout_props(layout)
+
+    samples = []
+    lock = threading.Lock()
+    def record(name, seconds, status):
+        with lock:
+            samples.append((name, seconds, status))
+
+    queue = list(range(sessions))
+    def worker():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                i = queue.pop(0)
+            run_session(url, graph, initial, seed + i, n_actions, think, record)
+
+    t = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    return summarize(samples, time.perf_counter() - t)
+
+# --- Main ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay concurrent calculator sessions against a local server.')
+    parser.add_argument('--url', default=None, help='server to test, by default gunicorn is started on a free port')
+    parser.add_argument('--sessions', type=int, default=20, help='simulated analysts in total')
+    parser.add_argument('--concurrency', type=int, default=4, help='analysts active at once')
+    parser.add_argument('--actions', type=int, default=6, help='edits per analyst after the page load')
+    parser.add_argument('--think', type=float, default=0., help='seconds between an analyst\'s requests')
+    parser.add_argument('--seed', type=int, default=0, help='same seed, same requests')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn --workers')
+    parser.add_argument('--worker-class', default='sync', help='gunicorn --worker-class')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn --threads')
+    parser.add_argument('--output', default=None, help='save the report as JSON')
+    parser.add_argument('--json', action='store_true', help='print JSON instead of a table')
+    args = parser.parse_args(argv)
+
+    proc = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        proc = start_server(args.workers, args.worker_class, args.threads, port)
+        url = 'http://127.0.0.1:{}'.format(port)
+    try:
+        result = run(url, args.sessions, args.concurrency, args.actions, args.seed, args.think)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    import benchmarks
+    report = {'config': {k: getattr(args, k) for k in ['sessions', 'concurrency', 'actions', 'think', 'seed']},
+              'server': {'url': args.url} if args.url else {'workers': args.workers, 'worker_class': args.worker_class,
+                                                            'threads': args.threads},
+              'environment': benchmarks.environment(), 'result': result}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    if args.json:
+        print(json.dumps(report, indent=1, sort_keys=True))
+        return
+
+    print('{:,} requests in {:.1f} s, {:.1f} req/s, {} errors, p50 {:.0f} ms, p95 {:.0f} ms, p99 {:.0f} ms'.format(
+        result['requests'], result['elapsed_s'], result['throughput_rps'], result['errors'],
+        result['p50_ms'], result['p95_ms'], result['p99_ms']))
+    print('\n{:<64}{:>8}{:>8}{:>10}{:>10}{:>10}'.format('callback', 'n', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for name, c in sorted(result['callbacks'].items(), key=lambda kv: -kv[1]['total_s']):
+        print('{:<64}{:>8}{:>8}{:>10.1f}{:>10.1f}{:>10.1f}'.format(name[:63], c['requests'], c['errors'],
+                                                                   c['p50_ms'], c['p95_ms'], c['p99_ms']))
+
+if __name__ == '__main__':
+    main()
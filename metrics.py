@@ -0,0 +1,207 @@
+import os
+import glob
+import json
+import time
+import threading
+from functools import wraps
+
+import numpy as np
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Callback Metrics ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Per-callback latency, serialization time, payload sizes and errors, plus the bytes store tokens
+# take (see wire.py), served as Prometheus text on /metrics. RPS_METRICS=1 turns it on; otherwise
+# instrument() returns without touching the app, so there is no cost and no /metrics route.
+#
+# Each process keeps one float64 array of (callback, histogram, bucket) counts. With
+# RPS_METRICS_DIR set, that array is a memory-mapped file per worker in the directory, and
+# /metrics sums every worker's file, so a scrape sees the whole gunicorn server.
+
+ENABLED = os.environ.get('RPS_METRICS', '0') == '1'
+METRICS_DIR = os.environ.get('RPS_METRICS_DIR')
+PREFIX = 'rps_callback'
+
+SECONDS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+BYTES = [100, 300, 1e3, 3e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7, 3e7, 1e8]
+
+# --- name, bucket bounds, help ---
+HISTOGRAMS = [
+    ('duration_seconds', SECONDS, 'Wall time of a callback, computing and serializing its output.'),
+    ('serialization_seconds', SECONDS, 'Time spent building and JSON encoding the response after the callback returned.'),
+    ('input_bytes', BYTES, 'Size of the callback request body.'),
+    ('output_bytes', BYTES, 'Size of the JSON response.'),
+]
+N_BUCKETS = len(SECONDS) + 1 #bounds plus +Inf
+ERRORS = len(HISTOGRAMS) #row of the error counter
+
+# --- Registry ---
+class Registry(object):
+    """
+    Histograms of every instrumented callback.
+
+    Input
+    -----
+        -names (list): callback ids, in registration order (the same in every worker)
+        -directory (str): where to keep a memory-mapped file per process, or None for memory only
+
+    values[c, h, :N_BUCKETS] counts observations per bucket, values[c, h, N_BUCKETS] is their sum,
+    and values[c, ERRORS, 0] counts exceptions.
+    """
+
+    def __init__(self, names, directory=None):
+        self.names = list(names)
+        self.directory = directory
+        self.lock = threading.Lock()
+        self._values = None
+        self._pid = None
+
+    def _shape(self):
+        return (len(self.names), len(HISTOGRAMS) + 1, N_BUCKETS + 1)
+
+    @property
+    def values(self):
+        """This process's array, created on first use (and again in a forked worker)."""
+        if self._values is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            if self.directory is None:
+                self._values = np.zeros(self._shape())
+            else:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(os.path.join(self.directory, 'callbacks.json'), 'w') as f:
+                    json.dump(self.names, f)
+                path = os.path.join(self.directory, 'metrics-{}.npy'.format(self._pid))
+                self._values = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=self._shape())
+        return self._values
+
+    def observe(self, name, samples):
+        """Record one call, samples has a value per HISTOGRAMS entry."""
+        c = self.names.index(name)
+        with self.lock:
+            values = self.values
+            for h, ((_, bounds, _), x) in enumerate(zip(HISTOGRAMS, samples)):
+                values[c, h, np.searchsorted(bounds, x)] += 1
+                values[c, h, N_BUCKETS] += x
+
+    def error(self, name):
+        with self.lock:
+            self.values[self.names.index(name), ERRORS, 0] += 1
+
+    def totals(self):
+        """Sum of every worker's array (this process's only, without a directory)."""
+        if self.directory is None:
+            return self.values.copy()
+        total = np.zeros(self._shape())
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.npy')):
+            try:
+                values = np.load(path, mmap_mode='r')
+            except (ValueError, OSError):
+                continue
+            if values.shape == total.shape:
+                total += values
+        return total
+
+# --- Exposition ---
+def _label(name):
+    return name.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(x):
+    return repr(float(x)) if x != int(x) else str(int(x))
+
+def exposition(registry):
+    """Prometheus text format (version 0.0.4) of every callback's histograms and error count."""
+    values = registry.totals()
+    lines = []
+    for h, (metric, bounds, help_text) in enumerate(HISTOGRAMS):
+        full = '{}_{}'.format(PREFIX, metric)
+        lines += ['# HELP {} {}'.format(full, help_text), '# TYPE {} histogram'.format(full)]
+        for c, name in enumerate(registry.names):
+            label = 'callback="{}"'.format(_label(name))
+            cumulative = np.cumsum(values[c, h, :N_BUCKETS])
+            for bound, count in zip(bounds + ['+Inf'], cumulative):
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(full, label, le, _number(count)))
+            lines.append('{}_sum{{{}}} {}'.format(full, label, _number(values[c, h, N_BUCKETS])))
+            lines.append('{}_count{{{}}} {}'.format(full, label, _number(cumulative[-1])))
+    full = '{}_errors_total'.format(PREFIX)
+    lines += ['# HELP {} Callbacks that raised an exception.'.format(full), '# TYPE {} counter'.format(full)]
+    for c, name in enumerate(registry.names):
+        lines.append('{}{{callback="{}"}} {}'.format(full, _label(name), _number(values[c, ERRORS, 0])))
+    return '\n'.join(lines) + '\n'
+
+def payload_exposition(sizes):
+    """Prometheus counters of store token bytes by producer, from wire.sizes() (this process only)."""
+    lines = []
+    for metric, field, help_text in [('tokens_total', 'tokens', 'Store tokens sent.'),
+                                     ('args_bytes_total', 'args_bytes', 'Bytes the tokens would take with RPS_STORE_ENCODING=args.'),
+                                     ('sent_bytes_total', 'sent_bytes', 'Bytes of the tokens as sent.'),
+                                     ('saved_bytes_total', 'saved_bytes', 'args_bytes minus sent_bytes.')]:
+        full = 'rps_store_{}'.format(metric)
+        lines += ['# HELP {} {}'.format(full, help_text), '# TYPE {} counter'.format(full)]
+        for producer, counts in sorted(sizes.items()):
+            lines.append('{}{{producer="{}"}} {}'.format(full, _label(producer), counts[field]))
+    return '\n'.join(lines) + '\n'
+
+# --- Instrumentation ---
+_registry = []
+
+def instrument(app, directory=METRICS_DIR):
+    """
+    Time every callback registered on app from now on and serve /metrics, if ENABLED.
+
+    Call it right after creating the app, before any @app.callback.
+    """
+    if not ENABLED or _registry:
+        return
+    import flask
+    from dash.exceptions import PreventUpdate
+
+    registry = Registry([], directory)
+    _registry.append(registry)
+    register = app.callback
+    local = threading.local()
+
+    def callback(output, inputs=[], state=[]):
+        before = set(app.callback_map)
+        decorator = register(output, inputs, state)
+        name = (set(app.callback_map) - before).pop()
+        registry.names.append(name)
+
+        def wrap(func):
+            @wraps(func)
+            def compute(*args, **kwargs):
+                t = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    local.compute = time.perf_counter() - t
+
+            dash_callback = decorator(compute)
+
+            @wraps(func)
+            def timed(*args, **kwargs):
+                local.compute = 0.
+                t = time.perf_counter()
+                try:
+                    out = dash_callback(*args, **kwargs)
+                except PreventUpdate:
+                    raise
+                except Exception:
+                    registry.error(name)
+                    raise
+                total = time.perf_counter() - t
+                request_bytes = (flask.request.content_length or 0) if flask.has_request_context() else 0
+                registry.observe(name, [total, total - local.compute, request_bytes, len(out)]) #dash encodes ASCII JSON, so chars are bytes
+                return out
+
+            app.callback_map[name]['callback'] = timed
+            return timed
+        return wrap
+
+    app.callback = callback
+
+    @app.server.route('/metrics')
+    def metrics_view():
+        import wire
+        return flask.Response(exposition(registry) + payload_exposition(wire.sizes()), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,220 @@
+import numpy as np
+
+import engine
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Monte Carlo Uncertainty ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Uncertain inputs are sampled as multiplicative factors around the deterministic
+# UI value. Each input group draws from its own seeded RandomState stream, so a
+# given seed reproduces the same draws regardless of chunk size.
+
+DISTRIBUTIONS = ['normal', 'uniform', 'triangular']
+STREAMS = {'demand_growth': 0, 'capacity_factor': 1, 'lcoe': 2}
+QUANTILES = (0.1, 0.5, 0.9)
+
+# --- Sampling ---
+def rng_stream(seed, name):
+    """Independent, reproducible RandomState for one input group."""
+    return np.random.RandomState([int(seed), STREAMS[name]])
+
+def sample_factors(rng, spec, size):
+    """
+    Draw multiplicative factors around 1.
+
+    Input
+    -----
+        -rng (RandomState): stream from rng_stream()
+        -spec (dict): {'dist': one of DISTRIBUTIONS, 'spread': relative spread (i.e. 0.2)}.
+            normal uses spread as the standard deviation, uniform and triangular as the half-width.
+        -size (tuple): output shape
+    """
+    spread = float(spec.get('spread', 0))
+    dist = spec.get('dist', 'normal')
+    if dist == 'normal':
+        factors = 1 + spread * rng.standard_normal(size)
+    elif dist == 'uniform':
+        factors = rng.uniform(1 - spread, 1 + spread, size)
+    elif dist == 'triangular':
+        factors = rng.triangular(1 - spread, 1, 1 + spread, size) if spread > 0 else np.ones(size)
+    else:
+        raise ValueError('Unknown distribution {}, expected one of {}'.format(dist, DISTRIBUTIONS))
+    return factors.clip(min=0) #no negative capacity factors or costs
+
+# --- Streaming Percentiles ---
+class StreamingQuantiles(object):
+    """
+    Fixed-memory quantile estimates for many series, fed one chunk of draws at a time.
+
+    Each series keeps a histogram whose range is set from the first chunk, padded
+    by half its span. Later values outside that range are counted in the edge bins
+    (see .overflow), so memory is bins x series no matter how many draws are added.
+    """
+
+    def __init__(self, n_series, bins=2048):
+        self.bins = bins
+        self.n_series = n_series
+        self.counts = np.zeros((n_series, bins))
+        self.total = 0
+        self.overflow = np.zeros(n_series, dtype=int)
+        self.sum = np.zeros(n_series)
+        self.min = np.full(n_series, np.inf)
+        self.max = np.full(n_series, -np.inf)
+        self.lo = None
+        self.width = None
+
+    def update(self, values):
+        """Add a (draw, series) chunk."""
+        values = np.asarray(values, dtype=float).reshape(-1, self.n_series)
+        if self.lo is None:
+            vmin, vmax = values.min(axis=0), values.max(axis=0)
+            pad = np.where(vmax > vmin, (vmax - vmin) / 2, np.abs(vmax) / 2 + 1)
+            self.lo = vmin - pad
+            self.width = (vmax + pad - self.lo) / self.bins
+
+        idx = np.floor((values - self.lo) / self.width).astype(int)
+        self.overflow += ((idx < 0) | (idx >= self.bins)).sum(axis=0)
+        idx = idx.clip(0, self.bins - 1) + np.arange(self.n_series) * self.bins
+        self.counts += np.bincount(idx.ravel(), minlength=self.n_series * self.bins).reshape(self.n_series, self.bins)
+        self.total += len(values)
+        self.sum += values.sum(axis=0)
+        self.min = np.minimum(self.min, values.min(axis=0))
+        self.max = np.maximum(self.max, values.max(axis=0))
+
+    def quantile(self, q):
+        """(len(q), series) estimates, linearly interpolated within a bin."""
+        q = np.atleast_1d(q)
+        cum = np.cumsum(self.counts, axis=1)
+        out = np.empty((len(q), self.n_series))
+        for i, qi in enumerate(q):
+            target = qi * self.total
+            b = np.argmax(cum >= target, axis=1)
+            prev = np.where(b > 0, cum[np.arange(self.n_series), b - 1], 0)
+            in_bin = self.counts[np.arange(self.n_series), b]
+            frac = np.where(in_bin > 0, (target - prev) / np.where(in_bin > 0, in_bin, 1), 0)
+            out[i] = self.lo + (b + frac) * self.width
+        return out.clip(self.min, self.max) #point masses (i.e. zero shortfall) stay exact
+
+    def mean(self):
+        return self.sum / max(self.total, 1)
+
+# --- Batched Evaluation ---
+def prepare(base):
+    """Arrays of a base case that stay the same for every batch evaluate() is given."""
+    years = engine.rps_years(base['end_year'])
+
+    # --- Procurement rows scatter into years with one matrix product ---
+    online_year = np.asarray(base['online_year'], dtype=float)
+    cf_group = np.asarray(base['cf_group'], dtype=int)
+    row_source = np.asarray(base['row_source'], dtype=int)
+    return dict(
+        years=years,
+        capacity=np.nan_to_num(np.asarray(base['capacity'], dtype=float)),
+        cf=np.nan_to_num(np.asarray(base['cf'], dtype=float)),
+        cf_group=cf_group,
+        n_groups=base.get('n_cf_groups', cf_group.max() + 1 if len(cf_group) else 0),
+        scatter=engine.procurement_matrix(np.arange(len(online_year)), online_year, np.ones(len(online_year)),
+                                          years, len(online_year)),
+        row_source=row_source,
+        in_mix=row_source >= 0,
+        lcoe=np.asarray(base['lcoe'], dtype=float),
+        current_mwh=(np.asarray(base['mix_pct'], dtype=float) / 100) * int(base['demand']),
+    )
+
+def evaluate(base, fixed, demand_growth, cf_factors, lcoe, fit_pct=None, annual_rps_inc_2020=None, annual_rps_inc_2023=None):
+    """
+    RPS ledger and end year scenario of a batch of cases around base.
+
+    Input
+    -----
+        -base (dict): see run()
+        -fixed (dict): prepare(base)
+        -demand_growth (array): (batch,) fractional annual demand growth
+        -cf_factors (array): (batch, n_cf_groups) multipliers of the planned procurement capacity factors, the product capped at 1
+        -lcoe (array): (batch, source) LCOE
+        -fit_pct, annual_rps_inc_2020, annual_rps_inc_2023 (array): (batch,) values, None keeps base's
+
+    Output
+    ------
+        -(rps_ledger dict of (batch, year) arrays, scenario_grid dict of (batch, 1, 1) arrays)
+    """
+    pick = lambda value, key: base[key] if value is None else value
+    cf = np.minimum(fixed['cf'] * cf_factors[:, fixed['cf_group']], 1) #(batch, row), a plant can't run more than every hour
+    generation = fixed['capacity'] * cf * 8760
+    ledger = engine.rps_ledger(demand=base['demand'], demand_growth=demand_growth, fit_pct=pick(fit_pct, 'fit_pct'),
+                               procurement=generation.dot(fixed['scatter']),
+                               annual_rps_inc_2020=pick(annual_rps_inc_2020, 'annual_rps_inc_2020'),
+                               annual_rps_inc_2023=pick(annual_rps_inc_2023, 'annual_rps_inc_2023'), end_year=base['end_year'],
+                               expiry=base.get('rec_expiry', 'approximate'),
+                               shelf_life=base.get('rec_shelf_life', engine.REC_SHELF_LIFE))
+
+    row_source, in_mix = fixed['row_source'], fixed['in_mix']
+    planned = np.zeros((len(generation), len(fixed['lcoe'])))
+    np.add.at(planned.T, row_source[in_mix], generation[:, in_mix].T)
+    grid = engine.scenario_grid(lcoe=lcoe, current_mwh=fixed['current_mwh'], planned=planned,
+                                re_mask=base['re_mask'], fossil_mask=base['fossil_mask'],
+                                weights=[base['weights']], desired_pct=[base['desired_pct']],
+                                end_demand=ledger['demand'][:, -1], start_recs=ledger['rec_change'][:, 0],
+                                emission_factors=base['emission_factors'])
+    return ledger, grid
+
+# --- Simulation ---
+def run(base, uncertainty, n_draws=10000, seed=0, chunk_size=2000, quantiles=QUANTILES):
+    """
+    Monte Carlo over demand growth, capacity factors and LCOE.
+
+    Input
+    -----
+        -base (dict): deterministic case with keys
+            demand, demand_growth, fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year (exclusive, as rps_ledger),
+            optionally rec_expiry and rec_shelf_life (rps_ledger expiry and shelf_life),
+            online_year, capacity, cf (fraction), cf_group (CF slider index) and row_source (index into the
+            energy mix sources, -1 if absent) for each planned procurement row, n_cf_groups,
+            lcoe, mix_pct, re_mask, fossil_mask, emission_factors and weights for each energy mix source,
+            desired_pct (fraction)
+        -uncertainty (dict): sample_factors() spec for 'demand_growth', 'capacity_factor' and 'lcoe'
+        -n_draws (int): number of draws
+        -seed (int): seed shared by every stream
+        -chunk_size (int): draws evaluated per vectorized pass
+
+    Output
+    ------
+        -dict with 'year', 'quantiles', 'rec_shortfall' (quantile, year), 'end_expense' and
+         'end_cost_kwh' (quantile,), and the number of draws
+    """
+    years = engine.rps_years(base['end_year'])
+    n_years = len(years)
+    streams = {name: rng_stream(seed, name) for name in STREAMS}
+
+    fixed = prepare(base)
+    n_groups, n_sources = fixed['n_groups'], len(fixed['lcoe'])
+
+    shortfall = StreamingQuantiles(n_years)
+    expense = StreamingQuantiles(1)
+    cost_kwh = StreamingQuantiles(1)
+
+    done = 0
+    while done < n_draws:
+        n = min(chunk_size, n_draws - done)
+
+        growth = base['demand_growth'] * sample_factors(streams['demand_growth'], uncertainty['demand_growth'], (n,))
+        cf_factors = sample_factors(streams['capacity_factor'], uncertainty['capacity_factor'], (n, n_groups))
+        lcoe_factors = sample_factors(streams['lcoe'], uncertainty['lcoe'], (n, n_sources))
+
+        ledger, grid = evaluate(base, fixed, growth, cf_factors, fixed['lcoe'] * lcoe_factors)
+        end_expense = grid['end_expense'][:, 0, 0]
+
+        shortfall.update(ledger['rec_shortfall'])
+        expense.update(end_expense)
+        cost_kwh.update(end_expense / ledger['demand'][:, -1] / 1000)
+        done += n
+
+    return {
+        'year': years,
+        'quantiles': np.asarray(quantiles),
+        'rec_shortfall': shortfall.quantile(quantiles),
+        'end_expense': expense.quantile(quantiles)[:, 0],
+        'end_cost_kwh': cost_kwh.quantile(quantiles)[:, 0],
+        'n_draws': n_draws,
+    }
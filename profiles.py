@@ -0,0 +1,291 @@
+import os
+import io
+import base64
+import glob
+import hashlib
+import warnings
+
+import numpy as np
+
+import engine
+import resources
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Hourly Generation Profiles ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# A profile is an 8760-hour shape per capacity factor slider (TECHS), stored as a float32
+# .npy file and opened with mmap_mode='r', so every worker reads the same page-cached copy.
+#
+# Profiles set *when* a technology generates, the capacity factor sliders still set *how much*:
+# a row's annual MWh is capacity * cf * 8760 whichever profile is selected, and its monthly MWh
+# is that total split by the profile's share of each month.
+#
+# The typical Luzon, Visayas and Mindanao profiles are illustrative shapes (clear-sky solar at
+# the region's latitude dimmed in the southwest monsoon, wind peaking in the northeast monsoon,
+# hydro in the wet season, flat geothermal and biomass), not measured data. Build them with
+# `python profiles.py`, or let typical() build them on first use. Measured profiles can be
+# uploaded as a CSV with 8760 rows and a column per technology. Uploads larger than
+# MAX_UPLOAD_BYTES are refused, and only the MAX_UPLOADS most recently used are kept.
+
+HOURS = 8760
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+MONTH_HOURS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]) * 24
+MONTH_START = np.concatenate([[0], np.cumsum(MONTH_HOURS)[:-1]]) #first hour of each month
+FLAT_SHARES = MONTH_HOURS / HOURS #month shares of a constant output
+
+TECHS = list(resources.cf_sliders) #profile rows, one per capacity factor slider
+FLAT = 'flat'
+UPLOAD_PREFIX = 'upload-'
+
+PROFILE_DIR = os.environ.get('RPS_PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+TYPICAL_PATH = os.path.join(PROFILE_DIR, 'typical.npy')
+MAX_UPLOAD_BYTES = int(os.environ.get('RPS_PROFILE_MAX_UPLOAD_BYTES', 5 * 2**20)) #a full 8760 x 6 CSV is well under 1 MB
+MAX_UPLOADS = int(os.environ.get('RPS_PROFILE_MAX_UPLOADS', 200)) #~210 KB each
+
+# --- Typical profile parameters: latitude (deg N), wet season solar dimming, NE monsoon wind swing, wet season hydro swing ---
+REGIONS = ['Luzon', 'Visayas', 'Mindanao']
+REGION_PARAMS = {
+    'Luzon': {'latitude': 15.5, 'cloud': 0.30, 'amihan': 0.60, 'wet': 0.50},
+    'Visayas': {'latitude': 10.5, 'cloud': 0.20, 'amihan': 0.45, 'wet': 0.35},
+    'Mindanao': {'latitude': 7.5, 'cloud': 0.10, 'amihan': 0.20, 'wet': 0.15},
+}
+
+# --- Helper Functions ---
+def _normalize(shapes):
+    """Scale each row to a mean of 1, the stored form of every profile."""
+    shapes = np.asarray(shapes, dtype=float)
+    return (shapes / shapes.mean(axis=-1, keepdims=True)).astype(np.float32)
+
+def _write(path, array):
+    """Save an .npy file atomically, so a worker never maps a half-written profile."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp, path)
+
+# --- Typical Profiles ---
+def region_shapes(latitude, cloud, amihan, wet):
+    """(TECHS, HOURS) shapes for one region, see REGION_PARAMS."""
+    hour = np.arange(HOURS)
+    day, hod = hour // 24, hour % 24
+    season = 2 * np.pi * day / 365
+
+    declination = np.radians(23.45) * np.sin(2 * np.pi * (284 + day + 1) / 365)
+    hour_angle = np.radians(15 * (hod + 0.5 - 12))
+    phi = np.radians(latitude)
+    sun = np.clip(np.sin(phi) * np.sin(declination) + np.cos(phi) * np.cos(declination) * np.cos(hour_angle), 0, None)
+    monsoon = 0.5 * (1 + np.cos(season - 2 * np.pi * 220 / 365)) #1 in August, 0 in February
+    solar = sun * (1 - cloud * monsoon)
+
+    wind = (1 + amihan * np.cos(season - 2 * np.pi * 15 / 365)) * (1 + 0.15 * np.sin(2 * np.pi * (hod - 8) / 24))
+    hydro = 1 + wet * np.cos(season - 2 * np.pi * 258 / 365)
+    flat = np.ones(HOURS)
+
+    shapes = {'solar_cf': solar, 'dpv_cf': solar, 'wind_cf': wind, 'geothermal_cf': flat, 'biomass_cf': flat, 'hydro_cf': hydro}
+    return _normalize([shapes[t] for t in TECHS])
+
+def build_typical():
+    """(REGIONS, TECHS, HOURS) float32 array of the typical profiles."""
+    return np.stack([region_shapes(**REGION_PARAMS[r]) for r in REGIONS])
+
+_typical = []
+
+def typical(rebuild=False):
+    """
+    Memory-mapped typical profiles, building TYPICAL_PATH first if it is missing or out of date.
+
+    If the file can't be written (i.e. a read-only deploy), the profiles are kept in memory instead.
+    """
+    if _typical and not rebuild:
+        return _typical[0]
+    expected = (len(REGIONS), len(TECHS), HOURS)
+    array = None
+    if not rebuild and os.path.exists(TYPICAL_PATH):
+        try:
+            array = np.load(TYPICAL_PATH, mmap_mode='r')
+        except (ValueError, OSError) as e:
+            warnings.warn('rebuilding typical profiles: {}'.format(e))
+        if array is not None and array.shape != expected:
+            array = None
+    if array is None:
+        array = build_typical()
+        try:
+            _write(TYPICAL_PATH, array)
+            array = np.load(TYPICAL_PATH, mmap_mode='r')
+        except OSError as e:
+            warnings.warn('keeping typical profiles in memory, could not write {}: {}'.format(TYPICAL_PATH, e))
+    del _typical[:]
+    _typical.append(array)
+    return array
+
+# --- Uploaded Profiles ---
+def upload_path(profile):
+    return os.path.join(PROFILE_DIR, '{}.npy'.format(profile))
+
+def parse_csv(text):
+    """
+    (TECHS, HOURS) shapes from CSV text, raising ValueError with a message for the user.
+
+    The CSV has one row per hour of a non-leap year and a column per technology, named by
+    Generation Source (i.e. 'Wind') or slider id (i.e. 'wind_cf'). Values can be MW, per-unit
+    output or any other scale, only the shape is kept. Technologies without a column stay flat.
+    """
+    import pandas as pd
+    try:
+        df = pd.read_csv(io.StringIO(text))
+    except Exception as e:
+        raise ValueError('could not read the profile CSV: {}'.format(e))
+    if len(df) != HOURS:
+        raise ValueError('a profile needs {:,} hourly rows, the CSV has {:,}'.format(HOURS, len(df)))
+
+    names = dict(resources.cf_slider_dict, **{t: t for t in TECHS})
+    unknown = [c for c in df.columns if str(c).strip() not in names]
+    if unknown:
+        raise ValueError('unknown profile columns {}, expected any of {}'.format(unknown, sorted(names)))
+
+    shapes = np.ones((len(TECHS), HOURS))
+    for c in df.columns:
+        values = pd.to_numeric(df[c], errors='coerce').values.astype(float)
+        if not (np.isfinite(values).all() and (values >= 0).all() and values.sum() > 0):
+            raise ValueError('profile column {!r} needs non-negative numbers in every row and some output'.format(c))
+        shapes[TECHS.index(names[str(c).strip()])] = values
+    return _normalize(shapes)
+
+def _touch(path):
+    """Mark an upload as used, evict_uploads() removes the least recently used first."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def evict_uploads(keep=MAX_UPLOADS):
+    """Delete all but the keep most recently used uploaded profiles, returns how many were removed."""
+    paths = glob.glob(os.path.join(PROFILE_DIR, UPLOAD_PREFIX + '*.npy'))
+    if len(paths) <= keep:
+        return 0
+    stamped = []
+    for p in paths:
+        try:
+            stamped.append((os.path.getmtime(p), p))
+        except OSError: #removed by another worker meanwhile
+            pass
+    stamped.sort(reverse=True)
+    removed = 0
+    for _, p in stamped[keep:]:
+        try:
+            os.remove(p) #workers that mapped it keep their copy, see hourly()
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+def save(shapes):
+    """Store uploaded shapes under a content-addressed id, evicting the oldest uploads past MAX_UPLOADS, returns the id."""
+    shapes = _normalize(shapes)
+    profile = UPLOAD_PREFIX + hashlib.sha1(shapes.tobytes()).hexdigest()[:16]
+    if os.path.exists(upload_path(profile)):
+        _touch(upload_path(profile))
+    else:
+        _write(upload_path(profile), shapes)
+        evict_uploads()
+    return profile
+
+def from_upload(contents):
+    """Save a dcc.Upload CSV ('data:<type>;base64,<data>'), returns the profile id."""
+    if len(contents) > MAX_UPLOAD_BYTES * 4 // 3 + 100: #base64 plus the data: prefix
+        raise ValueError('a profile CSV can be at most {:,} KB'.format(MAX_UPLOAD_BYTES // 1024))
+    try:
+        text = base64.b64decode(contents.split(',', 1)[1]).decode('utf-8-sig')
+    except (IndexError, ValueError, UnicodeDecodeError):
+        raise ValueError('a profile must be a UTF-8 CSV file')
+    return save(parse_csv(text))
+
+# --- Lookups ---
+_uploads = dict() #profile id: memmap, per process
+
+def check(profile):
+    """Raise ValueError unless profile is FLAT, a region or a stored upload."""
+    if profile == FLAT or profile in REGIONS:
+        return
+    if isinstance(profile, str) and profile.startswith(UPLOAD_PREFIX) and profile[len(UPLOAD_PREFIX):].isalnum():
+        if os.path.exists(upload_path(profile)):
+            return
+    raise ValueError('unknown generation profile {!r}, expected {!r}, one of {} or an uploaded profile'.format(profile, FLAT, REGIONS))
+
+def hourly(profile):
+    """(TECHS, HOURS) read-only shapes of a profile, None for FLAT."""
+    check(profile)
+    if profile == FLAT:
+        return None
+    if profile in REGIONS:
+        return typical()[REGIONS.index(profile)]
+    if profile not in _uploads:
+        _uploads[profile] = np.load(upload_path(profile), mmap_mode='r')
+    _touch(upload_path(profile)) #in use, so the last to be evicted
+    return _uploads[profile]
+
+_shares = dict() #profile id: (TECHS, 12), per process
+
+def monthly_shares(profile):
+    """(TECHS, 12) fraction of each technology's annual generation in each month."""
+    if profile not in _shares:
+        shapes = hourly(profile)
+        if shapes is None:
+            shares = np.tile(FLAT_SHARES, (len(TECHS), 1))
+        else:
+            totals = np.add.reduceat(np.asarray(shapes, dtype=float), MONTH_START, axis=1)
+            shares = totals / totals.sum(axis=1, keepdims=True)
+        _shares[profile] = shares
+    return _shares[profile]
+
+# --- Generation ---
+def generation(capacity, cf, tech, profile=FLAT):
+    """
+    Annual and monthly MWh of planned procurement rows.
+
+    Input
+    -----
+        -capacity (array): MW of each row
+        -cf (array): capacity factor of each row, as a fraction
+        -tech (array): index into TECHS of each row
+        -profile (str): FLAT, a region or an uploaded profile id
+
+    Output
+    ------
+        -annual (array): (row,) MWh
+        -monthly (array): (row, 12) MWh, summing to annual
+    """
+    annual = np.asarray(capacity, dtype=float) * np.asarray(cf, dtype=float) * HOURS
+    monthly = annual[:, None] * monthly_shares(profile)[np.asarray(tech, dtype=int)]
+    return annual, monthly
+
+def monthly_recs(fit_MWh, years, source, online_year, monthly, n_sources):
+    """
+    RECs created in each month of the ledger years.
+
+    Input
+    -----
+        -fit_MWh (array): (year,) FiT RECs, created evenly through the year
+        -years (array): ledger years
+        -source (array): group index of each procurement row (i.e. its Generation Source)
+        -online_year (array): year each row begins creating RECs
+        -monthly (array): (row, 12) MWh of each row, from generation()
+        -n_sources (int): number of groups
+
+    Output
+    ------
+        -fit (array): (year, 12) FiT RECs
+        -planned (array): (source, year, 12) RECs from planned procurement
+    """
+    fit = np.asarray(fit_MWh, dtype=float)[:, None] * FLAT_SHARES
+    new = engine.procurement_matrix(source, online_year, monthly, years, n_sources)
+    return fit, np.cumsum(new, axis=1)
+
+if __name__ == '__main__':
+    import time
+    t = time.time()
+    typical(rebuild=True)
+    print('built {} ({:,} bytes, {} regions x {} technologies) in {:.0f} ms'.format(
+        TYPICAL_PATH, os.path.getsize(TYPICAL_PATH), len(REGIONS), len(TECHS), (time.time() - t) * 1000))
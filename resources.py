@@ -1,35 +1,115 @@
-import pandas as pd
-
 # --- Import dfs and dicts used throughout ---
-dummy_df = pd.read_csv('dummy_df.csv')
-dummy_df['Year'] = dummy_df.index
-dummy_df_display = dummy_df[['Year','demand','rps_req','rec_req','rec_created','rec_expired','end_rec_balance','rec_shortfall']]
-dummy_df_display.columns = ['Year','Energy Sales (MWh)','RPS Requirement (%)','RPS Requirement (RECs)', 'RECs Created', 'RECs Expired','Year End REC Balance','REC Purchase Requirement']
+# Datasets are loaded on first access (PEP 562 module __getattr__), so importing
+# resources is free and a worker only pays for the tables it actually uses.
+_loaders = dict()
+
+def dataset(*names):
+    """Register a loader returning one value per name, run the first time any of them is accessed."""
+    def register(func):
+        for n in names:
+            _loaders[n] = (names, func)
+        return func
+    return register
+
+def __getattr__(name):
+    if name not in _loaders:
+        raise AttributeError("module 'resources' has no attribute {!r}".format(name))
+    names, func = _loaders[name]
+    values = func()
+    globals().update(zip(names, values if len(names) > 1 else [values]))
+    return globals()[name]
+
+# --- Reference bundle, compiled from the CSVs (see bundle.py) ---
+BUNDLE_PATH = 'reference.bundle'
+REFERENCE_CSVS = {
+    'dummy_df': ('dummy_df.csv', None),
+    'irena_lcoe': ("irena_lcoe.csv", None),
+    'dummy_lcoe': ("dummy_lcoe.csv", None),
+    'energy_mix': ("energy_mix.csv", None),
+    'dummy_desired_pct': ("dummy_desired_pct.csv", None),
+    'dummy_requirement': ("dummy_requirement.csv", None),
+    'utility_data': ("utility_data.csv", 'utility'),
+    'emissions': ('emissions.csv', None),
+} #table: (csv, index column)
+
+def build_reference():
+    """Parse every reference CSV and the lookup dicts built from them, returns (frames, lookups)."""
+    import pandas as pd
+    frames = {k: pd.read_csv(path, index_col=index) for k, (path, index) in REFERENCE_CSVS.items()}
+    utility_df = frames['utility_data']
+    lookups = {
+        'utility_dict': utility_df[~utility_df.index.duplicated(keep='first')].to_dict('index'),
+        'emissions_dict': dict(zip(frames['emissions']['Generation Source'], frames['emissions']['CO2'])),
+    }
+    return frames, lookups
+
+_reference = []
+
+def reference(rebuild=False):
+    """The memory-mapped reference bundle, rebuilt when missing or older than a source CSV."""
+    import bundle
+    if rebuild:
+        frames, lookups = build_reference()
+        bundle.write(BUNDLE_PATH, frames, lookups, bundle.source_stats([p for p, _ in REFERENCE_CSVS.values()]))
+        del _reference[:]
+    if not _reference:
+        _reference.append(bundle.load(BUNDLE_PATH, [p for p, _ in REFERENCE_CSVS.values()], build_reference))
+    return _reference[0]
+
+@dataset('dummy_df', 'dummy_df_display')
+def _dummy():
+    dummy_df = reference().frame('dummy_df')
+    dummy_df['Year'] = dummy_df.index
+    dummy_df_display = dummy_df[['Year','demand','rps_req','rec_req','rec_created','rec_expired','end_rec_balance','rec_shortfall']]
+    dummy_df_display.columns = ['Year','Energy Sales (MWh)','RPS Requirement (%)','RPS Requirement (RECs)', 'RECs Created', 'RECs Expired','Year End REC Balance','REC Purchase Requirement']
+    return dummy_df, dummy_df_display
 
-irena_lcoe_df = pd.read_csv("irena_lcoe.csv")
-irena_lcoe_df = irena_lcoe_df.dropna(subset = ['Technology'])
+@dataset('irena_lcoe_df', 'irena_lcoe_index')
+def _irena():
+    import irena
+    irena_lcoe_df = reference().frame('irena_lcoe')
+    irena_lcoe_df = irena_lcoe_df.dropna(subset = ['Technology'])
+    return irena_lcoe_df, irena.LCOEIndex.from_frame(irena_lcoe_df) #see irena.py for lookups
 
-dummy_lcoe_df = pd.read_csv("dummy_lcoe.csv")
+@dataset('dummy_lcoe_df')
+def _dummy_lcoe():
+    return reference().frame('dummy_lcoe')
 
-energy_mix_df = pd.read_csv("energy_mix.csv")
-energy_mix_df['Percent of Utility Energy Mix'] = energy_mix_df['Percent of Utility Energy Mix'] * 100
+@dataset('energy_mix_df')
+def _energy_mix():
+    energy_mix_df = reference().frame('energy_mix')
+    energy_mix_df['Percent of Utility Energy Mix'] = energy_mix_df['Percent of Utility Energy Mix'] * 100
+    return energy_mix_df
 
-new_build_df = pd.DataFrame({'Generation Source':['Utility-Scale Solar', '', ''],
-                            'Capacity (MW)': [0, '',''],
-                            'Online Year': [2020,'','']})
+@dataset('new_build_df')
+def _new_build():
+    import pandas as pd
+    return pd.DataFrame({'Generation Source':['Utility-Scale Solar', '', ''],
+                        'Capacity (MW)': [0, '',''],
+                        'Online Year': [2020,'','']})
 
-dummy_desired_pct_df = pd.read_csv("dummy_desired_pct.csv")
+@dataset('dummy_desired_pct_df')
+def _dummy_desired_pct():
+    return reference().frame('dummy_desired_pct')
 
-dummy_requirements_df = pd.read_csv("dummy_requirement.csv")
+@dataset('dummy_requirements_df')
+def _dummy_requirements():
+    return reference().frame('dummy_requirement')
 
-utility_df = pd.read_csv("utility_data.csv", index_col='utility')
-utility_dict = utility_df[~utility_df.index.duplicated(keep='first')].to_dict('index')
+@dataset('utility_df', 'utility_dict')
+def _utility():
+    return reference().frame('utility_data'), reference().lookup('utility_dict')
 
-emissions_df = pd.read_csv('emissions.csv')
-emissions_dict = dict(zip(emissions_df['Generation Source'], emissions_df['CO2']))
+@dataset('emissions_df', 'emissions_dict')
+def _emissions():
+    return reference().frame('emissions'), reference().lookup('emissions_dict')
 
 re_tech = ['Utility-Scale Solar','Net-Metering','GEOP','Wind','Geothermal','Biomass','Hydro']
+cf_sliders = ['solar_cf', 'dpv_cf', 'wind_cf', 'geothermal_cf', 'biomass_cf', 'hydro_cf']
+cf_slider_dict = {'Utility-Scale Solar':'solar_cf', 'Net-Metering':'dpv_cf', 'GEOP':'dpv_cf', 'Wind':'wind_cf',
+                  'Geothermal':'geothermal_cf', 'Biomass':'biomass_cf', 'Hydro':'hydro_cf'} #RE tech: capacity factor slider id
 fossil_tech = ['Coal', 'Natural Gas','Oil', 'WESM Purchases']
+required_mix_sources = ['Coal', 'Natural Gas', 'Oil', 'Utility-Scale Solar', 'Wind', 'Geothermal', 'Biomass', 'Hydro'] #read by the LCOE graph and economic text
 
 color_dict = {
     'Solar':('#ffc425'),
@@ -0,0 +1,284 @@
+import numpy as np
+
+import engine
+import profiles
+import resources
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Headless Scenarios ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# A scenario is a plain JSON-like dict carrying the same values as the UI
+# controls (percent inputs stay in percent). evaluate() returns the numbers
+# behind the RPS, capacity and scenario sections without building any figures.
+
+DEFAULTS = {
+    'utility': 'MERALCO',
+    'demand': None, #MWh, defaults to the utility's DOE sales
+    'demand_growth': None, #%, defaults to the utility's DOE growth
+    'fit_pct': 3.34,
+    'annual_rps_inc_2020': 1,
+    'annual_rps_inc_2023': 1,
+    'end_year': 2030,
+    'rec_expiry': 'approximate', #or 'fifo', see engine.rps_ledger
+    'rec_shelf_life': engine.REC_SHELF_LIFE, #years
+    'generation_profile': profiles.FLAT, #or a region or uploaded profile id, see profiles
+    'capacity_factors': {'solar_cf': 17, 'dpv_cf': 15, 'wind_cf': 30, 'geothermal_cf': 79, 'biomass_cf': 86, 'hydro_cf': 48},
+    'future_procurement': [],
+    'energy_mix': None, #defaults to energy_mix.csv
+    'desired_pct': 30,
+    'scenario': 'BAL',
+}
+
+SECTIONS = ['ledger', 'capacity_need', 'scenario', 'monthly_recs']
+MAX_END_YEAR = 2050 #the last year in the UI's End Year dropdown
+
+# --- Capacity need columns, in the order of functions.capacity_frame ---
+NEED_TECHS = [('Utility-Scale Solar', 'solar_cf'), ('Distributed PV', 'dpv_cf'), ('Geothermal', 'geothermal_cf'),
+              ('Wind', 'wind_cf'), ('Biomass', 'biomass_cf'), ('Hydro', 'hydro_cf')]
+
+# --- Row keys accepted from either the API or the UI tables ---
+PROCUREMENT_KEYS = {'source': 'Generation Source', 'online_year': 'Online Year', 'capacity_mw': 'Capacity (MW)'}
+MIX_KEYS = {'source': 'Generation Source', 'lcoe': 'Levelized Cost of Energy (₱ / kWh)', 'pct': 'Percent of Utility Energy Mix'}
+
+# --- Helper Functions ---
+def _row_value(row, key, aliases):
+    return row.get(key, row.get(aliases[key]))
+
+def _rows(value, name):
+    if not isinstance(value, list) or not all(isinstance(row, dict) for row in value):
+        raise ValueError('{} must be a list of objects'.format(name))
+    return value
+
+def _number(value, name, allow_none=False):
+    if value is None or value == '':
+        if allow_none:
+            return None
+        raise ValueError('{} is required'.format(name))
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('{} must be a number, got {!r}'.format(name, value))
+    if not np.isfinite(value):
+        raise ValueError('{} must be finite'.format(name))
+    return value
+
+def normalize(spec):
+    """
+    Fill defaults and validate one scenario, raising ValueError with a readable message.
+
+    Input
+    -----
+        -spec (dict): any subset of DEFAULTS. future_procurement rows take source, online_year and
+            capacity_mw, energy_mix rows take source, lcoe (₱ / kWh) and pct (% of energy mix).
+            Rows copied from the UI tables (i.e. 'Generation Source') work too.
+
+    Output
+    ------
+        -dict with every DEFAULTS key set and numeric values as floats
+    """
+    if not isinstance(spec, dict):
+        raise ValueError('a scenario must be a JSON object')
+    unknown = set(spec) - set(DEFAULTS)
+    if unknown:
+        raise ValueError('unknown keys: {}'.format(', '.join(sorted(unknown))))
+
+    out = dict(DEFAULTS)
+    out.update(spec)
+
+    utility = out['utility']
+    if not isinstance(utility, str):
+        raise ValueError('utility must be a string, got {!r}'.format(utility))
+    if (out['demand'] is None or out['demand_growth'] is None) and utility not in resources.utility_dict:
+        raise ValueError('unknown utility {!r}, pass demand and demand_growth instead'.format(utility))
+    if out['demand'] is None:
+        out['demand'] = resources.utility_dict[utility]['sales']
+    if out['demand_growth'] is None:
+        out['demand_growth'] = resources.utility_dict[utility]['growth_floor'] * 100
+
+    for k in ['demand', 'demand_growth', 'fit_pct', 'annual_rps_inc_2020', 'annual_rps_inc_2023', 'desired_pct']:
+        out[k] = _number(out[k], k)
+    if not 0 <= out['desired_pct'] <= 100:
+        raise ValueError('desired_pct must be between 0 and 100')
+    out['end_year'] = int(_number(out['end_year'], 'end_year'))
+    if not engine.START_YEAR <= out['end_year'] <= MAX_END_YEAR:
+        raise ValueError('end_year must be between {} and {}'.format(engine.START_YEAR, MAX_END_YEAR))
+    if out['rec_expiry'] not in engine.EXPIRY_METHODS:
+        raise ValueError('rec_expiry must be one of {}, got {!r}'.format(engine.EXPIRY_METHODS, out['rec_expiry']))
+    out['rec_shelf_life'] = int(_number(out['rec_shelf_life'], 'rec_shelf_life'))
+    if out['rec_shelf_life'] < 1:
+        raise ValueError('rec_shelf_life must be at least 1 year')
+    profiles.check(out['generation_profile'])
+
+    if out['capacity_factors'] is not None and not isinstance(out['capacity_factors'], dict):
+        raise ValueError('capacity_factors must be an object')
+    capacity_factors = dict(DEFAULTS['capacity_factors'])
+    capacity_factors.update(out['capacity_factors'] or {})
+    for k, v in capacity_factors.items():
+        if k not in DEFAULTS['capacity_factors']:
+            raise ValueError('unknown capacity factor {!r}'.format(k))
+        capacity_factors[k] = _number(v, k)
+        if capacity_factors[k] <= 0:
+            raise ValueError('{} must be positive'.format(k))
+    out['capacity_factors'] = capacity_factors
+
+    if not isinstance(out['scenario'], str) or out['scenario'] not in resources.scenario_pct_dict:
+        raise ValueError('unknown scenario {!r}, expected one of {}'.format(out['scenario'], list(resources.scenario_pct_dict)))
+
+    # --- Planned procurement, blank or non-RE rows are dropped as in the UI ---
+    procurement = []
+    for i, row in enumerate(_rows(out['future_procurement'] or [], 'future_procurement')):
+        source = _row_value(row, 'source', PROCUREMENT_KEYS)
+        if source not in resources.re_tech:
+            continue
+        procurement.append({'source': source,
+                            'online_year': _number(_row_value(row, 'online_year', PROCUREMENT_KEYS), 'future_procurement[{}].online_year'.format(i), allow_none=True),
+                            'capacity_mw': _number(_row_value(row, 'capacity_mw', PROCUREMENT_KEYS), 'future_procurement[{}].capacity_mw'.format(i), allow_none=True)})
+    out['future_procurement'] = procurement
+
+    if out['energy_mix'] is None:
+        out['energy_mix'] = _default_mix()
+        return out
+    mix = []
+    for i, row in enumerate(_rows(out['energy_mix'], 'energy_mix')):
+        mix.append({'source': str(_row_value(row, 'source', MIX_KEYS) or '').strip(),
+                    'lcoe': _number(_row_value(row, 'lcoe', MIX_KEYS), 'energy_mix[{}].lcoe'.format(i)),
+                    'pct': _number(_row_value(row, 'pct', MIX_KEYS), 'energy_mix[{}].pct'.format(i))})
+
+    # --- The same rules as functions.parse_energy_mix ---
+    sources = [r['source'] for r in mix]
+    bad = [r['source'] for r in mix if r['lcoe'] < 0 or r['pct'] < 0]
+    if bad:
+        raise ValueError('energy_mix lcoe and pct must not be negative, check {}'.format(', '.join(bad)))
+    missing = [s for s in resources.required_mix_sources if s not in sources]
+    if missing:
+        raise ValueError('energy_mix needs a row for {}'.format(', '.join(missing)))
+    if len(set(sources)) != len(sources):
+        raise ValueError('energy_mix must list each source only once')
+    if not sum(r['pct'] for r in mix) > 0:
+        raise ValueError('energy_mix pct must not all be zero')
+    out['energy_mix'] = mix
+    return out
+
+_DEFAULT_MIX = []
+
+def _default_mix():
+    """energy_mix.csv as normalized rows, built once and shared (never mutated downstream)."""
+    if not _DEFAULT_MIX:
+        _DEFAULT_MIX.extend({'source': s, 'lcoe': float(l), 'pct': float(p)} for s, l, p in resources.energy_mix_df.values)
+    return _DEFAULT_MIX
+
+def _procurement_arrays(spec):
+    """(online_year, generation, monthly) of each planned row, generation from the matching CF slider and split by the profile."""
+    rows = spec['future_procurement']
+    online_year = np.array([r['online_year'] if r['online_year'] is not None else np.nan for r in rows], dtype=float)
+    capacity = np.array([r['capacity_mw'] if r['capacity_mw'] is not None else np.nan for r in rows], dtype=float)
+    cf = np.array([spec['capacity_factors'][resources.cf_slider_dict[r['source']]] for r in rows], dtype=float) / 100
+    tech = [profiles.TECHS.index(resources.cf_slider_dict[r['source']]) for r in rows]
+    generation, monthly = profiles.generation(capacity, cf, tech, spec['generation_profile'])
+    return online_year, generation, monthly
+
+def _jsonable(a):
+    """List with NaN as None, JSON has no NaN."""
+    a = np.asarray(a, dtype=float)
+    if not np.isnan(a).any():
+        return a.tolist()
+    return [None if v != v else v for v in a.tolist()]
+
+# --- Evaluation ---
+def evaluate(specs, sections=SECTIONS):
+    """
+    Evaluate normalized scenarios, one rps_ledger call over the longest horizon per REC expiry setting.
+
+    Input
+    -----
+        -specs (list): dicts from normalize()
+        -sections (list): any of SECTIONS, to skip work the caller doesn't need
+
+    Output
+    ------
+        -list of dicts, one per scenario, with the requested sections
+
+    A shorter horizon is a prefix of a longer one (see engine.rps_ledger), so each scenario's
+    ledger is the first years of the shared one.
+    """
+    results = [dict() for _ in specs]
+    arrays = [_procurement_arrays(spec) for spec in specs] #(online_year, generation, monthly) of each
+    by_expiry = dict()
+    for i, spec in enumerate(specs):
+        by_expiry.setdefault((spec['rec_expiry'], spec['rec_shelf_life']), []).append(i)
+
+    for (expiry, shelf_life), idx in by_expiry.items():
+        # --- Ledger, rounded as the UI store is ---
+        all_years = engine.rps_years(max(specs[i]['end_year'] for i in idx) + 1)
+        batch, online_year, generation = [], [], []
+        for b, i in enumerate(idx):
+            y, g, _ = arrays[i]
+            batch.extend([b] * len(y))
+            online_year.extend(y)
+            generation.extend(g)
+        procurement = engine.procurement_matrix(batch, online_year, generation, all_years, len(idx))
+        ledger = engine.rps_ledger(demand=[specs[i]['demand'] for i in idx],
+                                   demand_growth=[specs[i]['demand_growth'] / 100 for i in idx],
+                                   fit_pct=[specs[i]['fit_pct'] for i in idx], procurement=procurement,
+                                   annual_rps_inc_2020=[specs[i]['annual_rps_inc_2020'] / 100 for i in idx],
+                                   annual_rps_inc_2023=[specs[i]['annual_rps_inc_2023'] / 100 for i in idx],
+                                   end_year=all_years[-1] + 1, expiry=expiry, shelf_life=shelf_life)
+        ledger = {k: (v if k == 'year' else np.round(v, 3)) for k, v in ledger.items()}
+
+        for b, i in enumerate(idx):
+            spec = specs[i]
+            years = engine.rps_years(spec['end_year'] + 1)
+            row = {k: ledger[k][b, :len(years)] for k in engine.LEDGER_COLUMNS}
+            if 'ledger' in sections:
+                results[i]['ledger'] = dict({k: _jsonable(row[k]) for k in engine.LEDGER_COLUMNS},
+                                            year=[int(y) for y in years])
+            if 'capacity_need' in sections:
+                shortfall = row['rec_shortfall']
+                incremental = np.concatenate([[np.nan], np.cumsum(np.diff(shortfall))])
+                need = np.round(engine.capacity_need(incremental, [spec['capacity_factors'][cf] for _, cf in NEED_TECHS]), 2)
+                results[i]['capacity_need'] = dict({tech: _jsonable(need[:, j]) for j, (tech, _) in enumerate(NEED_TECHS)},
+                                                   year=[int(y) for y in years],
+                                                   rec_incremental_req=_jsonable(np.round(incremental, 2)))
+            if 'scenario' in sections:
+                results[i]['scenario'] = scenario_summary(spec, row['demand'], row['rec_change'], arrays[i])
+            if 'monthly_recs' in sections:
+                results[i]['monthly_recs'] = monthly_summary(spec, years, row['fit_MWh'], arrays[i])
+    return results
+
+def monthly_summary(spec, years, fit_MWh, arrays):
+    """RECs created each month of the ledger years, from the FiT and by planned Generation Source, arrays from _procurement_arrays()."""
+    online_year, _, monthly = arrays
+    source = [resources.re_tech.index(r['source']) for r in spec['future_procurement']]
+    fit, planned = profiles.monthly_recs(fit_MWh, years, source, online_year, monthly, len(resources.re_tech))
+    out = {'month': ['{}-{:02d}'.format(int(y), m + 1) for y in years for m in range(12)],
+           'fit': _jsonable(np.round(fit.ravel(), 3))}
+    out.update({tech: _jsonable(np.round(planned[j].ravel(), 3)) for j, tech in enumerate(resources.re_tech) if planned[j].any()})
+    return out
+
+def scenario_summary(spec, demand, rec_change, arrays):
+    """Start and end year generation mix, cost and emissions for the chosen scenario mix and desired pct, arrays from _procurement_arrays()."""
+    sources = [r['source'] for r in spec['energy_mix']]
+    lcoe = np.array([r['lcoe'] for r in spec['energy_mix']])
+    current_mwh = np.array([r['pct'] for r in spec['energy_mix']]) / 100 * int(demand[0])
+    online_year, generation, _ = arrays
+    planned = np.zeros(len(sources))
+    for r, y, g in zip(spec['future_procurement'], online_year, generation):
+        if r['source'] in sources and np.isfinite(y) and np.isfinite(g): #rows without a year are dropped, as in functions.future_procurement_frame
+            planned[sources.index(r['source'])] += g
+
+    weights = resources.scenario_pct_dict[spec['scenario']]
+    outcome = engine.scenario_outcome(lcoe=lcoe, current_mwh=current_mwh, planned=planned,
+                                      re_mask=[s in resources.re_tech for s in sources],
+                                      fossil_mask=[s in resources.fossil_tech for s in sources],
+                                      weights=[weights.get(s, 0) for s in sources], desired_pct=spec['desired_pct'] / 100,
+                                      start_demand=demand[0], end_demand=demand[-1], start_recs=rec_change[0],
+                                      emission_factors=[resources.emissions_dict.get(s, 0) for s in sources])
+    summary = {k: v for k, v in outcome.to_dict().items() if np.ndim(v) == 0}
+    summary = {k: float(v) for k, v in summary.items()}
+    summary['techs'] = sources
+    summary['start_generation'] = current_mwh.tolist()
+    summary['end_generation'] = outcome.future_generation.tolist()
+    summary['start_cost_kwh'] = summary['start_expense'] / demand[0] / 1000
+    summary['end_cost_kwh'] = summary['end_expense'] / demand[-1] / 1000
+    return summary
@@ -0,0 +1,90 @@
+import numpy as np
+
+import montecarlo
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Sensitivity (Tornado) ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# One-at-a-time sensitivity: each input is moved step below and above its value in the UI
+# (a relative change, as the Monte Carlo spreads are) with every other input held. The base case
+# and both cases of every input are one batch of montecarlo.evaluate(), so the RPS ledger and
+# scenario math run once for all of them.
+
+METRICS = ['rec_shortfall', 'end_cost_kwh']
+METRIC_LABELS = {'rec_shortfall': 'Total REC Shortfall (RECs)', 'end_cost_kwh': 'End Year Cost (₱ / kWh)'}
+POLICY = [('demand_growth', 'Demand Growth'), ('fit_pct', 'FiT %'),
+          ('annual_rps_inc_2020', 'RPS Increment 2020-2022'), ('annual_rps_inc_2023', 'RPS Increment 2023+')]
+
+def parameters(cf_labels, lcoe_labels):
+    """(kind, index, label) of every perturbed input, in batch order."""
+    out = [('policy', key, label) for key, label in POLICY]
+    out += [('cf', i, '{} Capacity Factor'.format(label)) for i, label in enumerate(cf_labels)]
+    out += [('lcoe', i, '{} LCOE'.format(label)) for i, label in enumerate(lcoe_labels)]
+    return out
+
+def run(base, step=0.1, cf_labels=None, lcoe_labels=None):
+    """
+    Tornado data for REC shortfall and end year cost.
+
+    Input
+    -----
+        -base (dict): deterministic case, see montecarlo.run()
+        -step (float): relative change of each input (i.e. 0.1 for ±10%)
+        -cf_labels (list): name of each capacity factor group, defaults to its index
+        -lcoe_labels (list): name of each energy mix source, defaults to its index
+
+    Output
+    ------
+        -dict with 'labels' (parameter,), 'step', 'base' {metric: float},
+         and 'low' and 'high' {metric: (parameter,) list}, low being the input at 1 - step
+    """
+    fixed = montecarlo.prepare(base)
+    n_groups, n_sources = fixed['n_groups'], len(fixed['lcoe'])
+    if cf_labels is None:
+        cf_labels = [str(i) for i in range(n_groups)]
+    if lcoe_labels is None:
+        lcoe_labels = [str(i) for i in range(n_sources)]
+    params = parameters(cf_labels, lcoe_labels)
+
+    # --- Row 0 is the base case, then the low and high case of each parameter ---
+    factors = np.ones((1 + 2 * len(params), len(params)))
+    factors[1::2][np.arange(len(params)), np.arange(len(params))] = 1 - step
+    factors[2::2][np.arange(len(params)), np.arange(len(params))] = 1 + step
+
+    columns = {key: i for i, (kind, key, _) in enumerate(params) if kind == 'policy'}
+    cf_columns = [i for i, (kind, _, _) in enumerate(params) if kind == 'cf']
+    lcoe_columns = [i for i, (kind, _, _) in enumerate(params) if kind == 'lcoe']
+
+    ledger, grid = montecarlo.evaluate(
+        base, fixed,
+        demand_growth=base['demand_growth'] * factors[:, columns['demand_growth']],
+        cf_factors=factors[:, cf_columns],
+        lcoe=fixed['lcoe'] * factors[:, lcoe_columns],
+        fit_pct=base['fit_pct'] * factors[:, columns['fit_pct']],
+        annual_rps_inc_2020=base['annual_rps_inc_2020'] * factors[:, columns['annual_rps_inc_2020']],
+        annual_rps_inc_2023=base['annual_rps_inc_2023'] * factors[:, columns['annual_rps_inc_2023']])
+
+    values = {'rec_shortfall': ledger['rec_shortfall'].sum(axis=1),
+              'end_cost_kwh': grid['end_expense'][:, 0, 0] / ledger['demand'][:, -1] / 1000}
+    return {
+        'labels': [label for _, _, label in params],
+        'step': step,
+        'base': {m: float(values[m][0]) for m in METRICS},
+        'low': {m: values[m][1::2].tolist() for m in METRICS},
+        'high': {m: values[m][2::2].tolist() for m in METRICS},
+    }
+
+def ranked(result, metric, top=None):
+    """
+    Parameters that move metric, largest swing first.
+
+    Output
+    ------
+        -list of (label, low value, high value), inputs with no effect left out
+    """
+    base = result['base'][metric]
+    rows = [(label, lo, hi) for label, lo, hi in zip(result['labels'], result['low'][metric], result['high'][metric])
+            if max(abs(lo - base), abs(hi - base)) > 1e-9 * max(abs(base), 1)]
+    rows.sort(key=lambda r: abs(r[2] - r[1]), reverse=True)
+    return rows[:top]
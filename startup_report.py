@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Startup Report ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Usage:
+#   python startup_report.py                  worker boot: import cost per package, best of 3 fresh interpreters
+#   python startup_report.py --first-request  also time the first page load, where the deferred work now happens
+#   python startup_report.py --json           machine-readable output
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+BOOT = """
+import time
+t = time.perf_counter()
+import {module}
+print('BOOT', time.perf_counter() - t)
+"""
+
+FIRST_REQUEST = """
+import time
+import {module}
+client = {module}.server.test_client()
+for path in ['/', '/_dash-layout']:
+    t = time.perf_counter()
+    client.get(path)
+    print('REQUEST', path, time.perf_counter() - t)
+"""
+
+# --- Measurement ---
+def run(code):
+    """Run code in a fresh interpreter with -X importtime, returns (stdout, stderr)."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=HERE,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr[-2000:])
+    return proc.stdout, proc.stderr
+
+def parse_importtime(stderr):
+    """
+    Per-module (self, cumulative) microseconds from -X importtime output.
+
+    Output
+    ------
+        -dict of module: (self_us, cumulative_us, depth)
+    """
+    out = dict()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cum_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        out[name.strip()] = (int(self_us), int(cum_us), depth)
+    return out
+
+def by_package(modules):
+    """Self time summed by top-level package, so i.e. every plotly.* module counts towards plotly."""
+    totals = defaultdict(int)
+    for name, (self_us, _, _) in modules.items():
+        totals[name.split('.')[0]] += self_us
+    return dict(totals)
+
+def report(module='dash_phl', repeat=3, first_request=False):
+    """Best-of-repeat boot time and the import breakdown of that run."""
+    best = None
+    for _ in range(repeat):
+        stdout, stderr = run(BOOT.format(module=module))
+        boot = float(stdout.split('BOOT')[1])
+        if best is None or boot < best[0]:
+            best = (boot, parse_importtime(stderr))
+    boot, modules = best
+
+    local = {os.path.splitext(f)[0] for f in os.listdir(HERE) if f.endswith('.py')}
+    result = {
+        'module': module,
+        'boot_s': boot,
+        'packages_ms': {k: v / 1000 for k, v in sorted(by_package(modules).items(), key=lambda kv: -kv[1])},
+        'local_modules_ms': {k: {'self': v[0] / 1000, 'cumulative': v[1] / 1000}
+                             for k, v in sorted(modules.items(), key=lambda kv: -kv[1][1]) if k in local},
+    }
+    if first_request:
+        stdout, _ = run(FIRST_REQUEST.format(module=module))
+        result['first_request_s'] = {line.split()[1]: float(line.split()[2])
+                                     for line in stdout.splitlines() if line.startswith('REQUEST')}
+    return result
+
+# --- Main ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Break down worker startup time by imported module.')
+    parser.add_argument('--module', default='dash_phl', help='module gunicorn imports (default: dash_phl)')
+    parser.add_argument('--repeat', type=int, default=3, help='fresh interpreters to run, the fastest is reported')
+    parser.add_argument('--top', type=int, default=15, help='packages to list')
+    parser.add_argument('--first-request', action='store_true', help='also time the first requests after boot')
+    parser.add_argument('--json', action='store_true', help='print JSON instead of a table')
+    args = parser.parse_args(argv)
+
+    result = report(args.module, args.repeat, args.first_request)
+    if args.json:
+        print(json.dumps(result, indent=1))
+        return
+
+    print('import {}: {:.0f} ms (best of {})'.format(result['module'], result['boot_s'] * 1000, args.repeat))
+    print('\n{:<32}{:>10}'.format('package (self time)', 'ms'))
+    for name, ms in list(result['packages_ms'].items())[:args.top]:
+        print('{:<32}{:>10.1f}'.format(name, ms))
+    print('\n{:<32}{:>10}{:>12}'.format('local module', 'self ms', 'cumul. ms'))
+    for name, ms in result['local_modules_ms'].items():
+        print('{:<32}{:>10.1f}{:>12.1f}'.format(name, ms['self'], ms['cumulative']))
+    if 'first_request_s' in result:
+        print('\n{:<32}{:>10}'.format('first request', 'ms'))
+        for path, s in result['first_request_s'].items():
+            print('{:<32}{:>10.1f}'.format(path, s * 1000))
+
+if __name__ == '__main__':
+    main()
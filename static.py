@@ -0,0 +1,331 @@
+import os
+import re
+import io
+import json
+import gzip
+import zlib
+import struct
+import hashlib
+import mimetypes
+import warnings
+
+import bundle
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Static Assets ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# assets/ built into the folder Dash serves (BUILD_DIR):
+#
+#   - images in DISPLAY_WIDTHS resized to twice their width on the page (needs Pillow), and every
+#     PNG recompressed with its text, timestamp and color profile chunks dropped
+#   - the CSS files minified into one bundle, in the order Dash loaded them
+#   - editor and OS junk (.DS_Store, Thumbs.db, backups) left out
+#   - every file but favicon.ico renamed name.<content hash>.ext, listed in manifest.json
+#   - .gz and .br copies of text files, sent as they are to browsers that accept them
+#
+# serve() then marks fingerprinted files immutable for a year, since a changed file gets a new name.
+# The build reruns when a file in assets/ changes (or with `python static.py`). RPS_ASSETS_BUILD=0
+# serves assets/ unchanged, and so does a deploy where BUILD_DIR can't be written.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(ROOT, 'assets')
+BUILD_DIR = os.environ.get('RPS_ASSETS_DIR', os.path.join(ROOT, 'assets_build'))
+ENABLED = os.environ.get('RPS_ASSETS_BUILD', '1') == '1'
+MANIFEST = 'manifest.json'
+BUILD_VERSION = 1
+
+JUNK = re.compile(r'^(\.DS_Store|Thumbs\.db|desktop\.ini|\._.*|.*~|.*\.swp|.*\.orig)$')
+UNHASHED = ['favicon.ico'] #Dash and browsers look for it by name
+CSS_BUNDLE = 'bundle.css'
+PRECOMPRESS = ['.css', '.js', '.svg', '.ico', '.json']
+MAX_AGE = 365 * 24 * 3600
+
+# --- CSS px width on the 960px container (see the layout.py styles), images are sized to 2x for HiDPI ---
+DISPLAY_WIDTHS = {
+    'CEIA_Header_Logo.png': 192,
+    'Tricolor_Spacer_Wide.png': 960,
+    'rede_xsmall.png': 192,
+    'SAM_xsmall.png': 192,
+    'WRI_logo_4c.png': 115,
+    'Allotrope_Logo_hi-res.png': 115,
+    'NREL logo w tagline.png': 115,
+    'United States govt logo.png': 76,
+    'BMUB logo.png': 152,
+    'P4G large_logo.png': 115,
+}
+SCALE = 2
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_KEEP = [b'IHDR', b'PLTE', b'tRNS', b'sRGB', b'gAMA', b'cHRM', b'IEND'] #IDAT is rewritten
+
+# --- Helper Functions ---
+def fingerprint(name, data):
+    """name.<first 10 hex of sha256>.ext"""
+    stem, ext = os.path.splitext(name)
+    return '{}.{}{}'.format(stem, hashlib.sha256(data).hexdigest()[:10], ext)
+
+def minify_css(text):
+    """Drop comments and the whitespace the CSS grammar doesn't need, leaving strings alone."""
+    out = []
+    for part in re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', text):
+        if part[:1] in ('"', "'"):
+            out.append(part)
+            continue
+        part = re.sub(r'/\*.*?\*/', '', part, flags=re.S)
+        part = re.sub(r'\s+', ' ', part)
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        part = re.sub(r':\s+', ':', part)
+        out.append(part)
+    return re.sub(r';}', '}', ''.join(out)).strip()
+
+def _chunks(data):
+    """(type, body) of every PNG chunk."""
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError('not a PNG')
+    i = 8
+    while i < len(data):
+        n, kind = struct.unpack('>I4s', data[i:i + 8])
+        yield kind, data[i + 8:i + 8 + n]
+        i += 12 + n
+
+def _chunk(kind, body):
+    return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body) & 0xffffffff)
+
+def recompress_png(data):
+    """Lossless: IDAT deflated again at level 9 as one chunk, ancillary chunks outside PNG_KEEP dropped."""
+    chunks = list(_chunks(data))
+    pixels = zlib.decompress(b''.join(body for kind, body in chunks if kind == b'IDAT'))
+    out = [PNG_SIGNATURE]
+    for kind, body in chunks:
+        if kind == b'IEND':
+            out.append(_chunk(b'IDAT', zlib.compress(pixels, 9)))
+        if kind in PNG_KEEP:
+            out.append(_chunk(kind, body))
+    smaller = b''.join(out)
+    return smaller if len(smaller) < len(data) else data
+
+def resize_image(data, width):
+    """
+    Image scaled down to width px (never up), or None when Pillow isn't installed.
+
+    The result is a PNG, which build() only keeps when it is smaller than the original.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    image = Image.open(io.BytesIO(data))
+    if image.width <= width:
+        return data
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert('RGBA')
+    if image.mode == 'RGBA' and image.getextrema()[3][0] == 255:
+        image = image.convert('RGB') #opaque, the alpha channel only costs bytes
+    height = max(1, int(round(image.height * width / float(image.width))))
+    out = io.BytesIO()
+    image.resize((width, height), Image.LANCZOS).save(out, format='PNG', optimize=True)
+    return out.getvalue()
+
+def _brotli(data):
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+def _encoded(name, encoding):
+    """File name of a precompressed copy."""
+    return '{}.{}'.format(name, 'gz' if encoding == 'gzip' else encoding)
+
+def _write(path, data):
+    """Atomic write, skipped when the file already holds data so its mtime (Dash's ?m= query) stays."""
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def settings():
+    """What else the build depends on besides the files, a change rebuilds."""
+    try:
+        import PIL
+        resized = True
+    except ImportError:
+        resized = False
+    return {'version': BUILD_VERSION, 'resized': resized, 'widths': DISPLAY_WIDTHS, 'scale': SCALE}
+
+def sources(source=SOURCE_DIR):
+    """Names of the files to build, sorted as Dash walks them, junk left out."""
+    return sorted(f for f in os.listdir(source) if os.path.isfile(os.path.join(source, f)) and not JUNK.match(f))
+
+# --- Build ---
+def build(source=SOURCE_DIR, target=BUILD_DIR):
+    """
+    Build source into target and remove what an earlier build left there.
+
+    Output
+    ------
+        -manifest (dict): 'files' {source name: built name}, 'encodings' {built name: ['br', 'gzip']},
+         'bytes' {source name or CSS_BUNDLE: [before, after]}, 'sources' and 'settings' to tell when it is stale
+    """
+    os.makedirs(target, exist_ok=True)
+    names = sources(source)
+    files, encodings, sizes = dict(), dict(), dict()
+    built = dict() #built name: bytes
+
+    css = []
+    for name in names:
+        with open(os.path.join(source, name), 'rb') as f:
+            data = f.read()
+        ext = os.path.splitext(name)[1].lower()
+        if ext == '.css':
+            css.append((name, data))
+            continue
+        out = data
+        if name in DISPLAY_WIDTHS:
+            resized = resize_image(out, DISPLAY_WIDTHS[name] * SCALE)
+            if resized is not None and len(resized) < len(out):
+                out = resized
+        if out[:8] == PNG_SIGNATURE:
+            out = recompress_png(out)
+        files[name] = name if name in UNHASHED else fingerprint(name, out)
+        built[files[name]] = out
+        sizes[name] = [len(data), len(out)]
+
+    if css:
+        out = '\n'.join(minify_css(data.decode('utf-8')) for _, data in css).encode('utf-8')
+        bundle_name = fingerprint(CSS_BUNDLE, out)
+        built[bundle_name] = out
+        for name, _ in css:
+            files[name] = bundle_name
+        sizes[CSS_BUNDLE] = [sum(len(data) for _, data in css), len(out)]
+
+    for name, data in built.items():
+        _write(os.path.join(target, name), data)
+        if os.path.splitext(name)[1].lower() in PRECOMPRESS:
+            encodings[name] = []
+            for encoding, compressed in [('br', _brotli(data)), ('gzip', gzip.compress(data, 9, mtime=0))]:
+                if compressed is not None and len(compressed) < len(data):
+                    _write(os.path.join(target, _encoded(name, encoding)), compressed)
+                    encodings[name].append(encoding)
+
+    manifest = {'files': files, 'encodings': encodings, 'bytes': sizes, 'settings': settings(),
+                'sources': source_stats(source)}
+    _write(os.path.join(target, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+
+    # --- Old builds' files, so Dash doesn't load a stale CSS bundle next to the new one ---
+    keep = set(built) | {MANIFEST} | {_encoded(n, e) for n, es in encodings.items() for e in es}
+    for f in os.listdir(target):
+        if f not in keep and not f.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(target, f))
+            except FileNotFoundError: #another worker building at the same time
+                pass
+    return manifest
+
+def source_stats(source=SOURCE_DIR):
+    """{name: {'size', 'mtime'}} of the files build() reads."""
+    names = sources(source)
+    stats = bundle.source_stats([os.path.join(source, n) for n in names])
+    return {n: stats[os.path.join(source, n)] for n in names}
+
+def is_stale(manifest, source=SOURCE_DIR):
+    """True when a file in source changed, or settings() did, since manifest was built."""
+    if manifest.get('settings') != json.loads(json.dumps(settings())):
+        return True
+    built, current = manifest.get('sources', {}), source_stats(source)
+    if set(built) != set(current):
+        return True
+    return any(current[n]['size'] != built[n]['size'] or current[n]['mtime'] > built[n]['mtime'] for n in current)
+
+# --- Serving ---
+_state = dict() #folder, manifest: of this process, set by folder()
+
+def folder(source=SOURCE_DIR, target=BUILD_DIR):
+    """
+    The folder for dash.Dash(assets_folder=...): target, built first if missing or stale, or source
+    when RPS_ASSETS_BUILD=0 or the build can't be written.
+    """
+    if not ENABLED:
+        _state.update(folder=source, manifest=None)
+        return source
+    manifest = None
+    try:
+        with open(os.path.join(target, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        pass
+    try:
+        if manifest is None or is_stale(manifest, source):
+            manifest = build(source, target)
+    except OSError as e:
+        warnings.warn('serving unbuilt assets: {}'.format(e))
+        _state.update(folder=source, manifest=None)
+        return source
+    _state.update(folder=target, manifest=manifest)
+    return target
+
+def url(name):
+    """Relative URL of a file from assets/, as layout.py uses them ('assets/<built name>')."""
+    manifest = _state.get('manifest')
+    return 'assets/{}'.format(manifest['files'].get(name, name) if manifest else name)
+
+def _accepts(header, encoding):
+    """True when an Accept-Encoding header allows encoding (q above 0)."""
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        if token.strip().lower() in (encoding, '*'):
+            q = re.search(r'q\s*=\s*([0-9.]+)', params)
+            return q is None or float(q.group(1)) > 0
+    return False
+
+def serve(app):
+    """
+    Serve the built assets of app with long-lived cache headers, and their .br/.gz copies to
+    browsers that accept them. Call after folder(), does nothing for unbuilt assets.
+    """
+    manifest = _state.get('manifest')
+    if not manifest:
+        return
+    import flask
+    directory = _state['folder']
+    prefix = '{}{}/'.format(app.config.routes_pathname_prefix, app.config.assets_url_path.strip('/'))
+    immutable = set(manifest['files'].values()) - set(UNHASHED)
+    encodings = manifest['encodings']
+
+    @app.server.before_request
+    def precompressed():
+        path = flask.request.path
+        if not path.startswith(prefix) or path[len(prefix):] not in encodings:
+            return None
+        name = path[len(prefix):]
+        accept = flask.request.headers.get('Accept-Encoding', '')
+        for encoding in encodings[name]:
+            if _accepts(accept, encoding):
+                response = flask.send_file(os.path.join(directory, _encoded(name, encoding)),
+                                           mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream', conditional=True)
+                response.headers['Content-Encoding'] = encoding
+                response.headers['Vary'] = 'Accept-Encoding'
+                return response
+        return None
+
+    @app.server.after_request
+    def cache_headers(response):
+        path = flask.request.path
+        if path.startswith(prefix) and path[len(prefix):] in immutable and response.status_code in (200, 304):
+            response.headers['Cache-Control'] = 'public, max-age={}, immutable'.format(MAX_AGE)
+            if path[len(prefix):] in encodings:
+                response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+# --- Run on Import ---
+if __name__ == '__main__':
+    manifest = build()
+    for name, (before, after) in sorted(manifest['bytes'].items()):
+        print('{:32s} {:>9,d} -> {:>9,d} B'.format(name, before, after))
+    print('{} files in {}{}'.format(len(set(manifest['files'].values())), BUILD_DIR,
+                                    '' if manifest['settings']['resized'] else ' (install Pillow to resize images)'))
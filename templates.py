@@ -0,0 +1,37 @@
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Text Templates ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Markdown for the text outputs, shared by the Python callbacks in functions.py and their
+# browser versions in assets/clientside.js (which receive TEXT through the text_templates store).
+# Placeholders are {name}, filled with already formatted values by render() or rps.render().
+
+TEXT = {
+'economic_text': """
+    The Levelized Cost of Energy (PhP / kWh) data used in this calculator can be changed in the 'Energy Mix and Cost Input' tab of User Inputs. You can edit this to reflect prices that are specific to your utility. 
+    Based on the current entries, the cost of utility-scale solar for your utility is **Php {solar_vs_coal} / kWh** compared with the cost of coal generation,
+    and the cost of biomass has a difference of **Php {biomass_vs_coal} / kWh**.
+   """.replace('  ', ''),
+
+'savings_text': """
+    ###### Your current generation costs are ${start_cost_usd} (Php {start_cost}), or **${start_cost_kwh_usd} (Php {start_cost_kwh} / kWh)**. By switching to **{end_re_pct}% renewables** by {end_year}, your estimated generation costs would be ${end_cost_usd} (Php {end_cost}), or **${end_cost_kwh_usd} (Php {end_cost_kwh} / kWh)**. Currently you are creating {start_recs} RECs, and in 2030 you would be creating {end_recs} RECs per year. Future generation costs are estimates that may change as market conditions evolve.
+        """.replace('  ', ''),
+
+'goal_text': """
+    While the RPS will require your utility to increase your renewable energy supply by **{rps_min_increase}%**,
+    it may be cost-effective to go beyond this amount. Additional renewable procurement can provide price stability and may increase customer satisfaction with your utility. 
+    Additional renewables also allow you to bank RECs, which can be sold through the WESM as a secondary revenue stream, or held for future compliance years.
+
+    First, you should ensure that the LCOE and Energy Mix data in the 'Energy Mix and Cost Input' tab available at the top of the tool is correct. 
+    Once this data has been input, this section will allow you to visualize and compare generation costs between various renewable growth scenarios.
+
+    Using the slider below, you can change the desired percentage of renewables for your utility. This has been preset at the minimum RPS requirement. 
+    Below the slider, you can also select the mix of renewables that will be installed. As you change the desired renewable percentage and the mix of new renewables, the price per kWh will be updated.
+    These prices are derived from the LCOE values specified in the 'Energy Mix and Cost Input.' Further below, you can compare cost against emissions for many other mixes of renewables,
+    and find the lowest cost mix for each level of emissions. Fossil generation is reduced in proportion to your current fossil mix. Emissions calculations are based on 2017 EIA and US EPA data on heat content and heat rates for thermal fuels. 
+   """.replace('  ', ''),
+}
+
+def render(name, values):
+    """Fill a template with preformatted values."""
+    return TEXT[name].format(**values)
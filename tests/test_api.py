@@ -0,0 +1,76 @@
+import pytest
+from flask import Flask
+
+import api
+import resources
+import scenarios
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(api.blueprint)
+    return app.test_client()
+
+def mix(**changes):
+    """energy_mix.csv rows, with changes {source: {'lcoe': x, 'pct': y}} applied."""
+    rows = [{'source': s, 'lcoe': float(l), 'pct': float(p)} for s, l, p in resources.energy_mix_df.values]
+    for row in rows:
+        row.update(changes.get(row['source'], {}))
+    return rows
+
+def test_default_scenario(client):
+    response = client.post('/api/v1/scenarios', json={})
+    assert response.status_code == 200
+    assert set(response.get_json()) == {'ledger', 'capacity_need', 'scenario', 'monthly_recs'}
+
+@pytest.mark.parametrize('spec', [
+    {'future_procurement': [1]},
+    {'future_procurement': {'source': 'Wind'}},
+    {'energy_mix': [1]},
+    {'energy_mix': {'a': 1}},
+    {'capacity_factors': [1]},
+    {'utility': [1]},
+    {'scenario': [1]},
+])
+def test_wrong_shape_is_400(client, spec):
+    response = client.post('/api/v1/scenarios', json=spec)
+    assert response.status_code == 400
+    assert response.get_json()['index'] == 0
+
+INVALID_MIXES = [
+    mix(Coal={'lcoe': -1}),
+    mix(Hydro={'pct': -5}),
+    mix() + mix()[:1],
+    [r for r in mix() if r['source'] != 'Coal'],
+    [dict(r, pct=0) for r in mix()],
+]
+
+@pytest.mark.parametrize('spec', [{'energy_mix': m} for m in INVALID_MIXES] + [
+    {'desired_pct': -1},
+    {'desired_pct': 101},
+    {'end_year': 3000},
+])
+def test_invalid_values_are_400(client, spec):
+    response = client.post('/api/v1/scenarios', json=spec)
+    assert response.status_code == 400
+
+def test_batch_reports_the_failing_index(client):
+    response = client.post('/api/v1/scenarios', json=[{}, {'end_year': 2051}])
+    assert response.status_code == 400
+    assert response.get_json()['index'] == 1
+
+def test_procurement_without_online_year_is_ignored(client):
+    wind = {'source': 'Wind', 'online_year': 2022, 'capacity_mw': 30}
+    undated = {'source': 'Utility-Scale Solar', 'online_year': None, 'capacity_mw': 50}
+    with_row = client.post('/api/v1/scenarios', json={'future_procurement': [wind, undated]}).get_json()
+    without = client.post('/api/v1/scenarios', json={'future_procurement': [wind]}).get_json()
+    assert with_row['scenario'] == without['scenario']
+    assert with_row['ledger'] == without['ledger']
+
+@pytest.mark.parametrize('rows', INVALID_MIXES)
+def test_ui_rejects_the_same_mixes(rows):
+    import functions
+    columns = [{'name': name} for name in scenarios.MIX_KEYS.values()]
+    table = [{scenarios.MIX_KEYS[k]: v for k, v in r.items()} for r in rows]
+    store, error = functions.parse_energy_mix(table, columns)
+    assert store is None and error.startswith('Please')
@@ -0,0 +1,17 @@
+import benchmarks
+
+BASELINE = {'results': {'failed': {'median_ms': 1.0}, 'slower': {'median_ms': 10.0}, 'same': {'median_ms': 10.0},
+                        'faster': {'median_ms': 10.0}, 'failed_before': {'error': 'x'}}}
+
+def test_compare_statuses():
+    results = {'failed': {'error': 'callbacks failed'}, 'failed_new': {'error': 'callbacks failed'},
+               'new': {'median_ms': 5.0}, 'slower': {'median_ms': 13.0}, 'same': {'median_ms': 11.0},
+               'faster': {'median_ms': 7.0}, 'failed_before': {'median_ms': 2.0}}
+    rows = {r[0]: r[1:] for r in benchmarks.compare(results, BASELINE, 0.25)}
+    assert rows['failed'] == (1.0, None, None, 'failed')
+    assert rows['failed_new'] == (None, None, None, 'failed')
+    assert rows['new'] == (None, 5.0, None, 'new')
+    assert rows['slower'][-1] == 'regression' and abs(rows['slower'][2] - 1.3) < 1e-12
+    assert rows['same'][-1] == 'ok'
+    assert rows['faster'][-1] == 'improved'
+    assert rows['failed_before'][-1] == 'new'
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+import bundle
+import resources
+
+def round_trip(tmp_path, frames, lookups=None):
+    path = str(tmp_path / 'test.bundle')
+    bundle.write(path, frames, lookups or {}, {})
+    return bundle.read(path)
+
+def test_missing_strings_round_trip(tmp_path):
+    df = pd.DataFrame({'Technology': ['Wind', np.nan, 'Hydro', None], 'Year': [2010, 2011, 2012, 2013],
+                       'LCOE': [0.1, np.nan, 0.3, 0.4]})
+    out = round_trip(tmp_path, {'t': df}).frame('t')
+    pd.testing.assert_frame_equal(out, df.fillna({'Technology': np.nan}))
+    assert out.dropna(subset=['Technology'])['Technology'].tolist() == ['Wind', 'Hydro']
+
+def test_string_column_without_missing_values_has_no_mask(tmp_path):
+    b = round_trip(tmp_path, {'t': pd.DataFrame({'a': ['x', 'yy']})})
+    assert b.nulls('t', 'a') is None
+    assert b.array('t', 'a').tolist() == ['x', 'yy']
+
+def test_named_index_round_trip(tmp_path):
+    df = pd.DataFrame({'sales': [1.5, 2.5]}, index=pd.Index(['A', 'B'], name='utility'))
+    pd.testing.assert_frame_equal(round_trip(tmp_path, {'t': df}).frame('t'), df)
+
+def test_reference_tables_match_the_csvs(tmp_path):
+    frames, lookups = resources.build_reference()
+    b = round_trip(tmp_path, frames, lookups)
+    for name, (path, index) in resources.REFERENCE_CSVS.items():
+        pd.testing.assert_frame_equal(b.frame(name), pd.read_csv(path, index_col=index))
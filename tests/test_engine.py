@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+import resources
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Baseline Formulas ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# The pandas rps_df_maker and scenario_dict_maker math from before the engine, kept as the reference
+# the engine must reproduce.
+
+def baseline_rps_df(demand, demand_growth, future_procurement, fit_pct, annual_rps_inc_2020, annual_rps_inc_2023, end_year):
+    df = pd.DataFrame(index=pd.Index(np.arange(2018, end_year), name='year'))
+    df['demand_growth'] = demand_growth + 1
+    df.loc[2018, 'demand_growth'] = 1
+    df['demand_growth'] = df['demand_growth'].cumprod()
+    df['demand'] = demand * df['demand_growth']
+
+    df.loc[2020:2022, 'rps_marginal_req'] = annual_rps_inc_2020
+    df.loc[2023:, 'rps_marginal_req'] = annual_rps_inc_2023
+    df['rps_req'] = df['rps_marginal_req'].cumsum()
+    df = df.fillna(0)
+    df['fit_MWh'] = fit_pct * demand / 100
+
+    procurement = future_procurement.groupby('Online Year')['generation'].sum()
+    df['future_procurement'] = procurement.reindex(df.index.union(procurement.index)).fillna(0).cumsum().reindex(df.index)
+
+    demand_for_calc = df['demand'].shift(1).fillna(0)
+    demand_for_calc[2019] = 0
+    demand_for_calc[2020] = df['demand'][2018]
+    df['demand_for_calc'] = demand_for_calc
+
+    df['rps_req'] = df['rps_req'].clip(upper=1)
+    fit_requirement = df['fit_MWh'].copy()
+    fit_requirement[[2018, 2019]] = 0
+    df['rec_req'] = df['rps_req'] * df['demand_for_calc'] + fit_requirement
+    df['rec_created'] = df['fit_MWh'] + df['future_procurement']
+    df['rec_change'] = df['rec_created'] - df['rec_req']
+    df['rec_cum_production'] = df['rec_created'].cumsum()
+    df['rec_cum_withdraws'] = df['rec_req'].cumsum()
+
+    df['rec_expired'] = (df['rec_created'].shift(3, fill_value=0) - df['rec_req'].shift(3, fill_value=0)).clip(0)
+    df.loc[df.index < 2023, 'rec_expired'] = 0
+    df['rec_cum_expired'] = df['rec_expired'].cumsum()
+    df['end_rec_balance'] = (df['rec_cum_production'] - df['rec_cum_withdraws'] - df['rec_cum_expired']).clip(0)
+    df['begin_rec_balance'] = df['end_rec_balance'].shift(1).fillna(0)
+    df['rec_shortfall'] = ((df['begin_rec_balance'] + df['rec_created'] - df['rec_req'] - df['rec_expired']) * -1).clip(0)
+    return df
+
+def baseline_scenario(mix, planned, desired_pct, scenario, start_demand, end_demand, start_recs):
+    """mix is [(source, lcoe, pct)], planned {source: MWh}, returns (start_expense, end_expense, end_re_pct, end_recs)."""
+    sources = [s for s, _, _ in mix]
+    lcoe = {s: l for s, l, _ in mix}
+    current = {s: p / 100 * int(start_demand) for s, _, p in mix}
+    start_re = sum(current[s] for s in sources if s in resources.re_tech)
+    start_fossil = sum(current[s] for s in sources if s in resources.fossil_tech)
+    planned_re = sum(planned.values())
+    new_re = max(end_demand * desired_pct - start_re - planned_re, 0)
+    fossil_need = end_demand - new_re - start_re - planned_re
+
+    future = {s: 0. for s in sources}
+    for s in sources:
+        if s in resources.re_tech:
+            future[s] = scenario.get(s, 0) * new_re + current[s]
+        elif s in resources.fossil_tech:
+            future[s] = fossil_need * current[s] / start_fossil
+        future[s] += planned.get(s, 0)
+    end_re = sum(future[s] for s in sources if s in resources.re_tech)
+    return (sum(lcoe[s] * current[s] * 1000 for s in sources), sum(lcoe[s] * future[s] * 1000 for s in sources),
+            end_re / sum(future.values()), end_re - (start_re - start_recs))
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Tests ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+PROCUREMENT = pd.DataFrame({'Online Year': [2016, 2021, 2021, 2024, 2029, 2060], 'generation': [1e4, 5e4, 2e4, 3e5, 1e5, 9e9]})
+
+CASES = [ #demand, growth, fit_pct, inc_2020, inc_2023, end_year, procurement rows
+    (4.3e7, 0.063, 3.34, 0.01, 0.01, 2031, PROCUREMENT),
+    (1e6, 0.0, 10.0, 0.01, 0.025, 2041, PROCUREMENT), #big FiT, so surplus RECs expire
+    (2e6, 0.1, 0.0, 0.2, 0.2, 2051, PROCUREMENT.iloc[:0]), #requirement clipped at 100%
+]
+
+def single(case, end_year=None, previous=None, expiry='approximate'):
+    demand, growth, fit_pct, inc_2020, inc_2023, default_end, procurement = case
+    return engine.rps_single(demand, growth, fit_pct, inc_2020, inc_2023, end_year or default_end,
+                             online_year=procurement['Online Year'].values.astype(float),
+                             generation=procurement['generation'].values, previous=previous, expiry=expiry)
+
+@pytest.mark.parametrize('case', CASES)
+def test_approximate_ledger_matches_baseline(case):
+    demand, growth, fit_pct, inc_2020, inc_2023, end_year, procurement = case
+    expected = baseline_rps_df(demand, growth, procurement, fit_pct, inc_2020, inc_2023, end_year)
+    got = single(case).to_frame()
+    assert list(got.index) == list(expected.index)
+    for c in engine.LEDGER_COLUMNS:
+        np.testing.assert_allclose(got[c].values, expected[c].values, rtol=1e-12, atol=1e-6, err_msg=c)
+
+@pytest.mark.parametrize('expiry', engine.EXPIRY_METHODS)
+@pytest.mark.parametrize('start, end', [(2031, 2051), (2051, 2031), (2041, 2041), (2019, 2036)])
+def test_extension_and_truncation_match_full_recompute(expiry, start, end):
+    case = CASES[1]
+    previous = single(case, start, expiry=expiry)
+    got = single(case, end, previous=previous, expiry=expiry)
+    full = single(case, end, expiry=expiry)
+    np.testing.assert_array_equal(got.year, full.year)
+    for c in engine.LEDGER_COLUMNS:
+        np.testing.assert_allclose(getattr(got, c), getattr(full, c), rtol=1e-12, atol=1e-6, err_msg=c)
+
+def test_fifo_hand_worked():
+    # Shelf life 2: the 2023 vintage has 3 left when it expires in 2025, so 2025's requirement of 5 is short
+    expired, balance, shortfall = engine.vintage_fifo([[10, 0, 0, 5, 0]], [[3, 4, 5, 1, 2]],
+                                                      np.arange(2023, 2028), shelf_life=2)
+    np.testing.assert_array_equal(expired, [[0, 0, 3, 0, 0]])
+    np.testing.assert_array_equal(balance, [[7, 3, 0, 4, 2]])
+    np.testing.assert_array_equal(shortfall, [[0, 0, 5, 0, 0]])
+
+def test_fifo_transition_vintages_roll_to_the_first_expiry_year():
+    expired, balance, shortfall = engine.vintage_fifo([[5, 0, 0]], [[0, 0, 0]], np.arange(2021, 2024), shelf_life=1)
+    np.testing.assert_array_equal(expired, [[0, 0, 5]])
+    np.testing.assert_array_equal(balance, [[5, 5, 0]])
+
+def test_fifo_spends_oldest_first():
+    # 2023 and 2024 vintages, 2025 needs 4: the older 2023 RECs go first, so only 2024's are left to expire in 2027
+    expired, balance, _ = engine.vintage_fifo([[3, 3, 0, 0, 0]], [[0, 0, 4, 0, 0]], np.arange(2023, 2028), shelf_life=3)
+    np.testing.assert_array_equal(expired, [[0, 0, 0, 0, 2]])
+    np.testing.assert_array_equal(balance, [[3, 6, 2, 2, 0]])
+
+@pytest.mark.parametrize('scenario_tag', list(resources.scenario_pct_dict))
+@pytest.mark.parametrize('desired_pct', [0.05, 0.3, 0.9])
+def test_scenario_outcome_matches_baseline(scenario_tag, desired_pct):
+    mix = [tuple(r) for r in resources.energy_mix_df.values]
+    sources = [s for s, _, _ in mix]
+    planned = {'Wind': 2e5, 'Utility-Scale Solar': 1e5}
+    scenario = resources.scenario_pct_dict[scenario_tag]
+    start_demand, end_demand, start_recs = 4.3e7, 8.4e7, 1.4e6
+
+    outcome = engine.scenario_outcome(lcoe=[l for _, l, _ in mix], current_mwh=[p / 100 * int(start_demand) for _, _, p in mix],
+                                      planned=[planned.get(s, 0) for s in sources],
+                                      re_mask=[s in resources.re_tech for s in sources],
+                                      fossil_mask=[s in resources.fossil_tech for s in sources],
+                                      weights=[scenario.get(s, 0) for s in sources], desired_pct=desired_pct,
+                                      start_demand=start_demand, end_demand=end_demand, start_recs=start_recs)
+    expected = baseline_scenario(mix, planned, desired_pct, scenario, start_demand, end_demand, start_recs)
+    np.testing.assert_allclose([outcome.start_expense, outcome.end_expense, outcome.end_re_pct, outcome.end_recs],
+                               expected, rtol=1e-12)
@@ -0,0 +1,28 @@
+import numpy as np
+
+import frontier
+
+def test_non_dominated_by_increasing_cost():
+    cost = [3., 1., 2., 4., 2.5]
+    emissions = [1., 5., 3., 0.5, 4.]
+    assert frontier.non_dominated(cost, emissions).tolist() == [1, 2, 0, 3]
+
+def test_non_dominated_ties_keep_the_first_point():
+    assert frontier.non_dominated([1., 1., 2.], [2., 2., 1.]).tolist() == [0, 2]
+    assert frontier.non_dominated([1., 1.], [3., 2.]).tolist() == [1] #same cost, lower emissions wins
+    assert frontier.non_dominated([1., 2.], [2., 2.]).tolist() == [0] #same emissions, lower cost wins
+
+def test_non_dominated_empty():
+    assert frontier.non_dominated([], []).tolist() == []
+
+def test_candidate_weights():
+    w = frontier.candidate_weights(3, n_mixes=5, seed=1, presets=[[2, 1, 1]])
+    assert w.shape == (3 + 1 + 5, 3)
+    np.testing.assert_array_equal(w[:3], np.eye(3))
+    np.testing.assert_allclose(w[3], [0.5, 0.25, 0.25])
+    np.testing.assert_allclose(w.sum(axis=1), 1)
+    assert (w >= 0).all()
+    np.testing.assert_array_equal(w, frontier.candidate_weights(3, n_mixes=5, seed=1, presets=[[2, 1, 1]]))
+
+def test_candidate_weights_without_draws_or_presets():
+    np.testing.assert_array_equal(frontier.candidate_weights(2, n_mixes=0), np.eye(2))
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import irena
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=['Technology', 'Year', 'Item', 'pesos', 'usd'])
+
+ROWS = [['Wind', 2010, 'MIN', 1., 0.02], ['Wind', 2010, 'AVG', 2., 0.04], ['Wind', 2010, 'MAX', 3., 0.06],
+        ['Hydro', 2012, 'AVG', 5., 0.1], [np.nan, 2012, 'AVG', 9., 0.2]]
+
+def test_lookups():
+    index = irena.LCOEIndex.from_frame(frame(ROWS))
+    assert index.techs == ['Wind', 'Hydro']
+    assert (index.first_year, index.latest_year) == (2010, 2012)
+    assert index.stats('Wind', 2010) == {'MIN': 1., 'AVG': 2., 'MAX': 3.}
+    assert index.get('Hydro', 2012, 'AVG', 'usd') == 0.1
+    years, values = index.series('Wind', 'AVG')
+    assert years == [2010, 2012]
+    np.testing.assert_array_equal(values, [2., np.nan])
+
+def test_missing_values_raise_key_error():
+    index = irena.LCOEIndex.from_frame(frame(ROWS))
+    with pytest.raises(KeyError):
+        index.get('Hydro', 2012, 'MIN')
+    with pytest.raises(KeyError):
+        index.get('Solar', 2012, 'AVG')
+    with pytest.raises(KeyError):
+        index.get('Wind', 2011, 'AVG')
+
+def test_duplicate_rows_are_rejected():
+    with pytest.raises(ValueError, match='duplicate'):
+        irena.LCOEIndex.from_frame(frame(ROWS + [['Wind', 2010, 'AVG', 7., 0.1]]))
+
+def test_unknown_items_are_rejected():
+    with pytest.raises(ValueError, match='unknown Item'):
+        irena.LCOEIndex.from_frame(frame(ROWS + [['Wind', 2010, 'MEDIAN', 7., 0.1]]))
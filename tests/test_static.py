@@ -0,0 +1,46 @@
+import struct
+import zlib
+
+import pytest
+
+import static
+
+def test_minify_css():
+    css = '/* header */\n.a  >  .b {\n    color: red;\n    margin: 0 auto;\n}\n\n.c, .d { top: 0 }\n'
+    assert static.minify_css(css) == '.a>.b{color:red;margin:0 auto}.c,.d{top:0}'
+
+def test_minify_css_keeps_the_space_before_pseudo_classes():
+    assert static.minify_css('a :hover { top: 0 }') == 'a :hover{top:0}'
+
+def test_minify_css_leaves_strings_alone():
+    css = '.a::before { content: "/* not a comment */  ;  { }"; font-family: \'Open  Sans\', serif; }'
+    assert static.minify_css(css) == '.a::before{content:"/* not a comment */  ;  { }";font-family:\'Open  Sans\',serif}'
+
+def png(rows, chunk_size=4, extra=()):
+    """8 bit greyscale PNG of rows of pixel values, IDAT split into chunk_size byte chunks."""
+    raw = b''.join(b'\x00' + bytes(bytearray(r)) for r in rows)
+    data = zlib.compress(raw, 0)
+    chunks = [static._chunk(b'IHDR', struct.pack('>IIBBBBB', len(rows[0]), len(rows), 8, 0, 0, 0, 0))]
+    chunks += [static._chunk(kind, body) for kind, body in extra]
+    chunks += [static._chunk(b'IDAT', data[i:i + chunk_size]) for i in range(0, len(data), chunk_size)]
+    return static.PNG_SIGNATURE + b''.join(chunks) + static._chunk(b'IEND', b'')
+
+def pixels(data):
+    return zlib.decompress(b''.join(body for kind, body in static._chunks(data) if kind == b'IDAT'))
+
+def test_recompress_png_is_lossless_and_drops_ancillary_chunks():
+    original = png([[i % 7] * 64 for i in range(32)], extra=[(b'tEXt', b'Comment\x00' + b'x' * 100)])
+    out = static.recompress_png(original)
+    assert len(out) < len(original)
+    assert pixels(out) == pixels(original)
+    kinds = [kind for kind, _ in static._chunks(out)]
+    assert kinds == [b'IHDR', b'IDAT', b'IEND']
+
+def test_recompress_png_keeps_the_original_when_not_smaller():
+    original = static.PNG_SIGNATURE + static._chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0)) + \
+        static._chunk(b'IDAT', zlib.compress(b'\x00\x00', 9)) + static._chunk(b'IEND', b'')
+    assert static.recompress_png(original) == original
+
+def test_recompress_png_rejects_other_formats():
+    with pytest.raises(ValueError, match='not a PNG'):
+        static.recompress_png(b'GIF89a' + b'\x00' * 20)
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import cache
+import functions
+
+@functions.producer
+def doubled(x):
+    return {'x': 2 * x}
+
+def browser(token):
+    """The token as the browser sends it back, with 2.0 as 2."""
+    return json.loads(json.dumps(token).replace('.0,', ',').replace('.0]', ']'))
+
+def args_token(*args):
+    return {'key': cache.content_key('doubled', args), 'producer': 'doubled', 'args': list(args)}
+
+def test_args_token_is_rebuilt_after_a_miss():
+    token = browser(args_token(2.0))
+    cache.results.clear()
+    assert functions.load_result(token) == {'x': 4}
+    assert cache.results.get(token['key']) == {'x': 4}
+
+def test_args_token_with_changed_args_is_rejected():
+    token = dict(args_token(2.0), args=[1e15])
+    cache.results.clear()
+    with pytest.raises(ValueError):
+        functions.load_result(token)
+    assert cache.results.get(token['key']) is None
+
+def test_unknown_producer_is_rejected():
+    token = dict(args_token(2.0), producer='eval')
+    cache.results.clear()
+    with pytest.raises(ValueError):
+        functions.load_result(token)
+
+def frame_token():
+    import pandas as pd
+    import wire
+    value = pd.DataFrame({'generation': [1.0, 2.5]}, index=pd.Index([2020, 2021], name='year'))
+    data = wire.encode(value)
+    return {'key': 'frame-key', 'producer': 'doubled', 'data': data, 'sig': wire.signature('frame-key', 'doubled', data)}, value
+
+def test_signed_data_token_is_restored():
+    token, value = frame_token()
+    cache.results.clear()
+    assert functions.load_result(browser(token)).equals(value)
+
+@pytest.mark.parametrize('tamper', [
+    lambda t: t['data']['frame']['columns'][0][1].__setitem__(1, 'AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA'), #other values
+    lambda t: t.__setitem__('key', 'another-key'), #a valid result under someone else's key
+    lambda t: t.pop('sig'),
+])
+def test_tampered_data_token_is_rejected(tamper):
+    token, _ = frame_token()
+    tamper(token)
+    cache.results.clear()
+    with pytest.raises(ValueError):
+        functions.load_result(token)
+    assert cache.results.get(token['key']) is None
@@ -0,0 +1,187 @@
+import os
+import hmac
+import json
+import base64
+import hashlib
+import tempfile
+import threading
+import warnings
+
+import numpy as np
+
+import cache
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~ Store Wire Format ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# What a dcc.Store token carries so a worker without the result in cache.results can get it back
+# (see functions.store_result). RPS_STORE_ENCODING picks the encoding:
+#
+#   'columnar' (default)  the result itself: frames as one base64 block per numeric column,
+#                         projected to the columns their consumers read, decoded with np.frombuffer.
+#                         The size follows the result, not the inputs. Tokens whose arguments are
+#                         smaller still carry the arguments.
+#   'args'                the producer's arguments, recomputed on a miss. Nested tokens repeat their
+#                         own arguments, so this grows with e.g. the planned procurement table.
+#
+# RPS_STORE_FLOAT32=1 sends float columns as float32, halving them. Values then only match the
+# server's float64 results to about 7 significant digits after a cache miss.
+#
+# A result in a token is signed (HMAC-SHA256 over key, producer and data), so a worker only
+# caches what some worker of this server sent. The secret is RPS_STORE_SECRET, or else a random
+# one that every worker on the host shares through RPS_STORE_SECRET_FILE. Set RPS_STORE_SECRET
+# when workers run on several hosts. When neither can be had, tokens carry the arguments.
+
+ENCODINGS = ['columnar', 'args']
+ENCODING = os.environ.get('RPS_STORE_ENCODING', 'columnar')
+FLOAT32 = os.environ.get('RPS_STORE_FLOAT32', '0') == '1'
+SECRET_FILE = os.environ.get('RPS_STORE_SECRET_FILE', os.path.join(tempfile.gettempdir(), 'rps-store-secret'))
+
+if ENCODING not in ENCODINGS:
+    raise ValueError('RPS_STORE_ENCODING must be one of {}, got {!r}'.format(ENCODINGS, ENCODING))
+
+# --- Frames ---
+def _array(values, float32):
+    """[dtype, base64] of a numeric array, or a plain list for anything else."""
+    values = np.asarray(values)
+    if values.dtype.kind in 'fiub':
+        if values.dtype.kind == 'f':
+            values = values.astype('<f4' if float32 else '<f8')
+        else:
+            values = values.astype(values.dtype.newbyteorder('<'))
+        return [values.dtype.str, base64.b64encode(np.ascontiguousarray(values).tobytes()).decode('ascii')]
+    return [None, [None if v is None or v != v else v for v in values.tolist()]]
+
+def _unarray(encoded):
+    dtype, data = encoded
+    if dtype is None:
+        return np.array([np.nan if v is None else v for v in data], dtype=object)
+    return np.frombuffer(base64.b64decode(data), dtype=dtype).astype(np.dtype(dtype).newbyteorder('='))
+
+def encode_frame(df, columns=None, float32=False):
+    """
+    Columnar payload of a DataFrame.
+
+    Input
+    -----
+        -df (DataFrame): with a plain (not Multi) index
+        -columns (list): columns to keep, None for all
+        -float32 (bool): send float columns as float32
+    """
+    if columns is not None:
+        df = df[[c for c in df.columns if c in columns]]
+    return {'index': _array(df.index.values, float32=False), 'index_name': df.index.name,
+            'columns': [[c, _array(df[c].values, float32)] for c in df.columns]}
+
+def decode_frame(payload):
+    import pandas as pd
+    index = pd.Index(_unarray(payload['index']), name=payload['index_name'])
+    return pd.DataFrame({c: _unarray(v) for c, v in payload['columns']}, index=index,
+                        columns=[c for c, _ in payload['columns']])
+
+# --- Results ---
+def encode(value, columns=None, float32=False):
+    """
+    Payload of a producer result: a DataFrame, a tuple or list of results, or a JSON-able value.
+
+    columns projects every frame in the result. Raises TypeError for anything else.
+    """
+    import pandas as pd
+    if isinstance(value, pd.DataFrame):
+        return {'frame': encode_frame(value, columns, float32)}
+    if isinstance(value, (tuple, list)) and any(isinstance(v, pd.DataFrame) for v in value):
+        return {'tuple': [encode(v, columns, float32) for v in value]}
+    json.dumps(value) #raises TypeError when it can't be sent as it is
+    return {'json': value}
+
+def decode(payload):
+    if 'frame' in payload:
+        return decode_frame(payload['frame'])
+    if 'tuple' in payload:
+        return tuple(decode(v) for v in payload['tuple'])
+    return payload['json']
+
+# --- Signing ---
+_secret = [] #the secret, or None when there is no shared one
+
+def secret():
+    """The signing secret from RPS_STORE_SECRET or SECRET_FILE (created on first use), None if neither works."""
+    if not _secret:
+        value = os.environ.get('RPS_STORE_SECRET', '').encode('utf-8') or None
+        if value is None:
+            try:
+                if not os.path.exists(SECRET_FILE):
+                    tmp = '{}.{}.tmp'.format(SECRET_FILE, os.getpid())
+                    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(os.urandom(32))
+                    try:
+                        os.link(tmp, SECRET_FILE) #fails if another worker got there first, then its secret wins
+                    except FileExistsError:
+                        pass
+                    os.remove(tmp)
+                with open(SECRET_FILE, 'rb') as f:
+                    value = f.read() or None
+            except OSError as e:
+                warnings.warn('store tokens will carry arguments, no signing secret: {}'.format(e))
+        _secret.append(value)
+    return _secret[0]
+
+def signature(key, producer, data):
+    """HMAC of a result token, over the canonical form so the browser's JSON round trip keeps it valid."""
+    blob = json.dumps(cache.canonical([key, producer, data]), sort_keys=True, separators=(',', ':'))
+    return hmac.new(secret(), blob.encode('utf-8'), hashlib.sha256).hexdigest()
+
+# --- Tokens ---
+_sizes = dict() #producer: [tokens, args bytes, sent bytes], filled while metrics are on
+_lock = threading.Lock()
+
+def token(key, producer, args, value, columns=None, measure=False):
+    """
+    Store token for a result.
+
+    With ENCODING 'columnar' the token carries the encoded result and its signature, unless the
+    arguments are the smaller of the two (small tables), encode() can't take the result or there is
+    no signing secret. With measure, the size of
+    the token next to its 'args' equivalent is added to sizes().
+    """
+    by_args = {'key': key, 'producer': producer, 'args': list(args)}
+    out, args_bytes = by_args, None
+    if ENCODING == 'columnar' and secret() is not None:
+        args_bytes = len(json.dumps(by_args, default=str))
+        try:
+            data = encode(value, columns, FLOAT32)
+            by_data = {'key': key, 'producer': producer, 'data': data, 'sig': signature(key, producer, data)}
+            if len(json.dumps(by_data)) < args_bytes:
+                out = by_data
+        except TypeError:
+            pass
+    if measure:
+        if args_bytes is None:
+            args_bytes = len(json.dumps(by_args, default=str))
+        sent_bytes = args_bytes if out is by_args else len(json.dumps(out))
+        with _lock:
+            counts = _sizes.setdefault(producer, [0, 0, 0])
+            counts[0] += 1
+            counts[1] += args_bytes
+            counts[2] += sent_bytes
+    return out
+
+def sizes():
+    """{producer: {'tokens', 'args_bytes', 'sent_bytes', 'saved_bytes'}} in this process."""
+    with _lock:
+        return {p: {'tokens': n, 'args_bytes': a, 'sent_bytes': s, 'saved_bytes': a - s} for p, (n, a, s) in _sizes.items()}
+
+def restore(token, producers):
+    """
+    The result behind a token that missed the cache: decoded, or recomputed by its producer.
+
+    Raises ValueError for a result this server didn't sign.
+    """
+    if 'data' in token:
+        sig = secret() and signature(token['key'], token['producer'], token['data'])
+        if not sig or not hmac.compare_digest(sig, str(token.get('sig', ''))):
+            raise ValueError('store token failed verification')
+        return decode(token['data'])
+    return producers[token['producer']](*token['args'])